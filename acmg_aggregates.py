@@ -0,0 +1,186 @@
+from typing import Iterable, List, Optional, Set, Tuple
+
+import psycopg2
+
+from acmg_engine import BENIGN_SIMPLE, PATHOGENIC_SIMPLE
+
+
+# Aggregate πίνακες ανά γονίδιο για το apply_ps1_pm5_pp5_bp6 / score_all:
+#   acmg_pathogenic_p:   διακριτά (hgvs_p, hgvs_c) των pathogenic / likely pathogenic    -> PS1
+#   acmg_pathogenic_pos: διακριτά (protein_pos, hgvs_p) των pathogenic / likely pathogenic -> PM5
+#   acmg_significance_c: διακριτά (hgvs_c, hgvs_p, clinsigsimple) με σημασία               -> PP5 / BP6
+# Ανανεώνονται στο ingestion από το gene_variants, ώστε η ταξινόμηση νέας μετάλλαξης
+# να γίνεται με τρία indexed point lookups αντί να φορτώνεται όλο το γονίδιο σε pandas.
+AGGREGATE_TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS acmg_pathogenic_p (
+    gene_symbol TEXT NOT NULL,
+    hgvs_p TEXT NOT NULL,
+    hgvs_c TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_acmg_pathogenic_p ON acmg_pathogenic_p (gene_symbol, hgvs_p);
+
+CREATE TABLE IF NOT EXISTS acmg_pathogenic_pos (
+    gene_symbol TEXT NOT NULL,
+    protein_pos BIGINT NOT NULL,
+    hgvs_p TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_acmg_pathogenic_pos ON acmg_pathogenic_pos (gene_symbol, protein_pos);
+
+CREATE TABLE IF NOT EXISTS acmg_significance_c (
+    gene_symbol TEXT NOT NULL,
+    hgvs_c TEXT NOT NULL,
+    hgvs_p TEXT,
+    clinsigsimple TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_acmg_significance_c ON acmg_significance_c (gene_symbol, hgvs_c);
+"""
+
+REFRESH_SQL = """
+DELETE FROM acmg_pathogenic_p WHERE gene_symbol = ANY(%(genes)s);
+INSERT INTO acmg_pathogenic_p (gene_symbol, hgvs_p, hgvs_c)
+SELECT DISTINCT gene_symbol, hgvs_p, hgvs_c
+FROM gene_variants
+WHERE gene_symbol = ANY(%(genes)s) AND hgvs_p IS NOT NULL AND clinsigsimple = ANY(%(pathogenic)s);
+
+DELETE FROM acmg_pathogenic_pos WHERE gene_symbol = ANY(%(genes)s);
+INSERT INTO acmg_pathogenic_pos (gene_symbol, protein_pos, hgvs_p)
+SELECT DISTINCT gene_symbol, protein_pos, hgvs_p
+FROM gene_variants
+WHERE gene_symbol = ANY(%(genes)s) AND protein_pos IS NOT NULL AND clinsigsimple = ANY(%(pathogenic)s);
+
+DELETE FROM acmg_significance_c WHERE gene_symbol = ANY(%(genes)s);
+INSERT INTO acmg_significance_c (gene_symbol, hgvs_c, hgvs_p, clinsigsimple)
+SELECT DISTINCT gene_symbol, hgvs_c, hgvs_p, clinsigsimple
+FROM gene_variants
+WHERE gene_symbol = ANY(%(genes)s) AND hgvs_c IS NOT NULL AND clinsigsimple IS NOT NULL;
+"""
+
+
+def create_aggregate_tables(conn: psycopg2.extensions.connection) -> None:
+    """Δημιουργία των aggregate πινάκων ACMG (αν λείπουν)"""
+    with conn.cursor() as cur:
+        cur.execute(AGGREGATE_TABLES_SQL)
+    conn.commit()
+
+
+def refresh_acmg_aggregates(conn: psycopg2.extensions.connection, genes: Iterable[str]) -> None:
+    """Ξαναχτίζει τα aggregates των γονιδίων από το gene_variants (σε ένα transaction)"""
+    genes = sorted(set(genes))
+    if not genes:
+        return
+    with conn.cursor() as cur:
+        cur.execute(REFRESH_SQL, {"genes": genes, "pathogenic": PATHOGENIC_SIMPLE})
+    conn.commit()
+
+
+def _values(row) -> tuple:
+    """Τιμές γραμμής τόσο από απλό cursor όσο και από RealDictCursor"""
+    return tuple(row.values()) if isinstance(row, dict) else tuple(row)
+
+
+def gene_exists(cur, gene: str) -> bool:
+    """Indexed έλεγχος ότι το γονίδιο υπάρχει στο gene_variants"""
+    cur.execute("SELECT EXISTS (SELECT 1 FROM gene_variants WHERE gene_symbol = %s) AS found", (gene,))
+    return _values(cur.fetchone())[0]
+
+
+def lookup_criteria(
+    cur,
+    gene: str,
+    hgvs_c: Optional[str],
+    hgvs_p: Optional[str],
+    protein_pos: Optional[int],
+) -> List[str]:
+    """
+    PS1 / PM5 / PP5 / BP6 για μία μετάλλαξη από τα aggregate tables (ίδιοι κανόνες με το score_all).
+    Ο cursor μπορεί να είναι απλός ή RealDictCursor.
+    """
+    if gene is None or hgvs_c is None or hgvs_p is None or protein_pos is None:
+        return []
+
+    cur.execute("""
+        SELECT
+            EXISTS (
+                SELECT 1 FROM acmg_pathogenic_p
+                WHERE gene_symbol = %(gene)s AND hgvs_p = %(hgvs_p)s AND hgvs_c IS DISTINCT FROM %(hgvs_c)s
+            ) AS ps1,
+            EXISTS (
+                SELECT 1 FROM acmg_pathogenic_pos
+                WHERE gene_symbol = %(gene)s AND protein_pos = %(protein_pos)s AND hgvs_p IS DISTINCT FROM %(hgvs_p)s
+            ) AS pm5,
+            ARRAY(
+                SELECT DISTINCT clinsigsimple FROM acmg_significance_c
+                WHERE gene_symbol = %(gene)s AND hgvs_c = %(hgvs_c)s AND hgvs_p IS DISTINCT FROM %(hgvs_p)s
+            ) AS significances;
+    """, {"gene": gene, "hgvs_c": hgvs_c, "hgvs_p": hgvs_p, "protein_pos": protein_pos})
+    ps1, pm5, significances = _values(cur.fetchone())
+    return _criteria(ps1, pm5, significances)
+
+
+def _criteria(ps1: bool, pm5: bool, significances: List[str]) -> List[str]:
+    """Ίδιος κανόνας απόφασης με το score_all / apply_ps1_pm5_pp5_bp6"""
+    criteria = []
+    if ps1:
+        criteria.append("PS1")
+    if pm5:
+        criteria.append("PM5")
+    sigs = set(significances)
+    if sigs and sigs.issubset(PATHOGENIC_SIMPLE):
+        criteria.append("PP5")
+    elif sigs and sigs.issubset(BENIGN_SIMPLE):
+        criteria.append("BP6")
+    return criteria
+
+
+def existing_genes(cur, genes: Iterable[str]) -> Set[str]:
+    """Ποια από τα γονίδια υπάρχουν στο gene_variants (ένα indexed EXISTS ανά γονίδιο, σε ένα query)"""
+    cur.execute("""
+        SELECT q.gene_symbol
+        FROM unnest(%s::text[]) AS q(gene_symbol)
+        WHERE EXISTS (SELECT 1 FROM gene_variants g WHERE g.gene_symbol = q.gene_symbol)
+    """, (sorted(set(genes)),))
+    return {_values(row)[0] for row in cur.fetchall()}
+
+
+def lookup_criteria_batch(
+    cur,
+    variants: List[Tuple[str, Optional[str], Optional[str], Optional[int]]],
+) -> List[List[str]]:
+    """
+    lookup_criteria για πολλές μεταλλάξεις (gene, hgvs_c, hgvs_p, protein_pos) με ένα query:
+    οι μεταλλάξεις περνούν ως arrays (unnest) και κάθε μία απαντιέται με τα ίδια indexed lookups.
+    Επιστρέφει μια λίστα κριτηρίων ανά μετάλλαξη, με τη σειρά της εισόδου.
+    """
+    results = [[] for _ in variants]
+    complete = [i for i, v in enumerate(variants) if all(x is not None for x in v)]
+    if not complete:
+        return results
+
+    cur.execute("""
+        SELECT
+            q.idx,
+            EXISTS (
+                SELECT 1 FROM acmg_pathogenic_p a
+                WHERE a.gene_symbol = q.gene_symbol AND a.hgvs_p = q.hgvs_p AND a.hgvs_c IS DISTINCT FROM q.hgvs_c
+            ) AS ps1,
+            EXISTS (
+                SELECT 1 FROM acmg_pathogenic_pos a
+                WHERE a.gene_symbol = q.gene_symbol AND a.protein_pos = q.protein_pos AND a.hgvs_p IS DISTINCT FROM q.hgvs_p
+            ) AS pm5,
+            ARRAY(
+                SELECT DISTINCT a.clinsigsimple FROM acmg_significance_c a
+                WHERE a.gene_symbol = q.gene_symbol AND a.hgvs_c = q.hgvs_c AND a.hgvs_p IS DISTINCT FROM q.hgvs_p
+            ) AS significances
+        FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[], %s::bigint[])
+            AS q(idx, gene_symbol, hgvs_c, hgvs_p, protein_pos);
+    """, (
+        complete,
+        [variants[i][0] for i in complete],
+        [variants[i][1] for i in complete],
+        [variants[i][2] for i in complete],
+        [variants[i][3] for i in complete],
+    ))
+    for row in cur.fetchall():
+        idx, ps1, pm5, significances = _values(row)
+        results[idx] = _criteria(ps1, pm5, significances)
+    return results
@@ -0,0 +1,298 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _pathogenic_flags(clinicalsignificance: pd.Series) -> pd.Series:
+    """
+    1 για 'Pathogenic' (case-sensitive, όπως το str.contains του group_based_acmg), αλλιώς 0.
+    Κενό clinicalsignificance: το any() της per-row έκδοσης δίνει True για NaN (truthy) και False για None,
+    οπότε το NaN μετράει ως pathogenic και το None όχι.
+    """
+    flags = clinicalsignificance.astype("string").str.contains('Pathogenic', regex=False)
+    missing = flags.isna()
+    if missing.any() and clinicalsignificance.dtype == object:
+        is_none = clinicalsignificance[missing].map(lambda value: value is None, na_action=None)
+        flags[is_none[is_none].index] = False
+    return flags.fillna(True).astype(int)
+
+
+def _lookup_counts(table: pd.Series, rows: pd.DataFrame, keys: List[str]) -> np.ndarray:
+    """Τιμή του table για το κλειδί κάθε γραμμής (0 όταν λείπει ή όταν κάποιο κλειδί είναι κενό)"""
+    if len(keys) == 1:
+        index = pd.Index(rows[keys[0]])
+    else:
+        index = pd.MultiIndex.from_frame(rows[keys])
+    return table.reindex(index).fillna(0).to_numpy()
+
+
+def build_grouping_counts(df: pd.DataFrame, gene_column: Optional[str] = None) -> Dict[str, pd.Series]:
+    """
+    Πλήθη pathogenic του group_based_acmg ανά (gene, hgvs_p), (gene, hgvs_p, hgvs_c),
+    (gene, protein_pos) και (gene, protein_pos, hgvs_p). Αθροίζονται μεταξύ chunks (merge_grouping_counts).
+    """
+    keys = [gene_column] if gene_column else []
+    work = df[keys + ['hgvs_c', 'hgvs_p', 'protein_pos']].copy()
+    work['_path'] = _pathogenic_flags(df['clinicalsignificance'])
+
+    def _sum(columns: List[str]) -> pd.Series:
+        return work.groupby(keys + columns, dropna=True, observed=True)['_path'].sum()
+
+    return {
+        'ps1': _sum(['hgvs_p']),
+        'ps1_exclude': _sum(['hgvs_p', 'hgvs_c']),
+        'pm5': _sum(['protein_pos']),
+        'pm5_exclude': _sum(['protein_pos', 'hgvs_p']),
+    }
+
+
+def group_based_acmg_from_counts(
+    df: pd.DataFrame,
+    counts: Dict[str, pd.Series],
+    gene_column: Optional[str] = None,
+) -> pd.Series:
+    """Grouping-based PS1 / PM5 για τις γραμμές του df με βάση (πιθανώς ευρύτερα) πλήθη από το build_grouping_counts"""
+    keys = [gene_column] if gene_column else []
+
+    # PS1: pathogenic με ίδιο hgvs_p αλλά διαφορετικό hgvs_c
+    ps1 = (
+        _lookup_counts(counts['ps1'], df, keys + ['hgvs_p'])
+        - _lookup_counts(counts['ps1_exclude'], df, keys + ['hgvs_p', 'hgvs_c'])
+    ) > 0
+
+    # PM5: pathogenic στην ίδια protein_pos αλλά με διαφορετικό hgvs_p
+    pm5 = (
+        _lookup_counts(counts['pm5'], df, keys + ['protein_pos'])
+        - _lookup_counts(counts['pm5_exclude'], df, keys + ['protein_pos', 'hgvs_p'])
+    ) > 0
+
+    return pd.Series(
+        np.select([ps1 & pm5, ps1, pm5], ['PS1; PM5', 'PS1', 'PM5'], default=''),
+        index=df.index,
+        dtype=object,
+    )
+
+
+def group_based_acmg_batch(df: pd.DataFrame, gene_column: Optional[str] = None) -> pd.Series:
+    """
+    Grouping-based PS1 / PM5 για όλες τις γραμμές μαζί, σε γραμμικό χρόνο.
+    Χτίζει μία φορά τα πλήθη pathogenic ανά (gene, hgvs_p) και (gene, protein_pos) και αφαιρεί
+    τη συνεισφορά των γραμμών που εξαιρούνται (ίδιο hgvs_c για PS1, ίδιο hgvs_p για PM5).
+    Δίνει ίδιο αποτέλεσμα με το df.apply(lambda row: group_based_acmg(row, df), axis=1).
+    Με gene_column=None το df θεωρείται ήδη ένα γονίδιο (όπως στο per-row group_based_acmg).
+    """
+    return group_based_acmg_from_counts(df, build_grouping_counts(df, gene_column), gene_column)
+
+
+# --- PS1 / PM5 / PP5 / BP6 (apply_ps1_pm5_pp5_bp6) για όλο το γονίδιο ---
+PATHOGENIC_SIMPLE = ['pathogenic', 'likely pathogenic']
+BENIGN_SIMPLE = ['benign', 'likely benign']
+
+
+def build_acmg_aggregates(df: pd.DataFrame, gene_column: str = 'gene_symbol') -> Dict[str, pd.DataFrame]:
+    """
+    Προϋπολογισμένα aggregates του apply_ps1_pm5_pp5_bp6, με ένα groupby ανά κλειδί:
+    πλήθος pathogenic ανά (gene, hgvs_p) / (gene, protein_pos) και πλήθος pathogenic / benign / με σημασία
+    ανά (gene, hgvs_c). Οι πίνακες *_exclude μετρούν τις γραμμές που εξαιρεί κάθε κριτήριο.
+    Χρησιμοποιούνται από το score_all (το API διαβάζει τα αντίστοιχα aggregate tables, βλ. acmg_aggregates).
+    """
+    work = df[[gene_column, 'hgvs_c', 'hgvs_p', 'protein_pos']].copy()
+    work['path'] = df['clinsigsimple'].isin(PATHOGENIC_SIMPLE).astype(int)
+    work['benign'] = df['clinsigsimple'].isin(BENIGN_SIMPLE).astype(int)
+    work['sig'] = df['clinsigsimple'].notna().astype(int)
+
+    def _sum(keys: List[str], columns: List[str]) -> pd.DataFrame:
+        return work.groupby([gene_column] + keys, dropna=True, observed=True)[columns].sum()
+
+    return {
+        # PS1: pathogenic με ίδιο hgvs_p, εκτός όσων έχουν και ίδιο hgvs_c
+        'ps1': _sum(['hgvs_p'], ['path']),
+        'ps1_exclude': _sum(['hgvs_p', 'hgvs_c'], ['path']),
+        # PM5: pathogenic στην ίδια protein_pos, εκτός όσων έχουν και ίδιο hgvs_p
+        'pm5': _sum(['protein_pos'], ['path']),
+        'pm5_exclude': _sum(['protein_pos', 'hgvs_p'], ['path']),
+        # PP5 / BP6: σημασίες με ίδιο hgvs_c, εκτός όσων έχουν και ίδιο hgvs_p
+        'same_c': _sum(['hgvs_c'], ['path', 'benign', 'sig']),
+        'same_c_exclude': _sum(['hgvs_c', 'hgvs_p'], ['path', 'benign', 'sig']),
+    }
+
+
+def _decide(ps1, ps1_ex, pm5, pm5_ex, c_counts, c_ex_counts):
+    """Κανόνας απόφασης του apply_ps1_pm5_pp5_bp6 πάνω σε numpy arrays πληθών (score_all)"""
+    sig = c_counts[2] - c_ex_counts[2]
+    return (
+        (ps1 - ps1_ex) > 0,
+        (pm5 - pm5_ex) > 0,
+        # PP5: όλες οι σημασίες pathogenic / likely pathogenic, BP6: όλες benign / likely benign
+        (sig > 0) & ((c_counts[0] - c_ex_counts[0]) == sig),
+        (sig > 0) & ((c_counts[1] - c_ex_counts[1]) == sig),
+    )
+
+
+def _criteria_list(ps1: bool, pm5: bool, pp5: bool, bp6: bool) -> List[str]:
+    criteria = []
+    if ps1:
+        criteria.append("PS1")
+    if pm5:
+        criteria.append("PM5")
+    if pp5:
+        criteria.append("PP5")
+    elif bp6:
+        criteria.append("BP6")
+    return criteria
+
+
+def score_all(
+    df: pd.DataFrame,
+    gene_column: str = 'gene_symbol',
+    aggregates: Optional[Dict[str, pd.DataFrame]] = None,
+) -> pd.Series:
+    """
+    Bulk apply_ps1_pm5_pp5_bp6: PS1, PM5, PP5 και BP6 για κάθε γραμμή του df σε γραμμικό χρόνο.
+    Τα aggregates ενώνονται πίσω στις γραμμές με reindex και επιστρέφεται μια λίστα κριτηρίων ανά γραμμή,
+    ίδια με το df.apply(lambda row: apply_ps1_pm5_pp5_bp6(row, df), axis=1).
+    """
+    if aggregates is None:
+        aggregates = build_acmg_aggregates(df, gene_column)
+
+    result = pd.Series([[] for _ in range(len(df))], index=df.index, dtype=object)
+    complete = df[[gene_column, 'hgvs_c', 'hgvs_p', 'protein_pos']].notna().all(axis=1)
+    if not complete.any():
+        return result
+
+    rows = df.loc[complete]
+
+    def _lookup(name: str, keys: List[str]) -> np.ndarray:
+        table = aggregates[name]
+        index = pd.MultiIndex.from_frame(rows[[gene_column] + keys])
+        return table.reindex(index).fillna(0).to_numpy().T
+
+    ps1, pm5, pp5, bp6 = _decide(
+        _lookup('ps1', ['hgvs_p'])[0],
+        _lookup('ps1_exclude', ['hgvs_p', 'hgvs_c'])[0],
+        _lookup('pm5', ['protein_pos'])[0],
+        _lookup('pm5_exclude', ['protein_pos', 'hgvs_p'])[0],
+        _lookup('same_c', ['hgvs_c']),
+        _lookup('same_c_exclude', ['hgvs_c', 'hgvs_p']),
+    )
+    result.loc[complete] = pd.Series(
+        [_criteria_list(*flags) for flags in zip(ps1, pm5, pp5, bp6)],
+        index=rows.index,
+        dtype=object,
+    )
+    return result
+
+
+# --- Compact support tables για το mark_acmg_criteria ---
+# Αντί για λίστες από ολόκληρες γραμμές (pd.Series) ανά κλειδί, κρατάμε μόνο ό,τι χρειάζεται ο έλεγχος:
+#   same_c:            (gene, hgvs_c)      -> (πλήθος pathogenic, πόσα από αυτά αναφέρουν και benign)
+#   same_p:            (gene, hgvs_p)      -> tuple με τα διακριτά hgvs_c των pathogenic
+#   same_pos_missense: (gene, protein_pos) -> tuple με τα διακριτά hgvs_p των pathogenic missense
+SupportTables = Dict[str, Dict[Tuple, Tuple]]
+
+
+def _present(values: pd.Series) -> pd.Series:
+    """Ίδιος έλεγχος με το 'if gene and hgvs_c' (όχι None / κενό / 0)"""
+    return values.notna() & (values != '') & (values != 0)
+
+
+def _as_dict(grouped: pd.Series) -> Dict[Tuple, Tuple]:
+    return {key: tuple(values) for key, values in grouped.items()}
+
+
+def build_support_tables(df: pd.DataFrame, gene_column: str = 'gene_symbol') -> SupportTables:
+    """
+    Support tables για PP5 / BP6 / PS1 / PM5 από τις pathogenic μεταλλάξεις, με groupby ανά κλειδί.
+    Ίδια κριτήρια με τα same_c_groups / same_p_groups / same_pos_groups του build_acmg_support_tables.
+    """
+    significance = df['clinicalsignificance'].astype("string").str.lower()
+    pathogenic = df[significance.str.contains('pathogenic', regex=False).fillna(False).astype(bool)]
+    path_significance = significance.loc[pathogenic.index]
+    has_gene = _present(pathogenic[gene_column])
+
+    # PP5 / BP6: πλήθος pathogenic με ίδιο hgvs_c και πόσα αναφέρουν και benign
+    rows = pathogenic[has_gene & _present(pathogenic['hgvs_c'])]
+    benign = path_significance.loc[rows.index].str.contains('benign', regex=False).astype(int)
+    same_c = benign.groupby([rows[gene_column], rows['hgvs_c']], observed=True).agg(['size', 'sum'])
+
+    # PS1: διακριτά hgvs_c ανά ίδιο hgvs_p
+    rows = pathogenic[has_gene & _present(pathogenic['hgvs_p'])]
+    same_p = rows.groupby([gene_column, 'hgvs_p'], dropna=False, observed=True)['hgvs_c'].unique()
+
+    # PM5: διακριτά hgvs_p των pathogenic missense ανά protein_pos
+    missense = (
+        pathogenic['variant_type'].astype("string").str.lower().eq('missense').fillna(False).astype(bool)
+        & path_significance.eq('pathogenic').fillna(False).astype(bool)
+    )
+    rows = pathogenic[has_gene & _present(pathogenic['protein_pos']) & missense]
+    same_pos = rows.groupby([gene_column, 'protein_pos'], dropna=False, observed=True)['hgvs_p'].unique()
+
+    return {
+        'same_c': {key: (int(n), int(n_benign)) for key, n, n_benign in same_c.itertuples(name=None)},
+        'same_p': _as_dict(same_p),
+        'same_pos_missense': _as_dict(same_pos),
+    }
+
+
+def support_criteria(
+    support_tables: SupportTables,
+    gene: str,
+    hgvs_c: Optional[str],
+    hgvs_p: Optional[str],
+    protein_pos: Optional[int],
+    variant_type: Optional[str],
+) -> List[str]:
+    """Lookup στα support tables για μία μετάλλαξη (PP5 / BP6 / PS1 / PM5)"""
+    criteria = []
+
+    if gene and hgvs_c:
+        n_pathogenic, n_benign = support_tables['same_c'].get((gene, hgvs_c), (0, 0))
+        if n_pathogenic:
+            criteria.append("PP5")
+        if n_benign:
+            criteria.append("BP6")
+
+    # PS1: pathogenic με ίδιο hgvs_p αλλά άλλο hgvs_c
+    if gene and hgvs_p:
+        other_c = support_tables['same_p'].get((gene, hgvs_p), ())
+        if any(c != hgvs_c for c in other_c):
+            criteria.append("PS1")
+
+    # PM5: novel missense με διαφορετικό pathogenic missense στην ίδια θέση
+    if gene and protein_pos:
+        path_missense_p = support_tables['same_pos_missense'].get((gene, protein_pos), ())
+        is_novel_missense = variant_type == 'missense' and all(p != hgvs_p for p in path_missense_p)
+        if is_novel_missense and path_missense_p:
+            criteria.append("PM5")
+
+    return criteria
+
+
+# --- Συνένωση aggregates από chunks (chunked pipeline) ---
+def merge_count_tables(parts: List[Dict]) -> Dict:
+    """Άθροισμα πινάκων πληθών πολλών chunks (build_grouping_counts ή build_acmg_aggregates)"""
+    return {
+        name: pd.concat([part[name] for part in parts]).groupby(level=list(range(parts[0][name].index.nlevels)), observed=True).sum()
+        for name in parts[0]
+    }
+
+
+def merge_support_tables(parts: List[SupportTables]) -> SupportTables:
+    """Ένωση των build_support_tables πολλών chunks (άθροισμα πληθών, διακριτές τιμές στη σειρά εμφάνισης)"""
+    same_c: Dict[Tuple, Tuple] = {}
+    same_p: Dict[Tuple, Dict] = {}
+    same_pos: Dict[Tuple, Dict] = {}
+    for part in parts:
+        for key, (n, n_benign) in part['same_c'].items():
+            total, total_benign = same_c.get(key, (0, 0))
+            same_c[key] = (total + n, total_benign + n_benign)
+        for key, values in part['same_p'].items():
+            same_p.setdefault(key, {}).update(dict.fromkeys(values))
+        for key, values in part['same_pos_missense'].items():
+            same_pos.setdefault(key, {}).update(dict.fromkeys(values))
+    return {
+        'same_c': same_c,
+        'same_p': {key: tuple(values) for key, values in same_p.items()},
+        'same_pos_missense': {key: tuple(values) for key, values in same_pos.items()},
+    }
@@ -1,12 +1,19 @@
-from fastapi import FastAPI, Query
-from typing import List, Optional
+from fastapi import FastAPI, File, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional, Tuple
 import psycopg2
 import pandas as pd
 from psycopg2.extras import RealDictCursor
 import json
 from collections import Counter
 from collections import defaultdict
-from new2 import apply_ps1_pm5_pp5_bp6
+from acmg_aggregates import existing_genes, gene_exists, lookup_criteria, lookup_criteria_batch
+from api_cache import api_cache, cached_endpoint
+from async_db import async_pool_stats, close_async_pool, fetch_all, fetch_value, init_async_pool, stream_rows
+from db_pool import close_pool, get_connection, init_pool, pool_stats, release_connection
+from db_schema import GENOMIC_RANGE_COLUMNS, GENOMIC_RANGE_EXPR, GENOMIC_RANGE_OPERATORS, GENOMIC_RANGE_PREDICATE
+from vcf_classify import annotate_vcf_bytes
 import re
 
 
@@ -24,12 +31,96 @@ DB_CONFIG={
     "port":5432
 }
 
+# Pagination: keyset στο variation_id με όριο μεγέθους σελίδας
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+NEXT_PAGE_HEADER = "X-Next-After-Id"
+
+
+def _keyset(query: str, params: list, after_id: Optional[int]) -> Tuple[str, list]:
+    """Προσθέτει 'variation_id > after_id' και ταξινόμηση κατά variation_id σε query με WHERE"""
+    params = list(params)
+    if after_id is not None:
+        params.append(after_id)
+        query += f" AND variation_id > ${len(params)}"
+    return query + " ORDER BY variation_id", params
+
+
+async def fetch_page(query: str, params: list, after_id: Optional[int], limit: int, response: Response) -> List[dict]:
+    """
+    Μία σελίδα αποτελεσμάτων. Αν υπάρχουν κι άλλες γραμμές, το header X-Next-After-Id
+    δίνει το after_id της επόμενης σελίδας (το body μένει ίδιας μορφής).
+    """
+    query, params = _keyset(query, params, after_id)
+    params.append(limit + 1)
+    rows = await fetch_all(query + f" LIMIT ${len(params)}", *params)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_PAGE_HEADER] = str(rows[-1]["variation_id"])
+    return rows
+
+
+async def fetch_results(
+    query: str, params: list, after_id: Optional[int], limit: Optional[int], response: Response
+) -> List[dict]:
+    """
+    Opt-in pagination: χωρίς limit / after_id επιστρέφονται όλα τα αποτελέσματα (όπως πριν),
+    αλλιώς μία σελίδα του fetch_page (limit ή DEFAULT_PAGE_SIZE γραμμές).
+    """
+    if limit is None and after_id is None:
+        return await fetch_all(query, *params)
+    return await fetch_page(query, params, after_id, limit or DEFAULT_PAGE_SIZE, response)
+
+
+def ndjson_response(query: str, params: list, after_id: Optional[int], as_values: bool = False) -> StreamingResponse:
+    """
+    NDJSON export (μία γραμμή JSON ανά μετάλλαξη) από server-side cursor, σε σταθερή μνήμη.
+    Με as_values=True κάθε γραμμή είναι λίστα τιμών, για endpoints που επιστρέφουν γραμμές ως λίστες.
+    """
+    query, params = _keyset(query, params, after_id)
+
+    async def lines():
+        async for row in stream_rows(query, *params):
+            yield json.dumps(list(row.values()) if as_values else row, default=str, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 # Ρίζα - απλό health check
 @app.get("/")
 def health_check():
     return{"status":"clinvar api is running"}
 
 
+# Κοινόχρηστα pools συνδέσεων: ανοίγουν στο startup και κλείνουν στο shutdown.
+# Τα query endpoints είναι async (asyncpg). Τα endpoints ταξινόμησης (user_classify_variant(s), acmg_criteria,
+# classify_vcf) μένουν sync με psycopg2 στο threadpool: χρησιμοποιούν τα lookups του acmg_aggregates, που παίρνουν
+# psycopg2 cursor επειδή τα μοιράζεται και το CLI του vcf_classify, και το classify_vcf διαβάζει sync
+# το upload. Δεν υπάρχει πια pandas σε αυτά, μόνο point lookups στα aggregates.
+@app.on_event("startup")
+async def open_db_pool():
+    init_pool(DB_CONFIG)
+    await init_async_pool(DB_CONFIG)
+
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    close_pool()
+    await close_async_pool()
+
+
+# Μετρικές των pools (σε χρήση, αναμονές, exhaustion timeouts)
+@app.get("/pool_stats")
+def get_pool_stats():
+    return {"sync": pool_stats(), "async": async_pool_stats()}
+
+
+# Μετρικές του cache απαντήσεων (hits / misses / evictions, τρέχον release)
+@app.get("/cache_stats")
+def get_cache_stats():
+    return api_cache.snapshot()
+
+
 '''
 # --- NEW --- #
 @app.get("/user_classify_variant")  
@@ -60,7 +151,7 @@ def user_classify_variant(
 ):
     conn = None 
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
         query = """
@@ -97,11 +188,49 @@ def user_classify_variant(
     except Exception as e:
         return{"error": str(e)}
     finally:
-        if conn:
-            conn.close()
+        release_connection(conn)
 
 '''
-@app.get("/user_classify_variant")  
+def protein_pos_from_hgvs_p(hgvs_p: Optional[str]) -> Optional[int]:
+    """Θέση πρωτεΐνης από το p.HGVS του χρήστη (π.χ. p.Arg175His -> 175)"""
+    if hgvs_p:
+        match = re.search(r"\d+", hgvs_p)
+        if match:
+            return int(match.group())
+    return None
+
+
+def known_variant_summary(variant: dict, hgvs_p: Optional[str]) -> dict:
+    """Απάντηση για μετάλλαξη που υπάρχει ήδη στο gene_variants"""
+    return {
+        "variant id": variant.get("variation_id"),
+        "gene": variant.get("gene_symbol"),
+        "c.HGVS": variant.get("hgvs_c"),
+        "p.HGVS": hgvs_p.strip() if hgvs_p else variant.get("hgvs_p"),
+        "protein_pos": variant.get("protein_pos"),
+        "molecular_consequence": variant.get("molecular_consequence"),
+        "clinicalsignificance": variant.get("clinicalsignificance"),
+        "review_status": variant.get("review_status"),
+        "other_fields": {k: v for k, v in variant.items() if k not in [
+            "gene_symbol", "transcript_id", "hgvs_c", "hgvs_p", "protein_pos",
+            "molecular_consequence", "clinicalsignificance", "review_status"
+        ]}
+    }
+
+
+def novel_variant_result(gene_symbol: str, hgvs_c: str, hgvs_p: Optional[str], criteria: List[str]) -> dict:
+    """Απάντηση για νέα μετάλλαξη με τα κριτήρια PS1/PM5/PP5/BP6"""
+    return {
+        "gene": gene_symbol,
+        "hgvs_c": hgvs_c,
+        "hgvs_p": hgvs_p,
+        "criteria": criteria,
+        "conflict_score": len(criteria)
+    }
+
+
+@app.get("/user_classify_variant")
+@cached_endpoint
 def user_classify_variant(
     gene_symbol: str = Query(..., description="Gene symbol (e.g., BRCA1)"),
     hgvs_c: str = Query(..., description="c.HGVS notation (e.g., c.123G>T)"),
@@ -109,7 +238,7 @@ def user_classify_variant(
 ):
     conn = None 
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
         # 1. Αναζήτηση παραλλαγής με gene + hgvs_c
@@ -124,66 +253,119 @@ def user_classify_variant(
 
         # 2. Αν βρεθεί, επιστρέφουμε τα δεδομένα
         if results:
-            variant = results[0]
-            variant_summary = {
-                "variant id": variant.get("variation_id"),
-                "gene": variant.get("gene_symbol"),
-                "c.HGVS": variant.get("hgvs_c"),
-                "p.HGVS": hgvs_p.strip() if hgvs_p else variant.get("hgvs_p"),
-                "protein_pos": variant.get("protein_pos"),
-                "molecular_consequence": variant.get("molecular_consequence"),
-                "clinicalsignificance": variant.get("clinicalsignificance"),
-                "review_status": variant.get("review_status"),
-                "other_fields": {k: v for k, v in variant.items() if k not in [
-                    "gene_symbol", "transcript_id", "hgvs_c", "hgvs_p", "protein_pos", 
-                    "molecular_consequence", "clinicalsignificance", "review_status"
-                ]}
-            }
-            return variant_summary
+            return known_variant_summary(results[0], hgvs_p)
 
         # 3. Αν ΔΕΝ βρεθεί, κάνουμε grouping by gene για PS1/PM5/PP5/BP6
-        cur.execute("""
-            SELECT gene_symbol, hgvs_c, hgvs_p, protein_pos, clinicalsignificance, clinsigsimple
-            FROM gene_variants
-            WHERE gene_symbol = %s;
-        """, (gene_symbol,))
-        variants = cur.fetchall()
-
-        if not variants:
+        if not gene_exists(cur, gene_symbol):
             return {"error": f"Δεν βρέθηκαν μεταλλάξεις για το γονίδιο {gene_symbol}"}
 
-        df = pd.DataFrame(variants)
+        # Point lookups στα προϋπολογισμένα aggregates του γονιδίου (acmg_aggregates), χωρίς φόρτωση σε pandas
+        criteria = lookup_criteria(cur, gene_symbol, hgvs_c, hgvs_p, protein_pos_from_hgvs_p(hgvs_p))
+        return novel_variant_result(gene_symbol, hgvs_c, hgvs_p, criteria)
 
-        protein_pos = None
-        if hgvs_p:
-            match = re.search(r"\d+", hgvs_p)
-            if match:
-                protein_pos = int(match.group())
+    except Exception as e:
+        return {"error": str(e)}
+    finally:
+        release_connection(conn)
 
-        # ✅ Διορθωμένο: το σωστό key είναι gene_symbol
-        row = pd.Series({
-            "gene_symbol": gene_symbol,
-            "hgvs_c": hgvs_c,
-            "hgvs_p": hgvs_p,
-            "protein_pos": protein_pos
-            
-        })
 
-        criteria = apply_ps1_pm5_pp5_bp6(row, df)
+# Batch ταξινόμηση: όλες οι μεταλλάξεις ενός δείγματος σε ένα POST
+MAX_BATCH_SIZE = 5000
 
-        return {
-            "gene": gene_symbol,
-            "hgvs_c": hgvs_c,
-            "hgvs_p": hgvs_p,
-            "criteria": criteria,
-            "conflict_score": len(criteria)
-        }
 
+class VariantInput(BaseModel):
+    gene_symbol: str                # Π.χ., "BRCA1"
+    hgvs_c: str                     # Π.χ., "c.123G>T"
+    hgvs_p: Optional[str] = None    # Π.χ., "p.Val12Cys"
+
+
+def classify_variants_batch(cur, variants: List[VariantInput]) -> List[dict]:
+    """
+    Ίδιο αποτέλεσμα με το /user_classify_variant για κάθε μετάλλαξη, με σταθερό πλήθος queries:
+    ένα join για τις γνωστές, ένα για τα γονίδια που υπάρχουν και ένα για τα κριτήρια των νέων.
+    """
+    inputs = [
+        (v.gene_symbol.strip(), v.hgvs_c.strip(), v.hgvs_p.strip() if v.hgvs_p else None)
+        for v in variants
+    ]
+
+    # 1. Γνωστές μεταλλάξεις με ένα join στα ζεύγη (gene_symbol, hgvs_c)
+    pairs = sorted({(gene, hgvs_c) for gene, hgvs_c, _ in inputs})
+    cur.execute("""
+        SELECT g.*
+        FROM gene_variants g
+        JOIN unnest(%s::text[], %s::text[]) AS q(gene_symbol, hgvs_c)
+          ON g.gene_symbol = q.gene_symbol AND g.hgvs_c = q.hgvs_c
+    """, ([gene for gene, _ in pairs], [hgvs_c for _, hgvs_c in pairs]))
+    known = {}
+    for variant in cur.fetchall():
+        known.setdefault((variant["gene_symbol"], variant["hgvs_c"]), variant)
+
+    # 2. Νέες μεταλλάξεις: έλεγχος γονιδίων και κριτήρια από τα aggregates, ομαδικά
+    novel = [i for i, (gene, hgvs_c, _) in enumerate(inputs) if (gene, hgvs_c) not in known]
+    genes = existing_genes(cur, {inputs[i][0] for i in novel})
+    scored = [i for i in novel if inputs[i][0] in genes]
+    criteria = lookup_criteria_batch(cur, [
+        (inputs[i][0], inputs[i][1], inputs[i][2], protein_pos_from_hgvs_p(inputs[i][2])) for i in scored
+    ])
+    criteria_by_index = dict(zip(scored, criteria))
+
+    results = []
+    for i, (gene, hgvs_c, hgvs_p) in enumerate(inputs):
+        if (gene, hgvs_c) in known:
+            results.append(known_variant_summary(known[(gene, hgvs_c)], hgvs_p))
+        elif gene not in genes:
+            results.append({"error": f"Δεν βρέθηκαν μεταλλάξεις για το γονίδιο {gene}"})
+        else:
+            results.append(novel_variant_result(gene, hgvs_c, hgvs_p, criteria_by_index[i]))
+    return results
+
+
+@app.post("/user_classify_variants")
+def user_classify_variants(variants: List[VariantInput]):
+    if len(variants) > MAX_BATCH_SIZE:
+        return {"error": f"Μέγιστο {MAX_BATCH_SIZE} μεταλλάξεις ανά αίτημα"}
+
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        return {"results": classify_variants_batch(cur, variants)}
     except Exception as e:
         return {"error": str(e)}
     finally:
-        if conn:
-            conn.close()
+        release_connection(conn)
+
+
+@app.post("/classify_vcf")
+def classify_vcf(
+    file: UploadFile = File(..., description="VCF δείγματος (.vcf ή .vcf.gz)"),
+    output_format: str = Query("tsv", description="tsv ή vcf (annotated VCF)"),
+):
+    if output_format not in ("tsv", "vcf"):
+        return {"error": "Το output_format πρέπει να είναι tsv ή vcf"}
+
+    conn = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        chunks = annotate_vcf_bytes(file.file, cur, output_format)
+        # Το header διαβάζεται πριν ξεκινήσει η απάντηση, ώστε ένα μη έγκυρο VCF να επιστρέφει error
+        header = next(chunks)
+    except Exception as e:
+        release_connection(conn)
+        return {"error": str(e)}
+
+    def body():
+        # Η σύνδεση μένει δεσμευμένη όσο γίνεται το streaming των batches
+        try:
+            yield header
+            yield from chunks
+        finally:
+            release_connection(conn)
+
+    media_type = "text/tab-separated-values" if output_format == "tsv" else "text/plain"
+    return StreamingResponse(body(), media_type=media_type)
 
 
 
@@ -228,7 +410,7 @@ def calculate_pp5_bp6_from_summary(variants):
 def get_acmg_criteria(gene: str = Query(..., description="Γονίδιο π.χ. KLHL10")):
     conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
         cur.execute("""
@@ -254,8 +436,7 @@ def get_acmg_criteria(gene: str = Query(..., description="Γονίδιο π.χ.
     except Exception as e:
         return {"error": str(e)}
     finally:
-        if conn:
-            conn.close()
+        release_connection(conn)
 
 '''
 
@@ -268,80 +449,64 @@ def get_acmg_criteria(
 ):
     conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        cur.execute("""
-            SELECT gene_symbol, hgvs_c, hgvs_p, protein_pos, clinicalsignificance, clinsigsimple
-            FROM gene_variants
-            WHERE gene_symbol = %s;
-        """, (gene_symbol,))
-        variants = cur.fetchall()
-
-        if not variants:
+        if not gene_exists(cur, gene_symbol):
             return {"error": f"Δεν βρέθηκαν μεταλλάξεις για το γονίδιο {gene_symbol}"}
 
-        df = pd.DataFrame(variants)
-
-        protein_pos = None
-        if hgvs_p:
-            match = re.search(r"\d+", hgvs_p)
-            if match:
-                protein_pos = int(match.group())
-
-        row = pd.Series({
-            "gene_symbol": gene_symbol,
-            "hgvs_c": hgvs_c,
-            "hgvs_p": hgvs_p,
-            "protein_pos": protein_pos
-        })
-        criteria = apply_ps1_pm5_pp5_bp6(row, df)
-
-        return {
-            "gene": gene_symbol,
-            "hgvs_c": hgvs_c,
-            "hgvs_p": hgvs_p,
-            "criteria": criteria,
-            "conflict_score": len(criteria)
-        }
+        # Point lookups στα προϋπολογισμένα aggregates του γονιδίου (acmg_aggregates), χωρίς φόρτωση σε pandas
+        criteria = lookup_criteria(cur, gene_symbol, hgvs_c, hgvs_p, protein_pos_from_hgvs_p(hgvs_p))
+        return novel_variant_result(gene_symbol, hgvs_c, hgvs_p, criteria)
 
     except Exception as e:
         return {"error": str(e)}
     finally:
-        if conn:
-            conn.close()
+        release_connection(conn)
 
 
 
 @app.get("/variants_by_genomic_range")
-def variants_by_genomic_range(
-    gene: str = Query(..., description="Gene symbol (e.g., TP53)"),
+async def variants_by_genomic_range(
+    response: Response,
     start: int = Query(..., description="Start genomic position (e.g., 7668402)"),
-    end: int = Query(..., description="End genomic position (e.g., 7687550)")
+    end: int = Query(..., description="End genomic position (e.g., 7687550)"),
+    gene: Optional[str] = Query(None, description="Gene symbol (e.g., TP53)"),
+    chromosome: Optional[str] = Query(None, description="Χρωμόσωμα (π.χ. 17) για αναζήτηση σε όλη την περιοχή"),
+    mode: str = Query("contained", description="contained: μεταλλάξεις μέσα στο παράθυρο, overlap: όσες το επικαλύπτουν"),
+    after_id: Optional[int] = Query(None, description="Keyset: επόμενη σελίδα μετά από αυτό το variation_id"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Μέγεθος σελίδας (χωρίς limit: όλα)"),
+    stream: bool = Query(False, description="NDJSON streaming όλων των αποτελεσμάτων")
 ):
-    conn = None
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+    if mode not in GENOMIC_RANGE_OPERATORS:
+        return {"error": f"Το mode πρέπει να είναι ένα από: {', '.join(GENOMIC_RANGE_OPERATORS)}"}
+    if not gene and not chromosome:
+        return {"error": "Απαιτείται gene ή chromosome"}
+    if start > end:
+        return {"error": "Το start πρέπει να είναι μικρότερο ή ίσο του end"}
 
-        query = """
-        SELECT gene_symbol, protein_pos, hgvs_c, hgvs_p, clinicalsignificance, molecular_consequence
+    try:
+        # Το διάστημα της μετάλλαξης συγκρίνεται με το παράθυρο μέσω του GiST index (db_schema)
+        query = f"""
+        SELECT {GENOMIC_RANGE_COLUMNS}
         FROM gene_variants
-        WHERE gene_symbol = %s
-          AND start_pos >= %s
-          AND end_pos <= %s
+        WHERE {GENOMIC_RANGE_PREDICATE}
+          AND {GENOMIC_RANGE_EXPR} {GENOMIC_RANGE_OPERATORS[mode]} int8range($1, $2, '[]')
         """
-        cur.execute(query, (gene, start, end))
-        results = cur.fetchall()
+        params = [start, end]
+        if gene:
+            params.append(gene)
+            query += f" AND gene_symbol = ${len(params)}"
+        if chromosome:
+            params.append(chromosome)
+            query += f" AND chromosome = ${len(params)}"
+
+        if stream:
+            return ndjson_response(query, params, after_id)
+        return {"results": await fetch_results(query, params, after_id, limit, response)}
 
-        return {"results": results}
-    
     except Exception as e:
         return {"error": str(e)}
-    
-    finally:
-        if conn:
-            conn.close()
 
 
 '''
@@ -355,7 +520,7 @@ def variants_by_protein_pos(
 
     conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
         query = """
@@ -373,44 +538,38 @@ def variants_by_protein_pos(
         return {"error": str(e)}
     
     finally:
-        if conn:
-            conn.close()
+        release_connection(conn)
 
 '''
 
 
 @app.get("/variants_by_protein_pos")
-def get_variants_by_protein_pos(
+async def get_variants_by_protein_pos(
+    response: Response,
     gene: str = Query(..., description="Gene symbol (e.g. TP53)"),
     start_pos: int = Query(..., description="Start of protein position range (e.g. 100)"),
-    end_pos: Optional[int] = Query(None, description="End of protein position range (optional)")
+    end_pos: Optional[int] = Query(None, description="End of protein position range (optional)"),
+    after_id: Optional[int] = Query(None, description="Keyset: επόμενη σελίδα μετά από αυτό το variation_id"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Μέγεθος σελίδας (χωρίς limit: όλα)"),
+    stream: bool = Query(False, description="NDJSON streaming όλων των αποτελεσμάτων")
 ):
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
-    
+    params = [gene, start_pos]
     if end_pos is not None:
-        query = """
-        SELECT * FROM gene_variants
-        WHERE gene_symbol = %s
-        AND protein_pos BETWEEN %s AND %s
-        """
-        cur.execute(query, (gene, start_pos, end_pos))
+        params.append(end_pos)
+        where = "WHERE gene_symbol = $1 AND protein_pos BETWEEN $2 AND $3"
     else:
-        query = """
-        SELECT * FROM gene_variants
-        WHERE gene_symbol = %s
-        AND protein_pos = %s
-        """
-        cur.execute(query, (gene, start_pos))
+        where = "WHERE gene_symbol = $1 AND protein_pos = $2"
 
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return rows
+    # Ίδια μορφή με πριν σε όλους τους τρόπους (λίστα τιμών ανά γραμμή, όπως ο απλός cursor)
+    if stream:
+        return ndjson_response("SELECT * FROM gene_variants " + where, params, after_id, as_values=True)
+
+    rows = await fetch_results("SELECT * FROM gene_variants " + where, params, after_id, limit, response)
+    return [list(row.values()) for row in rows]
 
 
 @app.get("/variant_counts")
-def get_variant_counts(
+async def get_variant_counts(
     gene: str = Query(...,description="Γονίδιο π.χ. KLHL10"),
     consequence: Optional[str] = Query(None, description="Τύπος μετάλλαξης π.χ. missense"),
     significance: Optional[str] = Query(None, description="Παθογένεια π.χ. Pathogenic"),
@@ -421,91 +580,72 @@ def get_variant_counts(
     """
     Επιστρέφει πλήθος μεταλλάξεων με βάση φίλτρα: τύπος, παθογένεια, θέση πρωτεΐνης
     """
-    conn = None
-    try: 
-        conn=psycopg2.connect(**DB_CONFIG)
-        cur=conn.cursor()
-
-        query="SELECT COUNT(*) FROM gene_variants WHERE gene_symbol = %s"
+    try:
+        query = "SELECT COUNT(*) FROM gene_variants WHERE gene_symbol = $1"
         params = [gene]
 
         if consequence:
-            query += " AND molecular_consequence ILIKE %s"
             params.append(f"%{consequence}%")
+            query += f" AND molecular_consequence ILIKE ${len(params)}"
 
         if significance:
-            query += " AND clinicalsignificance ILIKE %s"
             params.append(f"%{significance}%")
+            query += f" AND clinicalsignificance ILIKE ${len(params)}"
 
 
         if exact_position is not None:
-            query += " AND protein_pos = %s"
             params.append(exact_position)
+            query += f" AND protein_pos = ${len(params)}"
         elif protein_start is not None and protein_end is not None:
-            query += " AND protein_pos BETWEEN %s AND %s"
             params.extend([protein_start, protein_end])
+            query += f" AND protein_pos BETWEEN ${len(params) - 1} AND ${len(params)}"
 
-        cur.execute(query, tuple(params))
-        count = cur.fetchone()[0]
+        count = await fetch_value(query, *params)
         return {"count": count}
-    
+
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        if conn:
-            conn.close()
 
 # 1. Summary by molecular consequence
 @app.get("/summary")
-def summary_by_consequence(gene: str = Query(...)):
-    conn = None
+@cached_endpoint
+async def summary_by_consequence(gene: str = Query(...)):
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("""
+        results = await fetch_all("""
             SELECT molecular_consequence, COUNT(*) as count
             FROM gene_variants
-            WHERE gene_symbol = %s
+            WHERE gene_symbol = $1
             GROUP BY molecular_consequence
             ORDER BY count DESC;
-        """, (gene,))
-        results = cur.fetchall()
+        """, gene)
         summary = {row['molecular_consequence']: row['count'] for row in results}
         return {"gene": gene, "summary": summary}
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        if conn: conn.close()
-
 
 
 #Ομαδοποίηση με βάση παθογένεια
 @app.get("/significance_summary")
-def significance_summary(gene: str = Query(...)):
-    conn = None
+@cached_endpoint
+async def significance_summary(gene: str = Query(...)):
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        cur.execute("""
+        rows = await fetch_all("""
             SELECT clinicalsignificance, COUNT(*) as count
             FROM gene_variants
-            WHERE gene_symbol = %s
+            WHERE gene_symbol = $1
             GROUP BY clinicalsignificance
             ORDER BY count DESC;
-        """, (gene,))
-        rows = cur.fetchall()
+        """, gene)
         return {"gene": gene, "summary": {r['clinicalsignificance']: r['count'] for r in rows}}
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        if conn: conn.close()
 
 
 # Αναζήτηση με τύπο παραλλαγής + παθογένεια
 def variant_counts(gene: str, consequence: Optional[str] = None, significance: Optional[str] = None):
     conn = None    
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_connection()
         cur = conn.cursor()
         query = "SELECT COUNT(*) FROM gene_variants WHERE gene_symbol = %s"
         params = [gene]
@@ -521,14 +661,14 @@ def variant_counts(gene: str, consequence: Optional[str] = None, significance: O
     except Exception as e:
         return {"error": str(e)}
     finally:
-        if conn: conn.close()
+        release_connection(conn)
     
 '''
 @app.get("/variants_by_position")
 def variants_by_position(gene: str, min_pos: Optional[int] = None, max_pos: Optional[int] = None):
     conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = get_connection()
         cur = conn.cursor(cursor_factory=RealDictCursor)
         query = "SELECT * FROM gene_variants WHERE gene_symbol = %s"
         params = [gene]
@@ -543,67 +683,60 @@ def variants_by_position(gene: str, min_pos: Optional[int] = None, max_pos: Opti
     except Exception as e:
         return {"error": str(e)}
     finally:
-        if conn: conn.close()
+        release_connection(conn)
 '''
 
 @app.get("/available_genes")
-def available_genes():
-    conn = None
+@cached_endpoint
+async def available_genes():
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        cur.execute("SELECT DISTINCT gene_symbol FROM gene_variants ORDER BY gene_symbol")
-        genes = [r[0] for r in cur.fetchall()]
+        rows = await fetch_all("SELECT DISTINCT gene_symbol FROM gene_variants ORDER BY gene_symbol")
+        genes = [r['gene_symbol'] for r in rows]
         return {"genes": genes}
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        if conn: conn.close()
 
 # 6. Available consequence types
 @app.get("/available_consequences")
-def available_consequences():
-    conn = None
+@cached_endpoint
+async def available_consequences():
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor()
-        cur.execute("SELECT DISTINCT molecular_consequence FROM gene_variants ORDER BY molecular_consequence")
-        types = [r[0] for r in cur.fetchall()]
+        rows = await fetch_all("SELECT DISTINCT molecular_consequence FROM gene_variants ORDER BY molecular_consequence")
+        types = [r['molecular_consequence'] for r in rows]
         return {"consequences": types}
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        if conn: conn.close()
 
 # 7. Search with multiple filters
 @app.get("/search_variants")
-def search_variants(
+async def search_variants(
+    response: Response,
     gene: Optional[str] = None,
     consequence: Optional[str] = None,
     significance: Optional[str] = None,
-    protein_pos: Optional[int] = None
+    protein_pos: Optional[int] = None,
+    after_id: Optional[int] = Query(None, description="Keyset: επόμενη σελίδα μετά από αυτό το variation_id"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Μέγεθος σελίδας"),
+    stream: bool = Query(False, description="NDJSON streaming όλων των αποτελεσμάτων")
 ):
-    conn = None
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
         query = "SELECT * FROM gene_variants WHERE 1=1"
         params = []
         if gene:
-            query += " AND gene_symbol = %s"
             params.append(gene)
+            query += f" AND gene_symbol = ${len(params)}"
         if consequence:
-            query += " AND molecular_consequence ILIKE %s"
             params.append(f"%{consequence}%")
+            query += f" AND molecular_consequence ILIKE ${len(params)}"
         if significance:
-            query += " AND clinicalsignificance ILIKE %s"
             params.append(f"%{significance}%")
+            query += f" AND clinicalsignificance ILIKE ${len(params)}"
         if protein_pos is not None:
-            query += " AND protein_pos = %s"
             params.append(protein_pos)
-        cur.execute(query, tuple(params))
-        return cur.fetchall()
+            query += f" AND protein_pos = ${len(params)}"
+
+        if stream:
+            return ndjson_response(query, params, after_id)
+        return await fetch_page(query, params, after_id, limit, response)
     except Exception as e:
         return {"error": str(e)}
-    finally:
-        if conn: conn.close()
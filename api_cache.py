@@ -0,0 +1,131 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from autoupdate import METADATA_FILE, load_local_metadata
+
+
+# --- Ρυθμίσεις cache (με override από μεταβλητές περιβάλλοντος) ---
+API_CACHE_SIZE = int(os.environ.get("CLINVAR_API_CACHE_SIZE", "4096"))  # μέγιστο πλήθος αποθηκευμένων απαντήσεων
+API_CACHE_TTL = float(os.environ.get("CLINVAR_API_CACHE_TTL", "3600"))  # δευτερόλεπτα ζωής κάθε απάντησης
+
+_MISSING = object()
+
+
+class ReleaseCache:
+    """
+    Bounded LRU cache με TTL για απαντήσεις του API.
+    Τα δεδομένα αλλάζουν μόνο σε νέο ClinVar release, οπότε όταν αλλάξει το release_date
+    του metadata/clinvar_metadata.json (autoupdate.save_local_metadata) το cache αδειάζει.
+    """
+
+    def __init__(self, max_size: int = API_CACHE_SIZE, ttl: float = API_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._release: Optional[str] = None
+        self._metadata_mtime: Optional[float] = None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def _check_release(self) -> None:
+        """Ελέγχει (μόνο όταν αλλάξει το mtime του αρχείου) αν άλλαξε το release και αδειάζει το cache"""
+        try:
+            mtime = os.path.getmtime(METADATA_FILE)
+        except OSError:
+            mtime = None
+        if mtime == self._metadata_mtime:
+            return
+        self._metadata_mtime = mtime
+        metadata = load_local_metadata()
+        release = metadata.get("release_date") if metadata else None
+        if release != self._release:
+            if self._release is not None or self._entries:
+                self.invalidate()
+            self._release = release
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            self._check_release()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def invalidate(self) -> None:
+        """Άδειασμα όλου του cache (π.χ. σε νέο release)"""
+        self._entries.clear()
+        self.stats["invalidations"] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(
+                self.stats,
+                size=len(self._entries),
+                max_size=self.max_size,
+                ttl=self.ttl,
+                release=self._release,
+                hit_ratio=round(self.stats["hits"] / lookups, 4) if lookups else None,
+            )
+
+
+api_cache = ReleaseCache()
+
+
+def _cacheable(result: Any) -> bool:
+    """Δεν αποθηκεύονται απαντήσεις σφάλματος ({'error': ...})"""
+    return not (isinstance(result, dict) and "error" in result)
+
+
+def cached_endpoint(func: Callable) -> Callable:
+    """
+    Decorator για endpoints (sync ή async): κλειδί είναι το όνομα της συνάρτησης και τα ορίσματα.
+    Το functools.wraps κρατά την υπογραφή, οπότε το FastAPI βλέπει τις ίδιες παραμέτρους.
+    """
+    def _key(kwargs: Dict) -> Hashable:
+        return (func.__name__, tuple(sorted(kwargs.items())))
+
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(**kwargs):
+            key = _key(kwargs)
+            result = api_cache.get(key)
+            if result is _MISSING:
+                result = await func(**kwargs)
+                if _cacheable(result):
+                    api_cache.set(key, result)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(**kwargs):
+        key = _key(kwargs)
+        result = api_cache.get(key)
+        if result is _MISSING:
+            result = func(**kwargs)
+            if _cacheable(result):
+                api_cache.set(key, result)
+        return result
+    return wrapper
@@ -0,0 +1,106 @@
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import asyncpg
+
+
+# --- Ρυθμίσεις async pool (με override από μεταβλητές περιβάλλοντος) ---
+ASYNC_POOL_MIN_SIZE = int(os.environ.get("CLINVAR_ASYNC_POOL_MIN", "5"))
+ASYNC_POOL_MAX_SIZE = int(os.environ.get("CLINVAR_ASYNC_POOL_MAX", "50"))
+ASYNC_POOL_TIMEOUT = float(os.environ.get("CLINVAR_ASYNC_POOL_TIMEOUT", "5"))  # αναμονή για ελεύθερη σύνδεση
+COMMAND_TIMEOUT = float(os.environ.get("CLINVAR_DB_COMMAND_TIMEOUT", "30"))
+STREAM_PREFETCH = 1000  # γραμμές ανά fetch του server-side cursor στα streaming exports
+
+_pool: Optional[asyncpg.Pool] = None
+
+
+def asyncpg_config(db_config: Dict) -> Dict:
+    """Μετατροπή του DB_CONFIG (psycopg2) στα ονόματα παραμέτρων του asyncpg"""
+    config = dict(db_config)
+    if "dbname" in config:
+        config["database"] = config.pop("dbname")
+    return config
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    # JSONB σε Python τιμές, όπως επιστρέφει το psycopg2 (acmg_criteria, conflicting_interpretations)
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def init_async_pool(
+    db_config: Dict,
+    min_size: int = ASYNC_POOL_MIN_SIZE,
+    max_size: int = ASYNC_POOL_MAX_SIZE,
+) -> None:
+    """Δημιουργία του asyncpg pool (μία φορά, στο startup του API)"""
+    global _pool
+    if _pool is not None:
+        return
+    _pool = await asyncpg.create_pool(
+        min_size=min_size,
+        max_size=max_size,
+        command_timeout=COMMAND_TIMEOUT,
+        init=_init_connection,
+        **asyncpg_config(db_config),
+    )
+    print(f"Async pool συνδέσεων βάσης: {min_size}-{max_size} συνδέσεις")
+
+
+async def close_async_pool() -> None:
+    """Κλείσιμο του asyncpg pool (στο shutdown του API)"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+    _pool = None
+
+
+def get_async_pool() -> asyncpg.Pool:
+    if _pool is None:
+        raise RuntimeError("Το async pool δεν έχει αρχικοποιηθεί (init_async_pool)")
+    return _pool
+
+
+async def fetch_all(query: str, *params: Any) -> List[Dict]:
+    """Όλες οι γραμμές ως dicts (όπως το RealDictCursor)"""
+    async with get_async_pool().acquire(timeout=ASYNC_POOL_TIMEOUT) as conn:
+        rows = await conn.fetch(query, *params)
+    return [dict(row) for row in rows]
+
+
+async def fetch_one(query: str, *params: Any) -> Optional[Dict]:
+    """Η πρώτη γραμμή ως dict ή None"""
+    async with get_async_pool().acquire(timeout=ASYNC_POOL_TIMEOUT) as conn:
+        row = await conn.fetchrow(query, *params)
+    return dict(row) if row is not None else None
+
+
+async def fetch_value(query: str, *params: Any) -> Any:
+    """Μία τιμή (π.χ. COUNT(*))"""
+    async with get_async_pool().acquire(timeout=ASYNC_POOL_TIMEOUT) as conn:
+        return await conn.fetchval(query, *params)
+
+
+async def stream_rows(query: str, *params: Any, prefetch: int = STREAM_PREFETCH) -> AsyncIterator[Dict]:
+    """
+    Γραμμές ως dicts μέσω server-side cursor (μέσα σε transaction), prefetch γραμμές τη φορά.
+    Η μνήμη μένει σταθερή ανεξάρτητα από το μέγεθος του αποτελέσματος.
+    Η σύνδεση κρατιέται μέχρι να εξαντληθεί (ή να κλείσει) ο generator.
+    """
+    async with get_async_pool().acquire(timeout=ASYNC_POOL_TIMEOUT) as conn:
+        async with conn.transaction(readonly=True):
+            async for row in conn.cursor(query, *params, prefetch=prefetch):
+                yield dict(row)
+
+
+def async_pool_stats() -> Dict:
+    """Μέγεθος και ελεύθερες συνδέσεις του async pool"""
+    if _pool is None:
+        return {"initialized": False}
+    return {
+        "initialized": True,
+        "size": _pool.get_size(),
+        "idle": _pool.get_idle_size(),
+        "min_size": _pool.get_min_size(),
+        "max_size": _pool.get_max_size(),
+    }
@@ -10,14 +10,30 @@ import time
 import shutil
 import argparse
 import json
-from typing import Optional, Dict, Union
+import io
+import numpy as np
+from typing import Optional, Dict, Set, Union
 import psycopg2
 from psycopg2 import sql
+from clinvar_stream import ASSEMBLY_FILTER, COMPACT_COLUMNS, WORKERS, gene_matches, stream_variant_summary
 
 # Σταθερές
 CLINVAR_README_URL = "https://ftp.ncbi.nlm.nih.gov/pub/clinvar/README.txt"  # URL για το αρχείο README του ClinVar
 METADATA_DIR = "metadata"  # Φάκελος για αποθήκευση μεταδεδομένων
 METADATA_FILE = os.path.join(METADATA_DIR, "clinvar_metadata.json")  # Αρχείο μεταδεδομένων
+CLINVAR_VARIANT_URL = "https://ftp.ncbi.nlm.nih.gov/pub/clinvar/tab_delimited/variant_summary.txt.gz"
+
+# Hash περιεχομένου ανά VariationID του τελευταίου release που φορτώθηκε (για το incremental update).
+# gene_field είναι το GeneSymbol όπως στο αρχείο (π.χ. 'TP53;WRAP53'), ίδιο με το gene_symbol του gene_variants.
+SOURCE_HASHES_SQL = """
+CREATE TABLE IF NOT EXISTS clinvar_source_hashes (
+    variation_id BIGINT PRIMARY KEY,
+    gene_field TEXT NOT NULL,
+    source_hash BIGINT NOT NULL
+);
+"""
+# Στήλες του variant_summary που επηρεάζουν το gene_variants (το compact σχήμα του pipeline)
+SOURCE_HASH_COLUMNS = sorted(COMPACT_COLUMNS)
 
 def get_clinvar_release_date() -> str:
     """Επιστρέφει την ημερομηνία release του ClinVar σε μορφή YYYYMMDD"""
@@ -114,7 +130,8 @@ def download_file(
     timeout: tuple = (10, 30),  # (connect, read)
     max_retries: int = 3,
     backoff_factor: float = 1.5,
-    chunk_size: int = 8192
+    chunk_size: int = 8192,
+    extract: bool = True
 ) -> None:
     """Κατέβασμα αρχείου με timeout, επανάληψη και progress tracking"""
     headers = {
@@ -145,7 +162,7 @@ def download_file(
                 print("\nΕπιτυχές κατέβασμα!")
                 
                 # Έλεγχος και αποσυμπίεση gzip
-                if output_path.endswith('.gz'):
+                if output_path.endswith('.gz') and extract:
                     print("Έλεγχος gzip αρχείου...")
                     with open(output_path, 'rb') as f:
                         if f.read(2) != b'\x1f\x8b':
@@ -235,22 +252,152 @@ def needs_update(remote_date: str, local_date: Optional[str], force: bool = Fals
         print(f"Σφάλμα ανάλυσης ημερομηνιών: {str(e)}")
         return True
 
-def update_database(data_file: str) -> None:
-    """Ενημερώνει τη βάση δεδομένων με τα νέα δεδομένα"""
+def download_clinvar_data(output_path: str = "variant_summary.txt.gz") -> str:
+    """Κατέβασμα του variant_summary.txt.gz (χωρίς αποσυμπίεση, το pipeline το διαβάζει streaming)"""
+    download_file(CLINVAR_VARIANT_URL, output_path, extract=False)
+    return output_path
+
+
+def source_hashes(data_file: str, genes: Optional[Set[str]] = None) -> pd.DataFrame:
+    """
+    Streaming πέρασμα στο νέο release: για κάθε VariationID (GRCh38) κρατά μόνο το GeneSymbol
+    και ένα 64-bit hash των στηλών SOURCE_HASH_COLUMNS.
+    """
+    parts = []
+    for batch in stream_variant_summary(data_file, genes=genes, assembly=ASSEMBLY_FILTER, compact=True):
+        batch = batch[batch['variationid'].notna()]
+        columns = [c for c in SOURCE_HASH_COLUMNS if c in batch.columns]
+        hashes = pd.util.hash_pandas_object(batch[columns], index=False).to_numpy().view(np.int64)
+        parts.append(pd.DataFrame({
+            'variation_id': batch['variationid'].astype('int64').to_numpy(),
+            'gene_field': batch['genesymbol'].astype(str).to_numpy(),
+            'source_hash': hashes,
+        }))
+    if not parts:
+        return pd.DataFrame({'variation_id': [], 'gene_field': [], 'source_hash': []})
+    return pd.concat(parts, ignore_index=True).drop_duplicates('variation_id', keep='last')
+
+
+def load_stored_hashes(conn, genes: Optional[Set[str]] = None) -> pd.DataFrame:
+    """Τα hashes του release που είναι ήδη στη βάση (μόνο για τα γονίδια του panel, αν δοθεί)"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT variation_id, gene_field, source_hash FROM clinvar_source_hashes")
+        stored = pd.DataFrame(cur.fetchall(), columns=['variation_id', 'gene_field', 'source_hash'])
+    if genes is not None and not stored.empty:
+        stored = stored[stored['gene_field'].map(lambda field: gene_matches(field, genes))]
+    return stored
+
+
+def _gene_components(fields) -> Set[str]:
+    return {gene for field in fields for gene in str(field).split(";") if gene}
+
+
+def diff_releases(new: pd.DataFrame, stored: pd.DataFrame) -> Dict:
+    """
+    Σύγκριση νέου και αποθηκευμένου release ανά variation_id και source_hash.
+    Επιστρέφει τα νέα / αλλαγμένα IDs, τα IDs που αποσύρθηκαν και τα γονίδια που επηρεάζονται.
+    Το ACMG μιας μετάλλαξης εξαρτάται από όλο το γονίδιο, οπότε ξαναϋπολογίζεται όλο το γονίδιο.
+    """
+    merged = new.merge(stored, on='variation_id', how='outer', suffixes=('', '_old'), indicator=True)
+    added = merged['_merge'] == 'left_only'
+    withdrawn = merged['_merge'] == 'right_only'
+    modified = (merged['_merge'] == 'both') & (merged['source_hash'] != merged['source_hash_old'])
+
+    changed = merged[added | modified]
+    affected = _gene_components(changed['gene_field']) | _gene_components(merged.loc[modified, 'gene_field_old'])
+    affected |= _gene_components(merged.loc[withdrawn, 'gene_field_old'])
+
+    # Γραμμές με πολλαπλά γονίδια ('TP53;WRAP53') φορτώνονται από κάθε γονίδιο τους,
+    # οπότε μπαίνουν και τα υπόλοιπα γονίδια τους (μέχρι να μην προστίθεται κανένα)
+    multi_gene = [set(field.split(";")) for field in new['gene_field'].unique() if ";" in field]
+    while True:
+        extra = set().union(*[genes for genes in multi_gene if genes & affected]) - affected
+        if not extra:
+            break
+        affected |= extra
+
+    return {
+        'changed_ids': set(changed['variation_id'].astype('int64')),
+        'withdrawn_ids': set(merged.loc[withdrawn, 'variation_id'].astype('int64')),
+        'withdrawn_fields': set(merged.loc[withdrawn, 'gene_field_old']),
+        'affected_genes': affected,
+    }
+
+
+def save_source_hashes(conn, new: pd.DataFrame, changed_ids: Set[int], withdrawn_ids: Set[int]) -> None:
+    """Ενημέρωση του clinvar_source_hashes μόνο με τη διαφορά (αλλαγμένα και αποσυρμένα IDs)"""
+    rows = new[new['variation_id'].isin(changed_ids)]
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM clinvar_source_hashes WHERE variation_id = ANY(%s)", (sorted(withdrawn_ids),))
+        cur.execute("""
+            CREATE TEMP TABLE source_hashes_staging
+            (LIKE clinvar_source_hashes INCLUDING DEFAULTS) ON COMMIT DROP
+        """)
+        buffer = io.StringIO()
+        rows[['variation_id', 'gene_field', 'source_hash']].to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cur.copy_expert("COPY source_hashes_staging FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute("""
+            INSERT INTO clinvar_source_hashes (variation_id, gene_field, source_hash)
+            SELECT variation_id, gene_field, source_hash FROM source_hashes_staging
+            ON CONFLICT (variation_id) DO UPDATE SET
+                gene_field = EXCLUDED.gene_field,
+                source_hash = EXCLUDED.source_hash
+        """)
+    conn.commit()
+
+
+def update_database(data_file: str, workers: int = WORKERS, genes: Optional[Set[str]] = None) -> None:
+    """
+    Incremental ενημέρωση της βάσης με το νέο release: diff ανά variation_id + hash περιεχομένου,
+    επανεπεξεργασία και upsert μόνο των γονιδίων που άλλαξαν, διαγραφή των αποσυρμένων IDs και
+    ανανέωση των ACMG aggregates μόνο για τα επηρεαζόμενα γονίδια.
+    Χωρίς αποθηκευμένα hashes (πρώτη εκτέλεση) φορτώνονται όλα.
+    """
+    # new2 -> clinvar_cache -> autoupdate: import εδώ για να μην υπάρχει κυκλικό import
+    from acmg_aggregates import create_aggregate_tables, refresh_acmg_aggregates
+    from new2 import DB_CONFIG, create_tables, load_panel, prepare_variants, process_clinvar_panel
+
     try:
-        # Φόρτωση δεδομένων από αρχείο
-        print("Φόρτωση και επεξεργασία δεδομένων...")
-        df = pd.read_csv(data_file, sep='\t', low_memory=False)
-        
-        # Σύνδεση στη βάση δεδομένων
         conn = psycopg2.connect(**DB_CONFIG)
-        
+
         try:
+            create_tables(conn)
+            create_aggregate_tables(conn)
+            with conn.cursor() as cur:
+                cur.execute(SOURCE_HASHES_SQL)
+            conn.commit()
+
+            print("Hash περιεχομένου του νέου release...")
+            new = source_hashes(data_file, genes)
+            stored = load_stored_hashes(conn, genes)
+            diff = diff_releases(new, stored)
+            print(f"Νέα / αλλαγμένα: {len(diff['changed_ids'])}, αποσυρμένα: {len(diff['withdrawn_ids'])}, "
+                  f"γονίδια προς επανεπεξεργασία: {len(diff['affected_genes'])}")
+
+            affected = diff['affected_genes'] if genes is None else diff['affected_genes'] & genes
+            loaded_genes, loaded_ids = set(), set()
+            if affected:
+                print("Επεξεργασία και φόρτωση των γονιδίων που άλλαξαν...")
+                panel = process_clinvar_panel(data_file, affected, workers=workers)
+                panel = {gene: prepare_variants(df) for gene, df in panel.items() if not df.empty}
+                loaded_genes, loaded_ids = load_panel(conn, panel)
+
+            # Αποσυρμένα IDs και αλλαγμένα που δεν περνούν πλέον τα φίλτρα του pipeline (π.χ. χωρίς protein_pos)
+            stale_ids = sorted(diff['withdrawn_ids'] | (diff['changed_ids'] - loaded_ids))
             with conn.cursor() as cur:
                 print("Ενημέρωση βάσης δεδομένων...")
-                # Θα μπορούσε να προστεθεί εδώ η λογική ενημέρωσης
-                
+                cur.execute(
+                    "DELETE FROM gene_variants WHERE variation_id = ANY(%s) RETURNING gene_symbol",
+                    (stale_ids,)
+                )
+                deleted_genes = {row[0] for row in cur.fetchall()}
             conn.commit()
+
+            refresh_acmg_aggregates(conn, loaded_genes | deleted_genes)
+
+            # Τα hashes γράφονται τελευταία: αν κάτι αποτύχει, η επόμενη εκτέλεση βρίσκει ξανά την ίδια διαφορά
+            save_source_hashes(conn, new, diff['changed_ids'], diff['withdrawn_ids'])
             print("Ενημέρωση βάσης ολοκληρώθηκε επιτυχώς!")
         except Exception as e:
             conn.rollback()
@@ -264,7 +411,7 @@ def update_database(data_file: str) -> None:
             os.remove(data_file)  # Διαγραφή του προσωρινού αρχείου
 
 # Κύρια λειτουργία
-def main(force_update: bool = False) -> None:
+def main(force_update: bool = False, workers: int = WORKERS) -> None:
     print("=== Έναρξη διαδικασίας ενημέρωσης ClinVar ===")
     
     # Έλεγχος ημερομηνίας (εκτός αν είναι forced update)
@@ -291,7 +438,7 @@ def main(force_update: bool = False) -> None:
             
             # Κατέβασμα και ενημέρωση
             data_file = download_clinvar_data()
-            update_database(data_file)
+            update_database(data_file, workers=workers)
             
             # Αποθήκευση νέων μεταδεδομένων
             save_local_metadata(remote_date)
@@ -311,10 +458,11 @@ if __name__ == "__main__":
         action="store_true",
         help="Εξαναγκασμός ενημέρωσης ακόμα και αν η βάση είναι ενημερωμένη"
     )
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Διεργασίες για parallel parsing")
     args = parser.parse_args()
     
     try:
-        main(force_update=args.force)
+        main(force_update=args.force, workers=args.workers)
     except Exception as e:
         print(f"Η διαδικασία ενημέρωσης απέτυχε: {str(e)}")
         exit(1)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import os
+import re
+import shutil
+from typing import Dict, Optional, Set
+
+import pandas as pd
+
+from autoupdate import get_clinvar_release_date, load_local_metadata
+
+
+# --- Ρυθμίσεις ---
+CACHE_DIR = "cache"  # Φάκελος για τα columnar (Parquet) αρχεία ανά release
+COMPLETE_MARKER = "_ALL_GENES"  # Υπάρχει όταν το cache περιέχει όλα τα γονίδια του release
+# Έκδοση του σχήματος του cache (στήλες / dtypes του prepare_variants): αυξάνεται όταν αλλάζει το pipeline,
+# ώστε cache που γράφτηκε από παλαιότερο κώδικα για το ίδιο release να μην ξαναχρησιμοποιείται
+# (2: compact σχήμα με categoricals και nullable ints, 3: στήλες locus VCF)
+CACHE_SCHEMA_VERSION = 3
+
+
+def resolve_release_date() -> Optional[str]:
+    """
+    Ημερομηνία release για το κλειδί του cache: πρώτα από το README του ClinVar,
+    αλλιώς από το metadata/clinvar_metadata.json (π.χ. χωρίς δίκτυο)
+    """
+    try:
+        return get_clinvar_release_date()
+    except RuntimeError as e:
+        print(f"Προειδοποίηση: {str(e)}")
+        local_metadata = load_local_metadata()
+        return local_metadata.get("release_date") if local_metadata else None
+
+
+def release_cache_dir(release_date: str) -> str:
+    """Φάκελος cache για ένα release και έκδοση σχήματος (π.χ. cache/clinvar_20250601_v2)"""
+    return os.path.join(CACHE_DIR, f"clinvar_{release_date}_v{CACHE_SCHEMA_VERSION}")
+
+
+def _gene_file(release_date: str, gene: str) -> str:
+    safe_gene = re.sub(r"[^\w.-]", "_", gene)
+    return os.path.join(release_cache_dir(release_date), f"{safe_gene}.parquet")
+
+
+def _arrow_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Στήλες object με ανάμεικτους τύπους (π.χ. chromosome 17 και 'X' από διαφορετικά batches)
+    δεν γράφονται σε Parquet, οπότε μετατρέπονται σε string κρατώντας τα NaN.
+    """
+    df = df.copy()
+    for col in df.columns[df.dtypes == object]:
+        values = df[col].dropna()
+        if values.map(type).nunique() > 1:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def load_cached_panel(release_date: str, genes: Optional[Set[str]]) -> Optional[Dict[str, pd.DataFrame]]:
+    """
+    Φορτώνει τον επεξεργασμένο πίνακα μεταλλάξεων ανά γονίδιο από το cache του release.
+    Επιστρέφει None αν λείπει έστω και ένα γονίδιο (ή όλο το release για genes=None).
+    """
+    cache_dir = release_cache_dir(release_date)
+    if not os.path.isdir(cache_dir):
+        return None
+
+    if genes is None:
+        if not os.path.exists(os.path.join(cache_dir, COMPLETE_MARKER)):
+            return None
+        files = {f[:-len(".parquet")]: os.path.join(cache_dir, f) for f in os.listdir(cache_dir) if f.endswith(".parquet")}
+    else:
+        files = {gene: _gene_file(release_date, gene) for gene in genes}
+        if not all(os.path.exists(path) for path in files.values()):
+            return None
+
+    try:
+        # memory_map: τα αρχεία διαβάζονται χωρίς αντιγραφή στο heap όπου γίνεται
+        return {gene: pd.read_parquet(path, memory_map=True) for gene, path in files.items()}
+    except ImportError as e:
+        print(f"Προειδοποίηση: δεν είναι διαθέσιμο το pyarrow, το cache αγνοείται ({str(e)})")
+        return None
+
+
+def save_cached_panel(release_date: str, panel: Dict[str, pd.DataFrame], complete: bool = False) -> None:
+    """Αποθηκεύει τον επεξεργασμένο πίνακα ανά γονίδιο σε Parquet και σβήνει παλαιότερα releases"""
+    cache_dir = release_cache_dir(release_date)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    try:
+        for gene, df in panel.items():
+            _arrow_safe(df).to_parquet(_gene_file(release_date, gene), index=False)
+    except ImportError as e:
+        print(f"Προειδοποίηση: δεν είναι διαθέσιμο το pyarrow, δεν γράφτηκε cache ({str(e)})")
+        return
+
+    if complete:
+        open(os.path.join(cache_dir, COMPLETE_MARKER), "w").close()
+
+    prune_old_releases(release_date)
+    print(f"Αποθήκευση cache για το release {release_date} ({len(panel)} γονίδια) στο {cache_dir}")
+
+
+def prune_old_releases(keep_release: str) -> None:
+    """Διαγράφει cache παλαιότερων releases (και παλαιότερων εκδόσεων σχήματος) ώστε να μη γεμίζει ο δίσκος"""
+    keep_dir = os.path.basename(release_cache_dir(keep_release))
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        if name.startswith("clinvar_") and name != keep_dir and os.path.isdir(path):
+            shutil.rmtree(path)
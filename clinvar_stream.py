@@ -0,0 +1,352 @@
+import argparse
+import gzip
+import io
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import pandas as pd
+
+
+# --- Ρυθμίσεις ---
+ASSEMBLY_FILTER = "GRCh38"
+BATCH_SIZE = 50_000  # γραμμές ανά batch προς το transform στάδιο
+BLOCK_SIZE = 16 * 1024 * 1024  # bytes αποσυμπιεσμένων δεδομένων ανά block στο parallel mode
+WORKERS = os.cpu_count() or 1
+# Chunked mode με memory budget: το working set ενός chunk (γραμμές κειμένου, DataFrame και τα αντίγραφα
+# του transform / ACMG) υπολογίζεται ως WORKING_SET_FACTOR φορές το μέγεθος του DataFrame που διαβάστηκε
+WORKING_SET_FACTOR = 6
+PROBE_BATCH_SIZE = 5_000  # πρώτο chunk, για τη μέτρηση bytes ανά γραμμή
+MIN_BATCH_SIZE = 1_000
+
+# Compact σχήμα του variant_summary (κανονικοποιημένα ονόματα): μόνο οι στήλες που χρησιμοποιεί το pipeline,
+# categoricals για τα πεδία με λίγες διακριτές τιμές και nullable ακέραιοι για θέσεις / IDs.
+# Το ClinSigSimple του αρχείου δεν διαβάζεται, το pipeline το ξαναϋπολογίζει (simplify_clinical_significance).
+CATEGORY_COLUMNS = ["genesymbol", "clinicalsignificance", "assembly", "chromosome", "reviewstatus"]
+TEXT_COLUMNS = [
+    "name", "rcvaccession", "phenotypelist", "referenceallele", "alternateallele",
+    "referenceallelevcf", "alternateallelevcf",
+]
+INTEGER_COLUMNS = {
+    "variationid": "Int64",
+    "start": "Int32",
+    "stop": "Int32",
+    "positionvcf": "Int32",
+    "numbersubmitters": "Int32",
+    "submittercategories": "Int8",
+}
+COMPACT_COLUMNS = set(CATEGORY_COLUMNS) | set(TEXT_COLUMNS) | set(INTEGER_COLUMNS)
+
+
+def normalize_column_name(name: str) -> str:
+    """Ίδια κανονικοποίηση ονομάτων στηλών με το pipeline ('#AlleleID' -> 'alleleid')"""
+    return re.sub(r"[^\w]+", "_", name.strip().lower()).strip("_")
+
+
+def read_header(f, normalize: bool = True) -> List[str]:
+    """Διαβάζει την πρώτη γραμμή (header) του variant_summary και επιστρέφει τα ονόματα στηλών"""
+    header_line = f.readline()
+    if isinstance(header_line, bytes):
+        header_line = header_line.decode("utf-8")
+    if not header_line:
+        raise ValueError("Άδειο αρχείο variant_summary")
+    columns = header_line.rstrip("\r\n").split("\t")
+    return [normalize_column_name(c) for c in columns] if normalize else columns
+
+
+def gene_matches(gene_field: str, genes: Optional[Set[str]]) -> bool:
+    """
+    Ελέγχει αν το πεδίο GeneSymbol ανήκει στα ζητούμενα γονίδια.
+    Το ClinVar γράφει πολλαπλά γονίδια με ';' (π.χ. 'TP53;WRAP53'), οπότε συγκρίνουμε ακριβώς κάθε σύμβολο
+    και όχι substring (το grep 'TP53' έπιανε και το TP53BP1).
+    """
+    if genes is None:
+        return True
+    if gene_field in genes:
+        return True
+    return ";" in gene_field and any(g in genes for g in gene_field.split(";"))
+
+
+def _rows_to_frame(lines: List[str], columns: List[str], compact: bool = False) -> pd.DataFrame:
+    """
+    Μετατροπή των γραμμών που πέρασαν το φίλτρο σε DataFrame (ίδια dtypes με το pd.read_csv του pipeline).
+    Με compact=True εφαρμόζεται το compact σχήμα (usecols / categoricals / nullable ints) στο ίδιο το read.
+    """
+    if not compact:
+        return pd.read_csv(
+            io.StringIO("".join(lines)),
+            sep="\t",
+            names=columns,
+            header=None,
+            low_memory=False,
+        )
+
+    usecols = [c for c in columns if c in COMPACT_COLUMNS]
+    dtype = {c: "category" for c in CATEGORY_COLUMNS}
+    dtype.update({c: str for c in TEXT_COLUMNS})
+    df = pd.read_csv(
+        io.StringIO("".join(lines)),
+        sep="\t",
+        names=columns,
+        header=None,
+        usecols=usecols,
+        dtype={c: t for c, t in dtype.items() if c in usecols},
+    )
+    for column, int_dtype in INTEGER_COLUMNS.items():
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype(int_dtype)
+    return df
+
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat που κρατά τα categoricals: κάθε batch έχει δικές του κατηγορίες,
+    οπότε ενώνονται πριν το concat (αλλιώς η στήλη γίνεται object).
+    """
+    if len(frames) == 1:
+        return frames[0]
+    for column in frames[0].columns[frames[0].dtypes == "category"]:
+        if all(column in f.columns and f[column].dtype == "category" for f in frames):
+            categories = pd.api.types.union_categoricals([f[column] for f in frames]).categories
+            frames = [f.assign(**{column: f[column].cat.set_categories(categories)}) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    """Μνήμη (MB, με deep=True) και dtype ανά στήλη, ταξινομημένα από τη μεγαλύτερη"""
+    usage = df.memory_usage(deep=True, index=False) / (1024 * 1024)
+    report = pd.DataFrame({"dtype": df.dtypes.astype(str), "mb": usage.round(2)})
+    return report.sort_values("mb", ascending=False)
+
+
+def load_gene_panel(panel_path: str) -> Set[str]:
+    """
+    Φορτώνει panel γονιδίων από αρχείο κειμένου (ένα ή περισσότερα σύμβολα ανά γραμμή,
+    χωρισμένα με κόμμα ή κενό, σχόλια με '#').
+    """
+    genes = set()
+    with open(panel_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            genes.update(g for g in re.split(r"[,\s]+", line) if g)
+    if not genes:
+        raise ValueError(f"Το panel {panel_path} δεν περιέχει γονίδια")
+    return genes
+
+
+def _filtered_lines(f, columns: List[str], genes: Optional[Set[str]], assembly: Optional[str]) -> Iterator[Tuple[str, str]]:
+    """Επιστρέφει (GeneSymbol, γραμμή) για όσες γραμμές περνούν το φίλτρο γονιδίου/assembly"""
+    normalized = [normalize_column_name(c) for c in columns]
+    gene_idx = normalized.index("genesymbol")
+    assembly_idx = normalized.index("assembly")
+    max_split = max(gene_idx, assembly_idx) + 1
+
+    for line in f:
+        # Σπάμε μόνο μέχρι τις στήλες που χρειάζεται το φίλτρο
+        fields = line.split("\t", max_split)
+        if len(fields) < max_split:
+            continue
+        if assembly and fields[assembly_idx] != assembly:
+            continue
+        if not gene_matches(fields[gene_idx], genes):
+            continue
+        yield fields[gene_idx], line
+
+
+def batch_size_for_budget(df: pd.DataFrame, memory_budget_mb: float) -> int:
+    """Γραμμές ανά chunk ώστε το working set να χωράει στο memory budget, με βάση τα bytes/γραμμή του df"""
+    bytes_per_row = df.memory_usage(deep=True).sum() / max(len(df), 1)
+    rows = int(memory_budget_mb * 1024 * 1024 / (bytes_per_row * WORKING_SET_FACTOR))
+    return max(MIN_BATCH_SIZE, rows)
+
+
+def stream_variant_summary(
+    variant_gz_path: str,
+    genes: Optional[Set[str]] = None,
+    assembly: Optional[str] = ASSEMBLY_FILTER,
+    batch_size: int = BATCH_SIZE,
+    memory_budget_mb: Optional[float] = None,
+    compact: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Streaming ανάγνωση του variant_summary.txt.gz σε ένα πέρασμα (χωρίς zcat/grep και προσωρινό αρχείο).
+    Η αποσυμπίεση γίνεται μία φορά, το φίλτρο γονιδίου/assembly εφαρμόζεται στις στήλες
+    και επιστρέφονται batches από DataFrames με κανονικοποιημένα ονόματα στηλών.
+    Με memory_budget_mb το μέγεθος κάθε batch προσαρμόζεται στο budget (μετά από ένα μικρό πρώτο batch).
+    Με compact=True τα batches έχουν το compact σχήμα (βλ. _rows_to_frame).
+    """
+    if memory_budget_mb is not None:
+        batch_size = PROBE_BATCH_SIZE
+
+    with gzip.open(variant_gz_path, "rt", encoding="utf-8", newline="") as f:
+        columns = read_header(f)
+
+        batch = []
+        for _, line in _filtered_lines(f, columns, genes, assembly):
+            batch.append(line)
+            if len(batch) >= batch_size:
+                df = _rows_to_frame(batch, columns, compact)
+                batch = []
+                if memory_budget_mb is not None:
+                    batch_size = batch_size_for_budget(df, memory_budget_mb)
+                yield df
+
+        if batch:
+            yield _rows_to_frame(batch, columns, compact)
+
+
+def stream_gene_batches(
+    variant_gz_path: str,
+    genes: Optional[Set[str]] = None,
+    assembly: Optional[str] = ASSEMBLY_FILTER,
+    batch_size: int = BATCH_SIZE,
+    compact: bool = False,
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    Ένα πέρασμα πάνω στο variant_summary που μοιράζει τις γραμμές σε batches ανά γονίδιο.
+    genes=None σημαίνει όλα τα γονίδια. Γραμμές με πολλαπλά σύμβολα ('TP53;WRAP53')
+    πηγαίνουν σε κάθε ζητούμενο γονίδιο (ώστε το cache κάθε γονιδίου να είναι πλήρες),
+    οπότε ο καταναλωτής πρέπει να γράφει κάθε variation_id μία φορά (βλ. new2.annotate_panel).
+    """
+    with gzip.open(variant_gz_path, "rt", encoding="utf-8", newline="") as f:
+        columns = read_header(f)
+
+        buffers: Dict[str, List[str]] = {}
+        for gene_field, line in _filtered_lines(f, columns, genes, assembly):
+            for gene in gene_field.split(";"):
+                if genes is not None and gene not in genes:
+                    continue
+                buffer = buffers.setdefault(gene, [])
+                buffer.append(line)
+                if len(buffer) >= batch_size:
+                    yield gene, _rows_to_frame(buffer, columns, compact)
+                    buffers[gene] = []
+
+        for gene, buffer in buffers.items():
+            if buffer:
+                yield gene, _rows_to_frame(buffer, columns, compact)
+
+
+def partition_by_gene(
+    variant_gz_path: str,
+    genes: Optional[Set[str]] = None,
+    assembly: Optional[str] = ASSEMBLY_FILTER,
+    batch_size: int = BATCH_SIZE,
+    compact: bool = False,
+) -> Dict[str, pd.DataFrame]:
+    """Φορτώνει ένα ολόκληρο panel (ή όλα τα γονίδια) σε ένα πέρασμα, επιστρέφοντας DataFrame ανά γονίδιο"""
+    per_gene: Dict[str, List[pd.DataFrame]] = {}
+    for gene, batch in stream_gene_batches(variant_gz_path, genes, assembly, batch_size, compact):
+        per_gene.setdefault(gene, []).append(batch)
+
+    return {gene: concat_frames(batches) for gene, batches in per_gene.items()}
+
+
+def partition_frame_by_gene(df: pd.DataFrame, genes: Optional[Set[str]], gene_column: str) -> Dict[str, pd.DataFrame]:
+    """Μοιράζει ένα ήδη φιλτραρισμένο DataFrame ανά γονίδιο (ίδιοι κανόνες με το stream_gene_batches)"""
+    if df.empty:
+        return {}
+    exploded = df[gene_column].astype(str).str.split(";").explode()
+    if genes is not None:
+        exploded = exploded[exploded.isin(genes)]
+    return {
+        gene: df.loc[index.unique()].reset_index(drop=True)
+        for gene, index in exploded.index.to_series().groupby(exploded.values)
+    }
+
+
+def _iter_blocks(f, block_size: int) -> Iterator[bytes]:
+    """Κόβει το αποσυμπιεσμένο stream σε blocks που τελειώνουν πάντα σε αλλαγή γραμμής"""
+    remainder = b""
+    while True:
+        chunk = f.read(block_size)
+        if not chunk:
+            break
+        chunk = remainder + chunk
+        cut = chunk.rfind(b"\n") + 1
+        if cut == 0:
+            remainder = chunk
+            continue
+        yield chunk[:cut]
+        remainder = chunk[cut:]
+    if remainder:
+        yield remainder
+
+
+def _parse_block(
+    block: bytes,
+    columns: List[str],
+    genes: Optional[Set[str]],
+    assembly: Optional[str],
+    transform: Optional[Callable[[pd.DataFrame], pd.DataFrame]],
+    compact: bool = False,
+) -> Optional[pd.DataFrame]:
+    """Worker: TSV parsing, φίλτρο γονιδίου/assembly και (προαιρετικά) transform για ένα block"""
+    lines = [line + "\n" for line in block.decode("utf-8").split("\n") if line]
+    matched = [line for _, line in _filtered_lines(lines, columns, genes, assembly)]
+    if not matched:
+        return None
+    df = _rows_to_frame(matched, columns, compact)
+    return transform(df) if transform else df
+
+
+def read_variant_summary_parallel(
+    variant_gz_path: str,
+    genes: Optional[Set[str]] = None,
+    assembly: Optional[str] = ASSEMBLY_FILTER,
+    workers: int = WORKERS,
+    transform: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    block_size: int = BLOCK_SIZE,
+    normalize: bool = True,
+    compact: bool = False,
+) -> Iterator[pd.DataFrame]:
+    """
+    Parallel ανάγνωση του variant_summary: η κύρια διεργασία αποσυμπιέζει και κόβει το stream σε blocks
+    (στα όρια γραμμών) και ένα process pool κάνει parsing, φιλτράρισμα και transform (π.χ. εξαγωγή HGVS).
+    Τα αποτελέσματα επιστρέφονται με τη σειρά του αρχείου. Το transform πρέπει να είναι
+    top-level συνάρτηση ώστε να γίνεται pickle. Το compact=True χρειάζεται κανονικοποιημένα ονόματα (normalize=True).
+    """
+    opener = gzip.open if variant_gz_path.endswith(".gz") else open
+    with opener(variant_gz_path, "rb") as f:
+        columns = read_header(f, normalize=normalize)
+
+        if workers <= 1:
+            for block in _iter_blocks(f, block_size):
+                df = _parse_block(block, columns, genes, assembly, transform, compact)
+                if df is not None and not df.empty:
+                    yield df
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Κρατάμε περιορισμένο αριθμό blocks σε εξέλιξη ώστε να μη γεμίζει η μνήμη
+            pending = deque()
+            for block in _iter_blocks(f, block_size):
+                pending.append(pool.submit(_parse_block, block, columns, genes, assembly, transform, compact))
+                if len(pending) >= workers * 2:
+                    df = pending.popleft().result()
+                    if df is not None and not df.empty:
+                        yield df
+            while pending:
+                df = pending.popleft().result()
+                if df is not None and not df.empty:
+                    yield df
+
+
+if __name__ == "__main__":
+    # Μέτρηση μνήμης: ίδιο δείγμα του variant_summary με το αρχικό (object) και με το compact σχήμα
+    parser = argparse.ArgumentParser(description="Αναφορά μνήμης του DataFrame του variant_summary (object vs compact)")
+    parser.add_argument("variant_gz_path", help="Διαδρομή του variant_summary.txt.gz")
+    parser.add_argument("--rows", type=int, default=500_000, help="Πλήθος γραμμών του δείγματος (GRCh38)")
+    args = parser.parse_args()
+
+    reports = {}
+    for compact in (False, True):
+        sample = next(stream_variant_summary(args.variant_gz_path, batch_size=args.rows, compact=compact))
+        reports[compact] = memory_report(sample)
+        print(f"--- {'compact' if compact else 'object'}: {len(sample)} γραμμές, {reports[compact]['mb'].sum():.1f} MB ---")
+        print(reports[compact].to_string())
+
+    ratio = reports[False]['mb'].sum() / reports[True]['mb'].sum()
+    print(f"Το compact σχήμα είναι {ratio:.1f}x μικρότερο")
@@ -0,0 +1,244 @@
+import argparse
+from itertools import islice
+from typing import Callable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from clinvar_stream import stream_variant_summary
+
+
+# --- Regex patterns (ίδια με extract_HGVS / extract_protein_pos / extract_transcript_id) ---
+DNA_PATTERN = r'(c\.[^*\s]+)'
+DNA_STAR_PATTERN = r'(c\.\*[\d_]+[^\s)]*)'
+PROTEIN_PATTERN = r'(p\.[^\s)]+)'
+PROTEIN_POS_PATTERN = r'[A-Z][a-z]{2}(\d+)'
+TRANSCRIPT_PATTERN = r'(?<!\w)(NM_\d{5,}(?:\.\d{1,2})?)(?=[(])'
+
+
+def _extract(values: pd.Series, pattern: str) -> pd.Series:
+    """Series.str.extract για μία ομάδα, με None (όχι NaN) όπου δεν υπάρχει match"""
+    extracted = values.str.extract(pattern, expand=False)
+    return extracted.astype(object).where(extracted.notna(), None)
+
+
+def extract_hgvs_columns(names: pd.Series) -> pd.DataFrame:
+    """
+    Vectorized εξαγωγή hgvs_c, hgvs_p, transcript_id και protein_pos από το πεδίο Name του ClinVar.
+    Κάθε regex γίνεται compile μία φορά και εφαρμόζεται σε όλη τη στήλη, αντί για
+    apply(extract_HGVS).apply(pd.Series) ανά γραμμή. Τα αποτελέσματα είναι ίδια με τις per-row συναρτήσεις.
+    """
+    # NaN γίνονται <NA> ώστε να μη σπάει ο .str accessor
+    names = names.astype("string")
+
+    # c.HGVS: πρώτα το κανονικό pattern και μόνο αν αποτύχει το pattern με '*' (c.*103del)
+    hgvs_c = _extract(names, DNA_PATTERN)
+    missing_c = hgvs_c.isna()
+    if missing_c.any():
+        hgvs_c[missing_c] = _extract(names[missing_c], DNA_STAR_PATTERN)
+
+    hgvs_p = _extract(names, PROTEIN_PATTERN)
+    transcript_id = _extract(names, TRANSCRIPT_PATTERN)
+
+    protein_pos = pd.to_numeric(
+        hgvs_p.astype("string").str.extract(PROTEIN_POS_PATTERN, expand=False),
+        errors='coerce'
+    )
+
+    return pd.DataFrame({
+        'hgvs_c': hgvs_c,
+        'hgvs_p': hgvs_p,
+        'transcript_id': transcript_id,
+        'protein_pos': protein_pos,
+    }, index=names.index)
+
+
+# --- Vectorized κατηγοριοποίηση consequence ---
+# Κάθε κανόνας είναι (label, predicate) και το predicate δουλεύει σε ολόκληρη στήλη (mask).
+# Οι κανόνες αξιολογούνται με τη σειρά, όπως τα if/elif των consequence / consequence_dna.
+Rule = Tuple[str, Callable[[pd.Series], pd.Series]]
+
+
+def _search(pattern: str) -> Callable[[pd.Series], pd.Series]:
+    return lambda s: s.str.contains(pattern, regex=True)
+
+
+def _fullmatch(pattern: str) -> Callable[[pd.Series], pd.Series]:
+    return lambda s: s.str.fullmatch(pattern)
+
+
+def _match(pattern: str) -> Callable[[pd.Series], pd.Series]:
+    return lambda s: s.str.match(pattern)
+
+
+def _contains(*substrings: str) -> Callable[[pd.Series], pd.Series]:
+    def predicate(s):
+        mask = s.str.contains(substrings[0], regex=False)
+        for sub in substrings[1:]:
+            mask &= s.str.contains(sub, regex=False)
+        return mask
+    return predicate
+
+
+def _startswith(prefix: str) -> Callable[[pd.Series], pd.Series]:
+    return lambda s: s.str.startswith(prefix)
+
+
+def _is_empty(prefix: str) -> Callable[[pd.Series], pd.Series]:
+    """Κενή τιμή ή τιμή που ξεκινά με το prefix (π.χ. 'p.?')"""
+    return lambda s: s.isna() | (s == '') | s.str.startswith(prefix)
+
+
+# consequence(hgvs_p)
+PROTEIN_CONSEQUENCE_RULES: List[Rule] = [
+    ('unknown', _is_empty('p.?')),
+    ('nonsense', _fullmatch(r'p\.[A-Z][a-z]{2}\d+(?:Ter|X|\*)')),
+    ('stop_lost', _search(r'p\.(?:Ter|X|\*)\d+[A-Z][a-z]{2}')),
+    ('missense_variant', _fullmatch(r'p\.[A-Z][a-z]{2}\d+[A-Z][a-z]{2}')),
+    ('synonymous_variant', _contains('=')),
+    ('frameshift_variant', _contains('fs')),
+    ('inframe_deletion', _contains('del')),
+    ('inframe_insertion', _contains('ins')),
+]
+
+# consequence_dna(hgvs_c)
+DNA_CONSEQUENCE_RULES: List[Rule] = [
+    ('unknown', _is_empty('c.?')),
+    ('intronic_variant', _search(r'[-+]\d+')),
+    ('3_prime_UTR_variant', _search(r'c\.\*\d+')),
+    ('5_prime_UTR_variant', _search(r'c\.-\d+')),
+    ('synonymous_variant', _contains('=')),
+    ('indel', _contains('del', 'ins')),
+    ('deletion', _contains('del')),
+    ('insertion', _contains('ins')),
+    ('duplication', _contains('dup')),
+    ('substitution', _contains('>')),
+]
+
+# determine_variant_type(hgvs_p, hgvs_c) του dataparse.py: πρώτα το p.HGVS (αν υπάρχει), αλλιώς το c.HGVS
+PROTEIN_TYPE_RULES: List[Rule] = [
+    ('frameshift', _contains('fs')),
+    ('nonsense', _contains('*')),
+    ('deletion', _contains('del')),
+    ('duplication', _contains('dup')),
+    ('insertion', _contains('ins')),
+    ('synonymous', lambda s: s == 'p.='),
+    ('missense', _match(r'p\.[A-Z][a-z]{2}\d+[A-Z][a-z]{2}')),
+]
+
+DNA_TYPE_RULES: List[Rule] = [
+    ('splice_site_essential', lambda s: _search(r'\+\d+|\-\d+')(s) & _search(r'\+1\+2|\-1\-2')(s)),
+    ('splice_region', _search(r'\+\d+|\-\d+')),
+    ("5'UTR", _startswith('c.-')),
+    ("3'UTR", _contains('*')),
+]
+
+
+def classify(values: pd.Series, rules: List[Rule], default: str) -> pd.Series:
+    """
+    Εφαρμόζει μια διατεταγμένη λίστα κανόνων σε όλη τη στήλη: κάθε γραμμή παίρνει το label
+    του πρώτου κανόνα που ταιριάζει (ίδια προτεραιότητα με τα if/elif), αλλιώς το default.
+    Κάθε κανόνας αξιολογείται μόνο στις γραμμές που δεν έχουν ήδη κατηγορία.
+    """
+    values = values.astype("string")
+    result = pd.Series(default, index=values.index, dtype=object)
+    undecided = values.index
+
+    for label, predicate in rules:
+        if len(undecided) == 0:
+            break
+        mask = predicate(values.loc[undecided]).fillna(False).astype(bool)
+        result.loc[mask[mask].index] = label
+        undecided = mask[~mask].index
+
+    return result
+
+
+def consequence_batch(hgvs_p: pd.Series) -> pd.Series:
+    """Vectorized consequence() για ολόκληρη στήλη hgvs_p"""
+    return classify(hgvs_p, PROTEIN_CONSEQUENCE_RULES, default='other')
+
+
+def consequence_dna_batch(hgvs_c: pd.Series) -> pd.Series:
+    """Vectorized consequence_dna() για ολόκληρη στήλη hgvs_c"""
+    return classify(hgvs_c, DNA_CONSEQUENCE_RULES, default='other')
+
+
+def combine_consequence_batch(protein_consequence: pd.Series, dna_consequence: pd.Series) -> pd.Series:
+    """Vectorized combine_consequence(): protein consequence αν είναι γνωστό, αλλιώς το DNA"""
+    return pd.Series(
+        np.where(protein_consequence != 'unknown', protein_consequence, dna_consequence),
+        index=protein_consequence.index,
+        dtype=object,
+    )
+
+
+def classify_consequences(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Προσθέτει protein_consequence, dna_consequence, molecular_consequence και variant_type.
+    Το συνδυασμένο consequence υπολογίζεται μία φορά και χρησιμοποιείται και για τις δύο στήλες.
+    """
+    df['protein_consequence'] = consequence_batch(df['hgvs_p'])
+    df['dna_consequence'] = consequence_dna_batch(df['hgvs_c'])
+    df['molecular_consequence'] = combine_consequence_batch(df['protein_consequence'], df['dna_consequence'])
+    df['variant_type'] = df['molecular_consequence']
+    return df
+
+
+def determine_variant_type_batch(hgvs_p: pd.Series, hgvs_c: pd.Series) -> pd.Series:
+    """Vectorized determine_variant_type(hgvs_p, hgvs_c) του dataparse.py"""
+    hgvs_p = hgvs_p.astype("string").str.strip()
+    hgvs_c = hgvs_c.astype("string").str.strip()
+    has_protein = hgvs_p.notna()
+
+    result = pd.Series('unknown', index=hgvs_p.index, dtype=object)
+    result[has_protein] = classify(hgvs_p[has_protein], PROTEIN_TYPE_RULES, default='protein_other')
+    result[~has_protein] = classify(hgvs_c[~has_protein], DNA_TYPE_RULES, default='unknown')
+    return result
+
+
+def check_hgvs_parity(names: pd.Series) -> pd.DataFrame:
+    """
+    Σύγκριση του vectorized extract_hgvs_columns με τις per-row συναρτήσεις του pipeline.
+    Επιστρέφει τις γραμμές όπου διαφέρουν (άδειο DataFrame = πλήρης ταύτιση).
+    """
+    from new2 import extract_HGVS, extract_protein_pos
+    from old_parse import extract_transcript_id
+
+    vectorized = extract_hgvs_columns(names)
+
+    reference = names.apply(extract_HGVS).apply(pd.Series).reindex(columns=['hgvs_c', 'hgvs_p'])
+    reference['transcript_id'] = names.apply(extract_transcript_id)
+    reference['protein_pos'] = reference['hgvs_p'].apply(extract_protein_pos)
+
+    def _normalize(col):
+        # Ίδια αναπαράσταση για Int64 / float64 θέσεις και None / NaN
+        return col.astype(object).where(col.notna(), '<NA>').map(
+            lambda v: str(int(v)) if isinstance(v, (int, float)) else v
+        )
+
+    mismatch = pd.Series(False, index=names.index)
+    for col in ['hgvs_c', 'hgvs_p', 'transcript_id', 'protein_pos']:
+        mismatch |= _normalize(vectorized[col]) != _normalize(reference[col])
+
+    return pd.concat(
+        [names.rename('name'), vectorized.add_suffix('_vectorized'), reference.add_suffix('_reference')],
+        axis=1
+    )[mismatch]
+
+
+if __name__ == "__main__":
+    # Έλεγχος ταύτισης πάνω σε πραγματικό δείγμα του variant_summary.txt.gz
+    parser = argparse.ArgumentParser(description="Parity check vectorized HGVS εξαγωγής με το per-row pipeline")
+    parser.add_argument("variant_gz_path", help="Διαδρομή του variant_summary.txt.gz")
+    parser.add_argument("--rows", type=int, default=200_000, help="Πλήθος γραμμών του δείγματος")
+    args = parser.parse_args()
+
+    batches = stream_variant_summary(args.variant_gz_path, genes=None, assembly=None, batch_size=args.rows)
+    sample = pd.concat(list(islice(batches, 1)), ignore_index=True)
+    differences = check_hgvs_parity(sample['name'])
+
+    print(f"Έλεγχος {len(sample)} γραμμών: {len(differences)} διαφορές")
+    if not differences.empty:
+        print(differences.head(20).to_string())
+        raise SystemExit(1)
@@ -11,6 +11,7 @@ import urllib.request
 import json
 from datetime import datetime
 from typing import Dict, List, Optional
+from clinvar_transform import determine_variant_type_batch
 
 # --- Ρυθμίσεις ---
 CLINVAR_VARIANT_URL = "https://ftp.ncbi.nlm.nih.gov/pub/clinvar/tab_delimited/variant_summary.txt.gz"
@@ -243,7 +244,7 @@ def process_clinvar_data(variant_path: str) -> pd.DataFrame:
     # Δημιουργία νέων στηλών
     df_brca['Variant_type'] = df_brca['VariantName_analysis'].apply(lambda x: x['variant_type'])
     df_brca['transcript_id'] = df_brca['Name'].apply(extract_transcript_id)
-    df_brca['variant_type'] = df_brca.apply(lambda row: determine_variant_type(row['HGVS_p'], row['HGVS_c']), axis=1)
+    df_brca['variant_type'] = determine_variant_type_batch(df_brca['HGVS_p'], df_brca['HGVS_c'])
     df_brca['DNA_variant'] = df_brca['VariantName_analysis'].apply(lambda x: x['DNA_variant'])
     df_brca['Protein_variant'] = df_brca['VariantName_analysis'].apply(lambda x: x['Protein_variant'])
     df_brca['Other_variant'] = df_brca['VariantName_analysis'].apply(lambda x: x['Other_variant'])
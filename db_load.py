@@ -0,0 +1,226 @@
+import io
+import json
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+
+# --- Ρυθμίσεις ---
+COPY_CHUNK_ROWS = 100_000  # γραμμές ανά COPY (όριο μνήμης για το CSV buffer)
+STAGING_TABLE = "gene_variants_staging"
+
+# Στήλη gene_variants -> στήλη του DataFrame του pipeline (η στήλη γονιδίου δίνεται χωριστά)
+GENE_VARIANTS_COLUMNS: Dict[str, Optional[str]] = {
+    "variation_id": "variationid",
+    "gene_symbol": None,
+    "transcript_id": "transcript_id",
+    "hgvs_c": "hgvs_c",
+    "hgvs_p": "hgvs_p",
+    "molecular_consequence": "molecular_consequence",
+    "clinicalsignificance": "clinicalsignificance",
+    "clinsigsimple": "clinsigsimple",
+    "review_status": "reviewstatus",
+    "phenotype_list": "phenotypelist",
+    "assembly": "assembly",
+    "chromosome": "chromosome",
+    "start_pos": "start",
+    "end_pos": "stop",
+    "reference_allele": "referenceallele",
+    "alternate_allele": "alternateallele",
+    "position_vcf": "positionvcf",
+    "reference_allele_vcf": "referenceallelevcf",
+    "alternate_allele_vcf": "alternateallelevcf",
+    "acmg_criteria": "acmg_criteria",
+    "acmg_from_grouping": "acmg_from_grouping",
+    "acmg_combined_criteria": "acmg_combined_criteria",
+    "conflicting_interpretations": "conflictinginterpretations",
+    "rcvaccession": "rcvaccession",
+    "protein_pos": "protein_pos",
+}
+
+INTEGER_COLUMNS = {"variation_id", "start_pos", "end_pos", "position_vcf", "protein_pos"}
+
+JSONB_COLUMNS = {"acmg_criteria", "conflicting_interpretations"}
+ARRAY_COLUMNS = {"rcvaccession"}
+
+# Hash περιεχομένου κάθε γραμμής (των κωδικοποιημένων τιμών): το upsert ξαναγράφει μια γραμμή μόνο όταν αλλάξει,
+# οπότε η επαναφόρτωση ενός ίδιου release δεν παράγει εγγραφές (WAL / dead tuples)
+CONTENT_HASH_COLUMN = "content_hash"
+CONTENT_HASH_DDL = f"ALTER TABLE gene_variants ADD COLUMN IF NOT EXISTS {CONTENT_HASH_COLUMN} BIGINT;"
+
+# Locus σε μορφή VCF (PositionVCF / ReferenceAlleleVCF / AlternateAlleleVCF): τα ReferenceAllele / AlternateAllele
+# του variant_summary είναι 'na' στις περισσότερες εγγραφές, οπότε το vcf_classify αντιστοιχίζει σε αυτές τις στήλες
+VCF_LOCUS_DDL = """
+    ALTER TABLE gene_variants
+        ADD COLUMN IF NOT EXISTS position_vcf INTEGER,
+        ADD COLUMN IF NOT EXISTS reference_allele_vcf TEXT,
+        ADD COLUMN IF NOT EXISTS alternate_allele_vcf TEXT;
+"""
+
+
+def _is_missing(value) -> bool:
+    """None / NaN / pd.NA (αλλά όχι λίστες, που είναι έγκυρες τιμές για JSONB / TEXT[])"""
+    if isinstance(value, (list, tuple, dict, set, np.ndarray)):
+        return False
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def _json_default(value):
+    """numpy scalars / arrays (π.χ. np.bool_ του conflictinginterpretations) σε native τύπους"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (np.ndarray, set, tuple)):
+        return list(value)
+    raise TypeError(f"Μη υποστηριζόμενος τύπος για JSONB: {type(value)}")
+
+
+def encode_jsonb(value) -> Optional[str]:
+    """Τιμή για στήλη JSONB (ίδιο αποτέλεσμα με το psycopg2 Json(...))"""
+    if _is_missing(value):
+        return None
+    return json.dumps(value, default=_json_default)
+
+
+def encode_text_array(value) -> Optional[str]:
+    """
+    PostgreSQL array literal για στήλη TEXT[] (π.χ. ['RCV1', 'RCV2'] -> {"RCV1","RCV2"}).
+    Κάθε στοιχείο μπαίνει σε εισαγωγικά με escaping σε '\\' και '"'. Ένα σκέτο string είναι array ενός στοιχείου.
+    """
+    if _is_missing(value):
+        return None
+    if isinstance(value, str):
+        value = [value]
+    items = []
+    for item in value:
+        if _is_missing(item):
+            items.append("NULL")
+        else:
+            text = str(item).replace("\\", "\\\\").replace('"', '\\"')
+            items.append(f'"{text}"')
+    return "{" + ",".join(items) + "}"
+
+
+def _encode_integer(value) -> Optional[int]:
+    if _is_missing(value):
+        return None
+    return int(value)
+
+
+def _encode_text(value) -> Optional[str]:
+    if _is_missing(value):
+        return None
+    return str(value)
+
+
+def frame_to_gene_variants(df: pd.DataFrame, gene_column: str = "gene_symbol") -> pd.DataFrame:
+    """
+    Μετατρέπει το DataFrame του pipeline στις στήλες του gene_variants με κωδικοποιημένες τιμές για COPY.
+    Στήλες που λείπουν από το DataFrame παραλείπονται (δεν αγγίζονται στο upsert).
+    Για διπλό variation_id κρατιέται η τελευταία γραμμή, όπως με το row-by-row upsert.
+    """
+    out = {}
+    for db_column, df_column in GENE_VARIANTS_COLUMNS.items():
+        df_column = df_column or gene_column
+        if df_column not in df.columns:
+            continue
+        values = df[df_column]
+        if db_column in JSONB_COLUMNS:
+            encoder = encode_jsonb
+        elif db_column in ARRAY_COLUMNS:
+            encoder = encode_text_array
+        elif db_column in INTEGER_COLUMNS:
+            encoder = _encode_integer
+        else:
+            encoder = _encode_text
+        out[db_column] = pd.Series([encoder(v) for v in values], index=df.index, dtype=object)
+
+    encoded = pd.DataFrame(out, index=df.index).drop_duplicates(subset="variation_id", keep="last")
+    encoded[CONTENT_HASH_COLUMN] = pd.Series(content_hashes(encoded).tolist(), index=encoded.index, dtype=object)
+    return encoded
+
+
+def content_hashes(encoded: pd.DataFrame) -> np.ndarray:
+    """64-bit hash (signed, για στήλη BIGINT) των κωδικοποιημένων τιμών κάθε γραμμής"""
+    return pd.util.hash_pandas_object(encoded, index=False).to_numpy().view(np.int64)
+
+
+def _csv_field(value) -> str:
+    """
+    Πεδίο CSV για COPY: τα strings γράφονται πάντα σε εισαγωγικά και οι ακέραιοι χωρίς,
+    οπότε το κενό (χωρίς εισαγωγικά) πεδίο είναι NULL και το "" είναι κενό string.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, int):
+        return str(value)
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _csv_chunks(encoded: pd.DataFrame, chunk_rows: int) -> Iterator[io.StringIO]:
+    """Χωρίζει τις κωδικοποιημένες γραμμές σε CSV buffers των chunk_rows γραμμών"""
+    for start in range(0, len(encoded), chunk_rows):
+        buffer = io.StringIO()
+        for row in encoded.iloc[start:start + chunk_rows].itertuples(index=False, name=None):
+            buffer.write(",".join(_csv_field(v) for v in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        yield buffer
+
+
+def _upsert_sql(columns: List[str]) -> str:
+    """
+    Upsert από το staging table μόνο για γραμμές που είναι νέες ή έχουν διαφορετικό content_hash.
+    Οι ίδιες γραμμές φιλτράρονται ήδη στο SELECT (χωρίς row lock), το WHERE του DO UPDATE μένει ως δεύτερος έλεγχος.
+    """
+    column_list = ", ".join(columns)
+    updates = ",\n            ".join(f"{c} = EXCLUDED.{c}" for c in columns if c != "variation_id")
+    return f"""
+        INSERT INTO gene_variants ({column_list})
+        SELECT {", ".join(f"s.{c}" for c in columns)} FROM {STAGING_TABLE} s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM gene_variants g
+            WHERE g.variation_id = s.variation_id AND g.{CONTENT_HASH_COLUMN} = s.{CONTENT_HASH_COLUMN}
+        )
+        ON CONFLICT (variation_id) DO UPDATE SET
+            {updates},
+            last_updated = CURRENT_TIMESTAMP
+        WHERE gene_variants.{CONTENT_HASH_COLUMN} IS DISTINCT FROM EXCLUDED.{CONTENT_HASH_COLUMN};
+    """
+
+
+def bulk_upsert_gene_variants(
+    conn: psycopg2.extensions.connection,
+    df: pd.DataFrame,
+    gene_column: str = "gene_symbol",
+    chunk_rows: int = COPY_CHUNK_ROWS,
+) -> int:
+    """
+    Bulk εισαγωγή στο gene_variants: COPY FROM STDIN (CSV) σε προσωρινό staging table
+    και ένα set-based INSERT ... ON CONFLICT DO UPDATE, σε ένα transaction.
+    Γραμμές με ίδιο content_hash με αυτό της βάσης δεν ξαναγράφονται.
+    Επιστρέφει το πλήθος γραμμών που γράφτηκαν (νέες ή με διαφορετικό content_hash).
+    """
+    encoded = frame_to_gene_variants(df, gene_column)
+    if encoded.empty:
+        return 0
+
+    columns = list(encoded.columns)
+    column_list = ", ".join(columns)
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE}
+            (LIKE gene_variants INCLUDING DEFAULTS) ON COMMIT DROP;
+        """)
+        for buffer in _csv_chunks(encoded, chunk_rows):
+            cur.copy_expert(f"COPY {STAGING_TABLE} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cur.execute(_upsert_sql(columns))
+        written = cur.rowcount
+    conn.commit()
+
+    print(f"Bulk φόρτωση {len(encoded)} μεταλλάξεων στο gene_variants ({written} νέες ή αλλαγμένες)")
+    return written
@@ -4,16 +4,21 @@ import urllib.request
 import re
 import traceback
 import os
-from typing import Dict, List, Optional, Tuple
-from psycopg2.extras import Json
-import subprocess
+from typing import Dict, List, Optional, Set, Tuple
 from collections import defaultdict
+from acmg_aggregates import create_aggregate_tables, refresh_acmg_aggregates
+from acmg_engine import build_support_tables, group_based_acmg_batch, support_criteria
+from db_load import CONTENT_HASH_DDL, VCF_LOCUS_DDL, bulk_upsert_gene_variants
+from clinvar_stream import stream_variant_summary
+from clinvar_transform import classify_consequences, extract_hgvs_columns
 
 
 
 
 # --- Ρυθμίσεις ---
 CLINVAR_VARIANT_URL = "https://ftp.ncbi.nlm.nih.gov/pub/clinvar/tab_delimited/variant_summary.txt.gz"
+GENE_FILTER = {"TP53"}
+ASSEMBLY_FILTER = "GRCh38"
 DB_CONFIG = {
     "dbname": "clinvar_db",
     "user": "ilianam",
@@ -43,6 +48,9 @@ def create_tables(conn: psycopg2.extensions.connection) -> None:
             end_pos INTEGER,
             reference_allele TEXT,
             alternate_allele TEXT,
+            position_vcf INTEGER,
+            reference_allele_vcf TEXT,
+            alternate_allele_vcf TEXT,
             acmg_criteria JSONB,
             acmg_from_grouping TEXT,
             acmg_combined_criteria TEXT,
@@ -50,9 +58,13 @@ def create_tables(conn: psycopg2.extensions.connection) -> None:
             rcvaccession TEXT[],
             last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             last_evaluated DATE,
-            protein_pos BIGINT
+            protein_pos BIGINT,
+            content_hash BIGINT
         );
         """)
+        # Βάσεις που δημιουργήθηκαν πριν από το content_hash / τις στήλες locus VCF
+        cur.execute(CONTENT_HASH_DDL)
+        cur.execute(VCF_LOCUS_DDL)
         conn.commit()
 
 
@@ -140,58 +152,15 @@ def extract_protein_pos(hgvs_p: str) -> Optional[int]:
     match = re.search(r'[A-Z][a-z]{2}(\d+)', hgvs_p)
     return int(match.group(1)) if match else None
 
-def process_clinvar_data(variant_gz_path: str) -> pd.DataFrame:
-    """Επεξεργασία ClinVar με zcat + grep (ίδια με pipeline)"""
-    print("Φιλτράρισμα δεδομένων με zcat + grep...")
-    grep_cmd = (
-        f"zcat {variant_gz_path} | head -n 1 > filtered_variants.tsv && "
-        f"zcat {variant_gz_path} | grep -E 'TP53.*GRCh38' >> filtered_variants.tsv"
-    )
-    subprocess.run(grep_cmd, shell=True, check=True)
-
-    print("Φόρτωση δεδομένων...")
-    df = pd.read_csv("filtered_variants.tsv", sep='\t', low_memory=False)
-
-    # Normalize column names
-    df.columns = (
-        df.columns
-        .str.strip()
-        .str.lower()
-        .str.replace(r"[^\w]+", "_", regex=True)
-        .str.strip("_")
-    )
-
-    # Rename clinical significance column to your preferred format
-    if 'clinical_significance' in df.columns:
-        df = df.rename(columns={'clinicalsignificance': 'clinicalsignificance'})
-
-    print("Στήλες διαθέσιμες στο αρχείο:")
-    print(df.columns.tolist())
-
-    # Clean up temporary file
-    os.remove("filtered_variants.tsv")
-
-    # Εξαγωγή HGVS
-    hgvs_data = df['name'].apply(extract_HGVS).apply(pd.Series)
-
-    # Normalize HGVS subcolumn names
-    hgvs_data.columns = (
-        hgvs_data.columns
-        .str.strip()
-        .str.lower()
-        .str.replace(r"[^\w]+", "_", regex=True)
-        .str.strip("_")
-    )
+def transform_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """Εξαγωγή HGVS και protein_pos σε ένα batch του variant_summary (ίδια με pipeline)"""
+    df = df.reset_index(drop=True)
+    # Εξαγωγή hgvs_c, hgvs_p, transcript_id και protein_pos (vectorized, όλη η στήλη μαζί)
+    hgvs_data = extract_hgvs_columns(df['name'])
 
     # Συνένωση HGVS δεδομένων με το αρχικό df
     df = pd.concat([df, hgvs_data], axis=1)
 
-    # Προσθήκη protein_pos (αν υπάρχει hgvs_p)
-    if 'hgvs_p' in df.columns:
-        df['protein_pos'] = df['hgvs_p'].apply(extract_protein_pos)
-    else:
-        df['protein_pos'] = None
-
     # Number of submitters
     if 'numbersubmitters' in df.columns:
         df['numbersubmitters'] = pd.to_numeric(df['numbersubmitters'], errors='coerce').fillna(0).astype(int)
@@ -204,6 +173,28 @@ def process_clinvar_data(variant_gz_path: str) -> pd.DataFrame:
 
     return df
 
+
+def process_clinvar_data(variant_gz_path: str, genes: Optional[Set[str]] = None) -> pd.DataFrame:
+    """Streaming επεξεργασία ClinVar σε ένα πέρασμα, χωρίς zcat + grep και προσωρινό αρχείο"""
+    genes = genes or GENE_FILTER
+    print(f"Streaming φιλτράρισμα δεδομένων ({', '.join(sorted(genes))} / {ASSEMBLY_FILTER})...")
+
+    # Κάθε batch περνάει κατευθείαν από το transform στάδιο
+    batches = [
+        transform_batch(batch)
+        for batch in stream_variant_summary(variant_gz_path, genes=genes, assembly=ASSEMBLY_FILTER)
+    ]
+    if not batches:
+        print("Δεν βρέθηκαν εγγραφές για τα φίλτρα.")
+        return pd.DataFrame()
+
+    df = pd.concat(batches, ignore_index=True)
+
+    print("Στήλες διαθέσιμες στο αρχείο:")
+    print(df.columns.tolist())
+
+    return df
+
 '''
 def apply_acmg_criteria(df: pd.DataFrame) -> pd.DataFrame:
     """Εφαρμογή ACMG κριτηρίων (ΑΚΡΙΒΩΣ όπως στο pipeline)"""
@@ -299,33 +290,8 @@ def build_acmg_support_tables(same_c_groups, same_p_groups, same_pos_groups):
     }
 '''
 def build_acmg_support_tables(df):
-    """Φτιάχνει υποστηρικτικούς πίνακες grouping για PS1 / PM5 / PP5 / BP6"""
-    df_pathogenic = df[df['clinicalsignificance'].str.contains('pathogenic', case=False, na=False)]
-
-    same_c_groups = defaultdict(list)
-    same_p_groups = defaultdict(list)
-    same_pos_groups = defaultdict(list)
-
-    for _, row in df_pathogenic.iterrows():
-        gene = row['genesymbol']
-        hgvs_c = row['hgvs_c']
-        hgvs_p = row['hgvs_p']
-        prot_pos = row.get('protein_pos')
-
-        if gene and hgvs_c:
-            same_c_groups[gene + ':' + hgvs_c].append(row)
-
-        if gene and hgvs_p:
-            same_p_groups[gene + ':' + hgvs_p].append(row)
-
-        if gene and prot_pos:
-            same_pos_groups[gene + ':' + str(prot_pos)].append(row)
-
-    return {
-        'same_c_groups': same_c_groups,
-        'same_p_groups': same_p_groups,
-        'same_pos_groups': same_pos_groups,
-    }
+    """Φτιάχνει compact υποστηρικτικούς πίνακες grouping για PS1 / PM5 / PP5 / BP6 (groupby, χωρίς iterrows)"""
+    return build_support_tables(df, gene_column='genesymbol')
 
 
 '''
@@ -356,113 +322,20 @@ def mark_acmg_criteria(df, support):
 '''
 
 def mark_acmg_criteria(row, support_tables):
-    criteria = []
-
-    gene = row['genesymbol']
-    hgvs_c = row['hgvs_c']
-    hgvs_p = row['hgvs_p']
-    prot_pos = row.get('protein_pos')
-
-#PP5 BP6
-    if gene and hgvs_c:
-        group = support_tables['same_c_groups'].get(f"{gene}:{hgvs_c}", [])
-        if any('pathogenic' in v.get('clinicalsignificance', '').lower() for v in group):
-            criteria.append("PP5")  # ή BP6 για benign
-        if any('benign' in v.get('clinicalsignificance', '').lower() for v in group):
-            criteria.append("BP6")
-
-
-#PS1
-    #if gene and hgvs_p:
-     #   group = support_tables['same_p_groups'].get(f"{gene}:{hgvs_p}", [])
-      #  if any(v.get('clinicalsignificance', '').lower() in ['pathogenic', 'likely pathogenic'] for v in group):
-       #     criteria.append("PS1")
-    if gene and hgvs_p:
-        group = support_tables['same_p_groups'].get(f"{gene}:{hgvs_p}", [])
-        same_protein_pathogenic = [
-            v for v in group
-            if 'pathogenic' in v.get('clinicalsignificance', '').lower() and 
-            v.get('hgvs_c') != hgvs_c  # exclude self
-    ]
-    if same_protein_pathogenic:
-        criteria.append("PS1")
-
-
-
-
-    # PM5: Novel missense με διαφορετικό path/likely path missense στην ίδια θέση
-    if gene and prot_pos:
-        # Αρχικά παίρνουμε όλα τα variants στην ίδια θέση
-        group = support_tables['same_pos_groups'].get(f"{gene}:{str(prot_pos)}", [])
-        
-        # Φίλτρο για missense variants που είναι path ή likely path
-        path_missense_variants = [
-            v for v in group
-            if v.get('variant_type', '').lower() == 'missense'
-            and v.get('clinicalsignificance', '').lower() in ['pathogenic']
-        ]
-        variant_type = row.get('variant_type', None)
-
-        
-        # Για να είναι PM5 πρέπει η τωρινή παραλλαγή να είναι novel missense (δηλαδή missense και όχι στα path_missense_variants)
-        is_novel_missense = (
-            variant_type == 'missense' and
-            all(v.get('hgvs_p') != hgvs_p for v in path_missense_variants)
-        )
-        
-        if is_novel_missense and len(path_missense_variants) > 0:
-            criteria.append("PM5")
-
-
-    #if gene and prot_pos:
-     #   group = support_tables['same_pos_groups'].get(f"{gene}:{str(prot_pos)}", [])
-      #  if any('pathogenic' in v.get('clinicalsignificance', '').lower() for v in group):
-        #    criteria.append("PM5")
-
-    return criteria
+    """PP5 / BP6 / PS1 / PM5 για μία γραμμή με lookups στους υποστηρικτικούς πίνακες"""
+    return support_criteria(
+        support_tables,
+        gene=row['genesymbol'],
+        hgvs_c=row['hgvs_c'],
+        hgvs_p=row['hgvs_p'],
+        protein_pos=row.get('protein_pos'),
+        variant_type=row.get('variant_type', None),
+    )
 
 
 def insert_to_database(conn, df):
-    """Εισαγωγή στη βάση (ίδια με pipeline)"""
-    with conn.cursor() as cur:
-        for _, row in df.iterrows():
-            cur.execute("""
-            INSERT INTO gene_variants (
-                variation_id, gene_symbol, hgvs_c, hgvs_p, molecular_consequence,
-                clinicalsignificance, review_status, phenotype_list, assembly,
-                chromosome, start_pos, end_pos, reference_allele, alternate_allele,
-                acmg_criteria, acmg_from_grouping, acmg_combined_criteria, conflicting_interpretations, rcvaccession, protein_pos
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (variation_id) DO UPDATE SET
-                gene_symbol = EXCLUDED.gene_symbol,
-                hgvs_c = EXCLUDED.hgvs_c,
-                hgvs_p = EXCLUDED.hgvs_p,
-                molecular_consequence = EXCLUDED.molecular_consequence,
-                clinicalsignificance = EXCLUDED.clinicalsignificance,
-                review_status = EXCLUDED.review_status,
-                phenotype_list = EXCLUDED.phenotype_list,
-                assembly = EXCLUDED.assembly,
-                chromosome = EXCLUDED.chromosome,
-                start_pos = EXCLUDED.start_pos,
-                end_pos = EXCLUDED.end_pos,
-                reference_allele = EXCLUDED.reference_allele,
-                alternate_allele = EXCLUDED.alternate_allele,
-                acmg_criteria = EXCLUDED.acmg_criteria,
-                acmg_from_grouping = EXCLUDED.acmg_from_grouping,
-                acmg_combined_criteria = EXCLUDED.acmg_combined_criteria,
-                conflicting_interpretations = EXCLUDED.conflicting_interpretations,
-                rcvaccession = EXCLUDED.rcvaccession,
-                protein_pos = EXCLUDED.protein_pos,
-                last_updated = CURRENT_TIMESTAMP;
-            """, (
-                row['variationid'], row['genesymbol'], row['hgvs_c'], row['hgvs_p'],
-                row['molecular_consequence'], row['clinicalsignificance'], row['reviewstatus'],
-                row['phenotypelist'], row['assembly'], row['chromosome'], row['start'], row['stop'],
-                row['referenceallele'], row['alternateallele'], Json(row['acmg_criteria']),row.get('acmg_from_grouping'),
-                row.get('acmg_combined_criteria'),
-                Json(row['conflictinginterpretations']), row['rcvaccession'], row['protein_pos']
-            ))
-        conn.commit()
+    """Εισαγωγή στη βάση: COPY σε staging table και ένα set-based upsert στο gene_variants"""
+    bulk_upsert_gene_variants(conn, df, gene_column='genesymbol')
 
 
 def group_based_acmg(row: pd.Series, df: pd.DataFrame) -> str:
@@ -666,6 +539,7 @@ def get_reliable_variation_ids_from_variant_summary(df: pd.DataFrame) -> set:
 def main():
     conn = psycopg2.connect(**DB_CONFIG)
     create_tables(conn)
+    create_aggregate_tables(conn)
 
     try:
         print("Ξεκίνημα script...")
@@ -679,15 +553,13 @@ def main():
         df_final = compute_conflictinginterpretations(df_final)
 
         # Υπολογισμός consequences
-        df_final['protein_consequence'] = df_final['hgvs_p'].apply(consequence)
-        df_final['dna_consequence'] = df_final['hgvs_c'].apply(consequence_dna)
-        df_final['molecular_consequence'] = df_final.apply(combine_consequence, axis=1)
-        df_final['variant_type'] = df_final.apply(combine_consequence, axis=1)  # Εδώ το variant_type
+        # (vectorized: molecular_consequence υπολογίζεται μία φορά και αντιγράφεται στο variant_type)
+        df_final = classify_consequences(df_final)
 
         # Δημιουργία στήλης acmg_from_grouping
-        df_final["acmg_from_grouping"] = df_final.apply(
-            lambda row: group_based_acmg(row, df_final), axis=1
-        )
+        # (ένα πέρασμα με groupby αντί για φιλτράρισμα όλου του DataFrame ανά γραμμή). Όπως το per-row
+        # group_based_acmg, οι ομάδες είναι σε όλο το DataFrame του GENE_FILTER και όχι ανά genesymbol
+        df_final["acmg_from_grouping"] = group_based_acmg_batch(df_final, gene_column=None)
 
         # Δημιουργία υποστηρικτικών ομάδων για PS1, PM5, PP5, BP6 με βάση pathogenic μεταλλάξεις
         print("Χτίσιμο πίνακα υποστήριξης ACMG...")
@@ -721,6 +593,10 @@ def main():
         # Εισαγωγή στη βάση δεδομένων
         print("Inserting to database...")
         insert_to_database(conn, df_final)
+
+        # Aggregates για την ταξινόμηση νέων μεταλλάξεων στο API (με τις τιμές gene_symbol όπως γράφτηκαν)
+        print("Ανανέωση ACMG aggregates...")
+        refresh_acmg_aggregates(conn, df_final['genesymbol'].dropna().unique())
         print("Ολοκληρώθηκε η επεξεργασία!")
 
     except Exception as e:
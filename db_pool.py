@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+
+# --- Ρυθμίσεις pool (με override από μεταβλητές περιβάλλοντος) ---
+POOL_MIN_SIZE = int(os.environ.get("CLINVAR_DB_POOL_MIN", "2"))
+POOL_MAX_SIZE = int(os.environ.get("CLINVAR_DB_POOL_MAX", "20"))
+POOL_TIMEOUT = float(os.environ.get("CLINVAR_DB_POOL_TIMEOUT", "5"))  # δευτερόλεπτα αναμονής για ελεύθερη σύνδεση
+
+
+class PoolExhaustedError(RuntimeError):
+    """Δεν ελευθερώθηκε σύνδεση μέσα στο POOL_TIMEOUT"""
+
+
+_pool: Optional[ThreadedConnectionPool] = None
+_slots: Optional[threading.BoundedSemaphore] = None
+_lock = threading.Lock()
+_stats = {
+    "acquired": 0,
+    "released": 0,
+    "waited": 0,        # αιτήματα που βρήκαν το pool γεμάτο και περίμεναν
+    "timeouts": 0,      # αιτήματα που απέτυχαν επειδή το pool έμεινε γεμάτο (exhaustion)
+    "in_use": 0,
+    "max_in_use": 0,
+    "wait_seconds": 0.0,
+}
+
+
+def init_pool(db_config: Dict, min_size: int = POOL_MIN_SIZE, max_size: int = POOL_MAX_SIZE) -> None:
+    """Δημιουργία του κοινόχρηστου pool συνδέσεων (μία φορά, στο startup του API)"""
+    global _pool, _slots
+    with _lock:
+        if _pool is not None:
+            return
+        _pool = ThreadedConnectionPool(min_size, max_size, **db_config)
+        _slots = threading.BoundedSemaphore(max_size)
+        _stats["max_size"] = max_size
+    print(f"Pool συνδέσεων βάσης: {min_size}-{max_size} συνδέσεις")
+
+
+def close_pool() -> None:
+    """Κλείσιμο όλων των συνδέσεων του pool (στο shutdown του API)"""
+    global _pool, _slots
+    with _lock:
+        if _pool is not None:
+            _pool.closeall()
+        _pool = None
+        _slots = None
+
+
+def get_connection(timeout: float = POOL_TIMEOUT) -> psycopg2.extensions.connection:
+    """
+    Δανείζει μια σύνδεση από το pool. Αν όλες είναι σε χρήση περιμένει έως timeout δευτερόλεπτα
+    και μετά σηκώνει PoolExhaustedError. Η σύνδεση επιστρέφεται με release_connection.
+    """
+    if _pool is None:
+        raise RuntimeError("Το pool συνδέσεων δεν έχει αρχικοποιηθεί (init_pool)")
+
+    if not _slots.acquire(blocking=False):
+        started = time.monotonic()
+        acquired = _slots.acquire(timeout=timeout)
+        with _lock:
+            _stats["waited"] += 1
+            _stats["wait_seconds"] += time.monotonic() - started
+            if not acquired:
+                _stats["timeouts"] += 1
+        if not acquired:
+            raise PoolExhaustedError(f"Καμία ελεύθερη σύνδεση βάσης μετά από {timeout}s")
+
+    try:
+        conn = _pool.getconn()
+    except Exception:
+        _slots.release()
+        raise
+
+    with _lock:
+        _stats["acquired"] += 1
+        _stats["in_use"] += 1
+        _stats["max_in_use"] = max(_stats["max_in_use"], _stats["in_use"])
+    return conn
+
+
+def release_connection(conn: Optional[psycopg2.extensions.connection]) -> None:
+    """Επιστροφή σύνδεσης στο pool (ανοιχτό transaction γίνεται rollback, χαλασμένη σύνδεση κλείνει)"""
+    if conn is None or _pool is None:
+        return
+    try:
+        _pool.putconn(conn, close=bool(conn.closed))
+    finally:
+        _slots.release()
+        with _lock:
+            _stats["released"] += 1
+            _stats["in_use"] -= 1
+
+
+def pool_stats() -> Dict:
+    """Μετρικές χρήσης του pool (για monitoring / exhaustion)"""
+    with _lock:
+        return dict(_stats, initialized=_pool is not None)
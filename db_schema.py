@@ -0,0 +1,195 @@
+import argparse
+import json
+from typing import Dict, List, Tuple
+
+import psycopg2
+
+
+# Έκφραση γονιδιωματικού διαστήματος: ίδια στο GiST index και στα queries επικάλυψης,
+# αλλιώς ο planner δεν χρησιμοποιεί το index
+GENOMIC_RANGE_EXPR = "int8range(start_pos, end_pos, '[]')"
+# Γραμμές με έγκυρο διάστημα: ίδια συνθήκη στο partial index και στα queries
+GENOMIC_RANGE_PREDICATE = "start_pos IS NOT NULL AND end_pos IS NOT NULL AND start_pos <= end_pos"
+# Τρόποι αναζήτησης περιοχής: επικάλυψη με το παράθυρο ή πλήρης περιεχόμενη μετάλλαξη
+GENOMIC_RANGE_OPERATORS = {"overlap": "&&", "contained": "<@"}
+# Στήλες του variants_by_genomic_range: οι αρχικές, και μετά όσες χρειάζονται για keyset / αναζήτηση ανά χρωμόσωμα
+GENOMIC_RANGE_COLUMNS = (
+    "gene_symbol, protein_pos, hgvs_c, hgvs_p, clinicalsignificance, molecular_consequence, "
+    "variation_id, chromosome, start_pos, end_pos"
+)
+
+EXTENSIONS = ["pg_trgm", "btree_gist"]
+
+# (όνομα, ορισμός) για κάθε secondary index του gene_variants, ανά μοτίβο πρόσβασης του api.py
+GENE_VARIANTS_INDEXES: List[Tuple[str, str]] = [
+    # user_classify_variant: gene_symbol + hgvs_c
+    ("idx_gene_variants_gene_hgvs_c", "btree (gene_symbol, hgvs_c)"),
+    # PS1 lookups: gene_symbol + hgvs_p
+    ("idx_gene_variants_gene_hgvs_p", "btree (gene_symbol, hgvs_p)"),
+    # variants_by_protein_pos / variant_counts: gene_symbol + protein_pos (ισότητα ή BETWEEN)
+    ("idx_gene_variants_gene_protein_pos", "btree (gene_symbol, protein_pos)"),
+    # vcf_classify: αντιστοίχιση εγγραφών VCF στο locus (στήλες VCF του ClinVar)
+    ("idx_gene_variants_locus", "btree (chromosome, position_vcf, reference_allele_vcf, alternate_allele_vcf)"),
+    # variants_by_genomic_range: επικάλυψη (&&) ή περιεχόμενο (<@) διάστημα, ανά γονίδιο ή ανά χρωμόσωμα
+    ("idx_gene_variants_gene_genomic_range",
+     f"gist (gene_symbol, ({GENOMIC_RANGE_EXPR})) WHERE {GENOMIC_RANGE_PREDICATE}"),
+    ("idx_gene_variants_chrom_genomic_range",
+     f"gist (chromosome, ({GENOMIC_RANGE_EXPR})) WHERE {GENOMIC_RANGE_PREDICATE}"),
+    # ILIKE '%...%' φίλτρα
+    ("idx_gene_variants_consequence_trgm", "gin (molecular_consequence gin_trgm_ops)"),
+    ("idx_gene_variants_significance_trgm", "gin (clinicalsignificance gin_trgm_ops)"),
+]
+
+# Αντιπροσωπευτικά queries των endpoints (με ενδεικτικές τιμές) για τον έλεγχο με EXPLAIN
+ENDPOINT_QUERIES: Dict[str, Tuple[str, tuple]] = {
+    "user_classify_variant": (
+        "SELECT * FROM gene_variants WHERE gene_symbol = %s AND hgvs_c = %s",
+        ("TP53", "c.524G>A"),
+    ),
+    # user_classify_variant / acmg_criteria για νέα μετάλλαξη: lookups του acmg_aggregates.lookup_criteria
+    "acmg_criteria (acmg_pathogenic_p)": (
+        "SELECT 1 FROM acmg_pathogenic_p WHERE gene_symbol = %s AND hgvs_p = %s AND hgvs_c IS DISTINCT FROM %s",
+        ("TP53", "p.Arg175His", "c.524G>A"),
+    ),
+    "acmg_criteria (acmg_pathogenic_pos)": (
+        "SELECT 1 FROM acmg_pathogenic_pos WHERE gene_symbol = %s AND protein_pos = %s AND hgvs_p IS DISTINCT FROM %s",
+        ("TP53", 175, "p.Arg175His"),
+    ),
+    "acmg_criteria (acmg_significance_c)": (
+        "SELECT DISTINCT clinsigsimple FROM acmg_significance_c "
+        "WHERE gene_symbol = %s AND hgvs_c = %s AND hgvs_p IS DISTINCT FROM %s",
+        ("TP53", "c.524G>A", "p.Arg175His"),
+    ),
+    # Ίδια queries με το api.py: χωρίς limit / after_id όλα τα αποτελέσματα, αλλιώς keyset σελίδα
+    "variants_by_genomic_range (contained)": (
+        f"SELECT {GENOMIC_RANGE_COLUMNS} FROM gene_variants WHERE {GENOMIC_RANGE_PREDICATE} "
+        f"AND {GENOMIC_RANGE_EXPR} <@ int8range(%s, %s, '[]') AND gene_symbol = %s",
+        (7668402, 7687550, "TP53"),
+    ),
+    "variants_by_genomic_range (overlap)": (
+        f"SELECT {GENOMIC_RANGE_COLUMNS} FROM gene_variants WHERE {GENOMIC_RANGE_PREDICATE} "
+        f"AND {GENOMIC_RANGE_EXPR} && int8range(%s, %s, '[]') AND gene_symbol = %s",
+        (7668402, 7687550, "TP53"),
+    ),
+    "variants_by_genomic_range (chromosome, contained)": (
+        f"SELECT {GENOMIC_RANGE_COLUMNS} FROM gene_variants WHERE {GENOMIC_RANGE_PREDICATE} "
+        f"AND {GENOMIC_RANGE_EXPR} <@ int8range(%s, %s, '[]') AND chromosome = %s",
+        (1, 25000000, "17"),
+    ),
+    # Σε παράθυρο όλου του βραχίονα ο planner μπορεί να προτιμήσει το primary key για το ORDER BY ... LIMIT
+    "variants_by_genomic_range (chromosome, overlap, page)": (
+        f"SELECT {GENOMIC_RANGE_COLUMNS} FROM gene_variants WHERE {GENOMIC_RANGE_PREDICATE} "
+        f"AND {GENOMIC_RANGE_EXPR} && int8range(%s, %s, '[]') AND chromosome = %s "
+        "AND variation_id > %s ORDER BY variation_id LIMIT %s",
+        (1, 25000000, "17", 0, 501),
+    ),
+    "vcf_classify (locus)": (
+        "SELECT * FROM gene_variants WHERE chromosome = %s AND position_vcf = %s "
+        "AND reference_allele_vcf = %s AND alternate_allele_vcf = %s",
+        ("17", 7675088, "C", "T"),
+    ),
+    "variants_by_protein_pos": (
+        "SELECT * FROM gene_variants WHERE gene_symbol = %s AND protein_pos BETWEEN %s AND %s",
+        ("TP53", 100, 200),
+    ),
+    # Με limit / after_id τα endpoints προσθέτουν keyset (ORDER BY variation_id LIMIT n), που αλλάζει το plan
+    "variants_by_protein_pos (page)": (
+        "SELECT * FROM gene_variants WHERE gene_symbol = %s AND protein_pos BETWEEN %s AND %s "
+        "AND variation_id > %s ORDER BY variation_id LIMIT %s",
+        ("TP53", 100, 200, 0, 501),
+    ),
+    "variant_counts (consequence)": (
+        "SELECT COUNT(*) FROM gene_variants WHERE molecular_consequence ILIKE %s",
+        ("%missense%",),
+    ),
+    "search_variants (significance, page)": (
+        "SELECT * FROM gene_variants WHERE 1=1 AND clinicalsignificance ILIKE %s ORDER BY variation_id LIMIT %s",
+        ("%Pathogenic%", 501),
+    ),
+    "available_genes": (
+        "SELECT DISTINCT gene_symbol FROM gene_variants ORDER BY gene_symbol",
+        (),
+    ),
+}
+
+
+def create_indexes(conn: psycopg2.extensions.connection) -> None:
+    """
+    Δημιουργία (αν λείπουν) των extensions και του index set του gene_variants και ANALYZE.
+    Καλείται μετά το bulk load, ώστε τα indexes να χτίζονται μία φορά αντί να ενημερώνονται ανά γραμμή.
+    """
+    with conn.cursor() as cur:
+        for extension in EXTENSIONS:
+            cur.execute(f"CREATE EXTENSION IF NOT EXISTS {extension};")
+        for name, definition in GENE_VARIANTS_INDEXES:
+            print(f"Index {name}...")
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON gene_variants USING {definition};")
+        cur.execute("ANALYZE gene_variants;")
+    conn.commit()
+
+
+def drop_indexes(conn: psycopg2.extensions.connection) -> None:
+    """Διαγραφή των secondary indexes (πριν από πλήρη φόρτωση όλων των γονιδίων)"""
+    with conn.cursor() as cur:
+        for name, _ in GENE_VARIANTS_INDEXES:
+            cur.execute(f"DROP INDEX IF EXISTS {name};")
+    conn.commit()
+
+
+def _plan_index_nodes(plan: Dict) -> List[str]:
+    """Όλοι οι κόμβοι του plan που διαβάζουν index (Index Scan / Index Only Scan / Bitmap Index Scan)"""
+    nodes = []
+    if "Index Name" in plan:
+        nodes.append(f"{plan['Node Type']} ({plan['Index Name']})")
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_index_nodes(child))
+    return nodes
+
+
+def check_index_usage(conn: psycopg2.extensions.connection, force_index: bool = False) -> Dict[str, List[str]]:
+    """
+    EXPLAIN για το query κάθε endpoint και έλεγχος ότι το plan χρησιμοποιεί index.
+    Με force_index=True απενεργοποιείται το seq scan, για να ελεγχθεί ότι υπάρχει κατάλληλο index
+    ακόμη και σε μικρό πίνακα όπου ο planner θα προτιμούσε seq scan.
+    Επιστρέφει endpoint -> indexes (κενή λίστα = δεν χρησιμοποιείται index).
+    """
+    usage = {}
+    with conn.cursor() as cur:
+        if force_index:
+            cur.execute("SET LOCAL enable_seqscan = off;")
+        for endpoint, (query, params) in ENDPOINT_QUERIES.items():
+            cur.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            usage[endpoint] = _plan_index_nodes(plan[0]["Plan"])
+    conn.rollback()
+    return usage
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index set του gene_variants και έλεγχος χρήσης με EXPLAIN")
+    parser.add_argument("--create", action="store_true", help="Δημιουργία των indexes (μετά το load)")
+    parser.add_argument("--drop", action="store_true", help="Διαγραφή των secondary indexes")
+    parser.add_argument("--check", action="store_true", help="EXPLAIN για κάθε endpoint query")
+    parser.add_argument("--force-index", action="store_true", help="Έλεγχος με απενεργοποιημένο seq scan")
+    args = parser.parse_args()
+
+    from new2 import DB_CONFIG
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if args.drop:
+            drop_indexes(conn)
+        if args.create:
+            create_indexes(conn)
+        if args.check:
+            missing = []
+            for endpoint, indexes in check_index_usage(conn, args.force_index).items():
+                print(f"{endpoint}: {', '.join(indexes) if indexes else 'ΧΩΡΙΣ INDEX (seq scan)'}")
+                if not indexes:
+                    missing.append(endpoint)
+            if missing:
+                raise SystemExit(1)
+    finally:
+        conn.close()
@@ -4,16 +4,44 @@ import urllib.request
 import re
 import traceback
 import os
-from typing import Dict, List, Optional, Tuple
-from psycopg2.extras import Json
-import subprocess
+import argparse
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 from collections import defaultdict
+from clinvar_cache import load_cached_panel, resolve_release_date, save_cached_panel
+from acmg_aggregates import create_aggregate_tables, refresh_acmg_aggregates
+from acmg_engine import (
+    build_acmg_aggregates,
+    build_grouping_counts,
+    build_support_tables,
+    group_based_acmg_batch,
+    group_based_acmg_from_counts,
+    merge_count_tables,
+    merge_support_tables,
+    score_all,
+    support_criteria,
+)
+from db_load import CONTENT_HASH_DDL, VCF_LOCUS_DDL, bulk_upsert_gene_variants
+from db_schema import create_indexes, drop_indexes
+from clinvar_stream import (
+    WORKERS,
+    concat_frames,
+    load_gene_panel,
+    memory_report,
+    partition_by_gene,
+    partition_frame_by_gene,
+    read_variant_summary_parallel,
+    stream_variant_summary,
+)
+from clinvar_transform import classify_consequences, extract_hgvs_columns
 
 
 
 
 # --- Ρυθμίσεις ---
 CLINVAR_VARIANT_URL = "https://ftp.ncbi.nlm.nih.gov/pub/clinvar/tab_delimited/variant_summary.txt.gz"
+GENE_FILTER = {"TP53"}
+ASSEMBLY_FILTER = "GRCh38"
+CHUNK_MERGE_EVERY = 8  # chunked mode: συμπίεση των μερικών aggregates κάθε τόσα chunks
 DB_CONFIG = {
     "dbname": "clinvar_db",
     "user": "ilianam",
@@ -44,6 +72,9 @@ def create_tables(conn: psycopg2.extensions.connection) -> None:
             end_pos INTEGER,
             reference_allele TEXT,
             alternate_allele TEXT,
+            position_vcf INTEGER,
+            reference_allele_vcf TEXT,
+            alternate_allele_vcf TEXT,
             acmg_criteria JSONB,
             acmg_from_grouping TEXT,
             acmg_combined_criteria TEXT,
@@ -51,9 +82,13 @@ def create_tables(conn: psycopg2.extensions.connection) -> None:
             rcvaccession TEXT[],
             last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             last_evaluated DATE,
-            protein_pos BIGINT
+            protein_pos BIGINT,
+            content_hash BIGINT
         );
         """)
+        # Βάσεις που δημιουργήθηκαν πριν από το content_hash / τις στήλες locus VCF
+        cur.execute(CONTENT_HASH_DDL)
+        cur.execute(VCF_LOCUS_DDL)
         conn.commit()
 
 
@@ -141,64 +176,23 @@ def extract_protein_pos(hgvs_p: str) -> Optional[int]:
     match = re.search(r'[A-Z][a-z]{2}(\d+)', hgvs_p)
     return int(match.group(1)) if match else None
 
-def process_clinvar_data(variant_gz_path: str) -> pd.DataFrame:
-    """Επεξεργασία ClinVar με zcat + grep (ίδια με pipeline)"""
-    print("Φιλτράρισμα δεδομένων με zcat + grep...")
-    grep_cmd = (
-        f"zcat {variant_gz_path} | head -n 1 > filtered_variants.tsv && "
-        f"zcat {variant_gz_path} | grep -E 'TP53.*GRCh38' >> filtered_variants.tsv"
-    )
-    subprocess.run(grep_cmd, shell=True, check=True)
-
-    print("Φόρτωση δεδομένων...")
-    df = pd.read_csv("filtered_variants.tsv", sep='\t', low_memory=False)
-
-    # Normalize column names
-    df.columns = (
-        df.columns
-        .str.strip()
-        .str.lower()
-        .str.replace(r"[^\w]+", "_", regex=True)
-        .str.strip("_")
-    )
-        # Fix column names for compatibility
+def transform_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """Εξαγωγή HGVS και protein_pos σε ένα batch του variant_summary (ίδια με pipeline)"""
+    df = df.reset_index(drop=True)
+
+    # Fix column names for compatibility
     df.rename(columns={
         "genesymbol": "gene_symbol",
         "proteinposition": "protein_pos",
         "clinicalsignificance": "clinicalsignificance",
     }, inplace=True)
 
-    # Rename clinical significance column to your preferred format
-    if 'clinical_significance' in df.columns:
-        df = df.rename(columns={'clinicalsignificance': 'clinicalsignificance'})
-
-    print("Στήλες διαθέσιμες στο αρχείο:")
-    print(df.columns.tolist())
-
-    # Clean up temporary file
-    os.remove("filtered_variants.tsv")
-
-    # Εξαγωγή HGVS
-    hgvs_data = df['name'].apply(extract_HGVS).apply(pd.Series)
-
-    # Normalize HGVS subcolumn names
-    hgvs_data.columns = (
-        hgvs_data.columns
-        .str.strip()
-        .str.lower()
-        .str.replace(r"[^\w]+", "_", regex=True)
-        .str.strip("_")
-    )
+    # Εξαγωγή hgvs_c, hgvs_p, transcript_id και protein_pos (vectorized, όλη η στήλη μαζί)
+    hgvs_data = extract_hgvs_columns(df['name'])
 
     # Συνένωση HGVS δεδομένων με το αρχικό df
     df = pd.concat([df, hgvs_data], axis=1)
 
-    # Προσθήκη protein_pos (αν υπάρχει hgvs_p)
-    if 'hgvs_p' in df.columns:
-        df['protein_pos'] = df['hgvs_p'].apply(extract_protein_pos)
-    else:
-        df['protein_pos'] = None
-
     # Number of submitters
     if 'numbersubmitters' in df.columns:
         df['numbersubmitters'] = pd.to_numeric(df['numbersubmitters'], errors='coerce').fillna(0).astype(int)
@@ -207,7 +201,35 @@ def process_clinvar_data(variant_gz_path: str) -> pd.DataFrame:
 
     # Φιλτράρισμα: κρατάμε μόνο εγγραφές με έγκυρο protein_pos
     df = df[df['protein_pos'].notna()]
-    df['protein_pos'] = df['protein_pos'].astype(int)
+    df['protein_pos'] = df['protein_pos'].astype("int32")
+
+    return df
+
+
+def process_clinvar_data(variant_gz_path: str, genes: Optional[Set[str]] = None, workers: int = 1) -> pd.DataFrame:
+    """Streaming επεξεργασία ClinVar σε ένα πέρασμα, χωρίς zcat + grep και προσωρινό αρχείο"""
+    genes = genes or GENE_FILTER
+    print(f"Streaming φιλτράρισμα δεδομένων ({', '.join(sorted(genes))} / {ASSEMBLY_FILTER})...")
+
+    # Κάθε batch περνάει κατευθείαν από το transform στάδιο
+    if workers > 1:
+        batches = list(read_variant_summary_parallel(
+            variant_gz_path, genes=genes, assembly=ASSEMBLY_FILTER, workers=workers, transform=transform_batch,
+            compact=True
+        ))
+    else:
+        batches = [
+            transform_batch(batch)
+            for batch in stream_variant_summary(variant_gz_path, genes=genes, assembly=ASSEMBLY_FILTER, compact=True)
+        ]
+    if not batches:
+        print("Δεν βρέθηκαν εγγραφές για τα φίλτρα.")
+        return pd.DataFrame()
+
+    df = concat_frames(batches)
+
+    print("Στήλες διαθέσιμες στο αρχείο:")
+    print(df.columns.tolist())
 
     return df
 
@@ -306,33 +328,8 @@ def build_acmg_support_tables(same_c_groups, same_p_groups, same_pos_groups):
     }
 '''
 def build_acmg_support_tables(df):
-    """Φτιάχνει υποστηρικτικούς πίνακες grouping για PS1 / PM5 / PP5 / BP6"""
-    df_pathogenic = df[df['clinicalsignificance'].str.contains('pathogenic', case=False, na=False)]
-
-    same_c_groups = defaultdict(list)
-    same_p_groups = defaultdict(list)
-    same_pos_groups = defaultdict(list)
-
-    for _, row in df_pathogenic.iterrows():
-        gene = row['gene_symbol']
-        hgvs_c = row['hgvs_c']
-        hgvs_p = row['hgvs_p']
-        prot_pos = row.get('protein_pos')
-
-        if gene and hgvs_c:
-            same_c_groups[gene + ':' + hgvs_c].append(row)
-
-        if gene and hgvs_p:
-            same_p_groups[gene + ':' + hgvs_p].append(row)
-
-        if gene and prot_pos:
-            same_pos_groups[gene + ':' + str(prot_pos)].append(row)
-
-    return {
-        'same_c_groups': same_c_groups,
-        'same_p_groups': same_p_groups,
-        'same_pos_groups': same_pos_groups,
-    }
+    """Φτιάχνει compact υποστηρικτικούς πίνακες grouping για PS1 / PM5 / PP5 / BP6 (groupby, χωρίς iterrows)"""
+    return build_support_tables(df, gene_column='gene_symbol')
 
 
 '''
@@ -363,70 +360,15 @@ def mark_acmg_criteria(df, support):
 '''
 
 def mark_acmg_criteria(row, support_tables):
-    criteria = []
-
-    gene = row['gene_symbol']
-    hgvs_c = row['hgvs_c']
-    hgvs_p = row['hgvs_p']
-    prot_pos = row.get('protein_pos')
-
-#PP5 BP6
-    if gene and hgvs_c:
-        group = support_tables['same_c_groups'].get(f"{gene}:{hgvs_c}", [])
-        if any('pathogenic' in v.get('clinicalsignificance', '').lower() for v in group):
-            criteria.append("PP5")  # ή BP6 για benign
-        if any('benign' in v.get('clinicalsignificance', '').lower() for v in group):
-            criteria.append("BP6")
-
-
-#PS1
-    #if gene and hgvs_p:
-     #   group = support_tables['same_p_groups'].get(f"{gene}:{hgvs_p}", [])
-      #  if any(v.get('clinicalsignificance', '').lower() in ['pathogenic', 'likely pathogenic'] for v in group):
-       #     criteria.append("PS1")
-    if gene and hgvs_p:
-        group = support_tables['same_p_groups'].get(f"{gene}:{hgvs_p}", [])
-        same_protein_pathogenic = [
-            v for v in group
-            if 'pathogenic' in v.get('clinicalsignificance', '').lower() and 
-            v.get('hgvs_c') != hgvs_c  # exclude self
-    ]
-    if same_protein_pathogenic:
-        criteria.append("PS1")
-
-
-
-
-    # PM5: Novel missense με διαφορετικό path/likely path missense στην ίδια θέση
-    if gene and prot_pos:
-        # Αρχικά παίρνουμε όλα τα variants στην ίδια θέση
-        group = support_tables['same_pos_groups'].get(f"{gene}:{str(prot_pos)}", [])
-        
-        # Φίλτρο για missense variants που είναι path ή likely path
-        path_missense_variants = [
-            v for v in group
-            if v.get('variant_type', '').lower() == 'missense'
-            and v.get('clinicalsignificance', '').lower() in ['pathogenic']
-        ]
-        variant_type = row.get('variant_type', None)
-
-        
-        # Για να είναι PM5 πρέπει η τωρινή παραλλαγή να είναι novel missense (δηλαδή missense και όχι στα path_missense_variants)
-        is_novel_missense = (
-            variant_type == 'missense' and
-            all(v.get('hgvs_p') != hgvs_p for v in path_missense_variants)
-        )
-        
-        if is_novel_missense and len(path_missense_variants) > 0:
-            criteria.append("PM5")
-
-
-    #if gene and prot_pos:
-     #   group = support_tables['same_pos_groups'].get(f"{gene}:{str(prot_pos)}", [])
-      #  if any('pathogenic' in v.get('clinicalsignificance', '').lower() for v in group):
-        #    criteria.append("PM5")
-
-    return criteria
+    """PP5 / BP6 / PS1 / PM5 για μία γραμμή με lookups στους υποστηρικτικούς πίνακες"""
+    return support_criteria(
+        support_tables,
+        gene=row['gene_symbol'],
+        hgvs_c=row['hgvs_c'],
+        hgvs_p=row['hgvs_p'],
+        protein_pos=row.get('protein_pos'),
+        variant_type=row.get('variant_type', None),
+    )
 
 
 
@@ -478,47 +420,8 @@ def apply_ps1_pm5_pp5_bp6(row: pd.Series, df: pd.DataFrame) -> List[str]:
 
 
 def insert_to_database(conn, df):
-    """Εισαγωγή στη βάση (ίδια με pipeline)"""
-    with conn.cursor() as cur:
-        for _, row in df.iterrows():
-            cur.execute("""
-            INSERT INTO gene_variants (
-                variation_id, gene_symbol, hgvs_c, hgvs_p, molecular_consequence,
-                clinicalsignificance,clinsigsimple, review_status, phenotype_list, assembly,
-                chromosome, start_pos, end_pos, reference_allele, alternate_allele,
-                acmg_criteria, acmg_from_grouping, acmg_combined_criteria, conflicting_interpretations, rcvaccession, protein_pos
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (variation_id) DO UPDATE SET
-                gene_symbol = EXCLUDED.gene_symbol,
-                hgvs_c = EXCLUDED.hgvs_c,
-                hgvs_p = EXCLUDED.hgvs_p,
-                molecular_consequence = EXCLUDED.molecular_consequence,
-                clinicalsignificance = EXCLUDED.clinicalsignificance,
-                clinsigsimple = EXCLUDED.clinsigsimple,
-                review_status = EXCLUDED.review_status,
-                phenotype_list = EXCLUDED.phenotype_list,
-                assembly = EXCLUDED.assembly,
-                chromosome = EXCLUDED.chromosome,
-                start_pos = EXCLUDED.start_pos,
-                end_pos = EXCLUDED.end_pos,
-                reference_allele = EXCLUDED.reference_allele,
-                alternate_allele = EXCLUDED.alternate_allele,
-                acmg_criteria = EXCLUDED.acmg_criteria,
-                acmg_from_grouping = EXCLUDED.acmg_from_grouping,
-                acmg_combined_criteria = EXCLUDED.acmg_combined_criteria,
-                conflicting_interpretations = EXCLUDED.conflicting_interpretations,
-                rcvaccession = EXCLUDED.rcvaccession,
-                protein_pos = EXCLUDED.protein_pos,
-                last_updated = CURRENT_TIMESTAMP;
-            """, (
-                row['variationid'], row['gene_symbol'], row['hgvs_c'], row['hgvs_p'],
-                row['molecular_consequence'], row['clinicalsignificance'], row['clinsigsimple'], row['reviewstatus'],
-                row['phenotypelist'], row['assembly'], row['chromosome'], row['start'], row['stop'],
-                row['referenceallele'], row['alternateallele'], Json(row['acmg_criteria']),row.get('acmg_from_grouping'),
-                row.get('acmg_combined_criteria'),
-                Json(row['conflictinginterpretations']), row['rcvaccession'], row['protein_pos']
-            ))
-        conn.commit()
+    """Εισαγωγή στη βάση: COPY σε staging table και ένα set-based upsert στο gene_variants"""
+    bulk_upsert_gene_variants(conn, df, gene_column='gene_symbol')
 
 
 def group_based_acmg(row: pd.Series, df: pd.DataFrame) -> str:
@@ -658,7 +561,7 @@ def simplify_clinical_significance(df):
 
 def compute_conflictinginterpretations(df):
     conflict_dict = {}
-    for vid, group in df.groupby('variationid'):
+    for vid, group in df.groupby('variationid', observed=True):
         unique_sigs = set(group['clinsigsimple'].dropna())
         # Αν έχει πάνω από μία διαφορετική κατηγορία, σημαίνει σύγκρουση
         conflict_dict[vid] = len(unique_sigs) > 1
@@ -698,7 +601,7 @@ def get_reliable_variation_ids_from_variant_summary(df: pd.DataFrame) -> set:
 
     grouped = (
         df_valid
-        .groupby(['variationid', 'clinicalsignificance'])
+        .groupby(['variationid', 'clinicalsignificance'], observed=True)
         .size()
         .reset_index(name='count')
     )
@@ -719,73 +622,261 @@ def get_reliable_variation_ids_from_variant_summary(df: pd.DataFrame) -> set:
     return reliable_ids
 
 
-def main():
-    conn = psycopg2.connect(**DB_CONFIG)
-    create_tables(conn)
+def prepare_variants(df_final: pd.DataFrame) -> pd.DataFrame:
+    """Clinical significance και consequences (ο κανονικοποιημένος πίνακας που μπαίνει στο cache)"""
+    # Απλοποίηση του clinical significance και προσθήκη conflicting interpretations
+    df_final = simplify_clinical_significance(df_final)
+    df_final = compute_conflictinginterpretations(df_final)
 
-    try:
-        print("Ξεκίνημα script...")
-        variant_gz = "variant_summary.txt.gz"
-        urllib.request.urlretrieve(CLINVAR_VARIANT_URL, variant_gz)
-        
-        df_final = process_clinvar_data(variant_gz)
-
-        # Απλοποίηση του clinical significance και προσθήκη conflicting interpretations
-        df_final = simplify_clinical_significance(df_final)
-        df_final = compute_conflictinginterpretations(df_final)
+    # Υπολογισμός consequences
+    # (vectorized: molecular_consequence υπολογίζεται μία φορά και αντιγράφεται στο variant_type)
+    df_final = classify_consequences(df_final)
+    return df_final
 
-        # Υπολογισμός consequences
-        df_final['protein_consequence'] = df_final['hgvs_p'].apply(consequence)
-        df_final['dna_consequence'] = df_final['hgvs_c'].apply(consequence_dna)
-        df_final['molecular_consequence'] = df_final.apply(combine_consequence, axis=1)
-        df_final['variant_type'] = df_final.apply(combine_consequence, axis=1)  # Εδώ το variant_type
 
-        # Δημιουργία στήλης acmg_from_grouping
-        df_final["acmg_from_grouping"] = df_final.apply(
-            lambda row: group_based_acmg(row, df_final), axis=1
+def annotate_variants(df_final: pd.DataFrame, chunk_aggregates: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    ACMG κριτήρια για τις (ήδη κανονικοποιημένες) μεταλλάξεις ενός γονιδίου.
+    Στο chunked mode τα cross-row aggregates (build_chunk_aggregates) έρχονται από όλο το αρχείο
+    και το df_final είναι ένα chunk με πολλά γονίδια.
+    Όλα τα κριτήρια ομαδοποιούνται ανά gene_symbol (όπως γράφεται στο ClinVar, π.χ. 'TP53;WRAP53'),
+    ώστε panel, parallel και chunked mode να δίνουν ίδιο αποτέλεσμα για κάθε γραμμή.
+    """
+    if chunk_aggregates is not None:
+        df_final["acmg_from_grouping"] = group_based_acmg_from_counts(
+            df_final, chunk_aggregates['grouping'], gene_column='gene_symbol'
         )
+        support_tables = chunk_aggregates['support']
+    else:
+        # Δημιουργία στήλης acmg_from_grouping
+        # (ένα πέρασμα με groupby αντί για φιλτράρισμα όλου του DataFrame ανά γραμμή)
+        df_final["acmg_from_grouping"] = group_based_acmg_batch(df_final, gene_column='gene_symbol')
 
         # Δημιουργία υποστηρικτικών ομάδων για PS1, PM5, PP5, BP6 με βάση pathogenic μεταλλάξεις
         print("Χτίσιμο πίνακα υποστήριξης ACMG...")
         support_tables = build_acmg_support_tables(df_final)
-        '''
-        # Εφαρμογή κριτηρίων ACMG σε κάθε σειρά
-        print("Σήμανση ACMG criteria...")
-        df_final["acmg_criteria"] = df_final.apply(lambda row: mark_acmg_criteria(row, support_tables), axis=1)
-        '''
-        # Εφαρμογή κριτηρίων ACMG σε κάθε σειρά (group-based + από raw data)
-        print("Σήμανση ACMG criteria...")
-        df_final["acmg_criteria"] = df_final.apply(
-            lambda row: sorted(set(
-                mark_acmg_criteria(row, support_tables) + apply_ps1_pm5_pp5_bp6(row, df_final)
-            )),
-            axis=1
-        )
+    '''
+    # Εφαρμογή κριτηρίων ACMG σε κάθε σειρά
+    print("Σήμανση ACMG criteria...")
+    df_final["acmg_criteria"] = df_final.apply(lambda row: mark_acmg_criteria(row, support_tables), axis=1)
+    '''
+    # Εφαρμογή κριτηρίων ACMG σε κάθε σειρά (group-based + από raw data)
+    print("Σήμανση ACMG criteria...")
+    # PS1/PM5/PP5/BP6 από raw data για όλες τις γραμμές μαζί (ίδια με apply_ps1_pm5_pp5_bp6 ανά γραμμή)
+    raw_criteria = score_all(df_final, aggregates=chunk_aggregates['acmg'] if chunk_aggregates else None)
+    df_final["acmg_criteria"] = df_final.apply(
+        lambda row: sorted(set(
+            mark_acmg_criteria(row, support_tables) + raw_criteria[row.name]
+        )),
+        axis=1
+    )
 
-        # Συνδυασμός όλων των ACMG criteria
-        print("Combining ACMG criteria...")
-        df_final["acmg_combined_criteria"] = df_final.apply(
-            lambda row: "; ".join(sorted(
-                set(row['acmg_criteria'] + [
-                    x.strip() for x in row['acmg_from_grouping'].split(";") if x
-                ])
-            )),
-            axis=1
-        )
+    # Συνδυασμός όλων των ACMG criteria
+    print("Combining ACMG criteria...")
+    df_final["acmg_combined_criteria"] = df_final.apply(
+        lambda row: "; ".join(sorted(
+            set(row['acmg_criteria'] + [
+                x.strip() for x in row['acmg_from_grouping'].split(";") if x
+            ])
+        )),
+        axis=1
+    )
+
+    # Μετατροπή του rcvaccession σε λίστα (jsonb)
+    if 'rcvaccession' in df_final.columns:
+        df_final['rcvaccession'] = df_final['rcvaccession'].apply(convert_pipe_string_to_list)
+
+    print("Εύρεση αξιόπιστων VariationIDs...")
+    reliable_ids = get_reliable_variation_ids_from_variant_summary(df_final)
+    f_final = df_final[df_final['variationid'].isin(reliable_ids)]
+
+    print("Μετά το φιλτράρισμα: {} μεταλλάξεις".format(len(df_final)))
+    return df_final
+
+
+def process_clinvar_panel(variant_gz_path: str, genes: Optional[Set[str]], workers: int = 1) -> Dict[str, pd.DataFrame]:
+    """Φόρτωση panel γονιδίων (ή όλων, με genes=None) σε ένα πέρασμα, με ένα DataFrame ανά γονίδιο"""
+    label = ', '.join(sorted(genes)) if genes else 'όλα τα γονίδια'
+    print(f"Streaming φιλτράρισμα δεδομένων ({label} / {ASSEMBLY_FILTER})...")
+
+    # Parallel mode: parsing + HGVS στους workers, μοίρασμα ανά γονίδιο στο τέλος
+    if workers > 1:
+        print(f"Parallel ανάγνωση με {workers} workers...")
+        batches = list(read_variant_summary_parallel(
+            variant_gz_path, genes=genes, assembly=ASSEMBLY_FILTER, workers=workers, transform=transform_batch,
+            compact=True
+        ))
+        if not batches:
+            return {}
+        return partition_frame_by_gene(concat_frames(batches), genes, 'gene_symbol')
+
+    partitions = partition_by_gene(variant_gz_path, genes=genes, assembly=ASSEMBLY_FILTER, compact=True)
+    return {gene: transform_batch(df) for gene, df in partitions.items()}
+
+
+def build_chunk_aggregates(variant_gz_path: str, genes: Optional[Set[str]], memory_budget_mb: float) -> Dict:
+    """
+    Πρώτο πέρασμα του chunked mode: κρατά μόνο τα μικρά cross-row aggregates του ACMG
+    (πλήθη για PS1 / PM5 / PP5 / BP6 και support tables), όχι τις ίδιες τις γραμμές.
+    Τα conflicting interpretations είναι ανά variationid, που στο variant_summary είναι μία γραμμή ανά assembly,
+    οπότε υπολογίζονται μέσα σε κάθε chunk.
+    """
+    grouping, acmg, support = [], [], []
+    for batch in stream_variant_summary(variant_gz_path, genes=genes, assembly=ASSEMBLY_FILTER,
+                                        memory_budget_mb=memory_budget_mb, compact=True):
+        df = prepare_variants(transform_batch(batch))
+        if df.empty:
+            continue
+        grouping.append(build_grouping_counts(df, gene_column='gene_symbol'))
+        acmg.append(build_acmg_aggregates(df, gene_column='gene_symbol'))
+        support.append(build_acmg_support_tables(df))
+
+        # Συμπίεση των μερικών αθροισμάτων ώστε η λίστα να μη μεγαλώνει με το πλήθος των chunks
+        if len(grouping) >= CHUNK_MERGE_EVERY:
+            grouping, acmg, support = [merge_count_tables(grouping)], [merge_count_tables(acmg)], [merge_support_tables(support)]
+
+    if not grouping:
+        return {}
+    return {
+        'grouping': merge_count_tables(grouping),
+        'acmg': merge_count_tables(acmg),
+        'support': merge_support_tables(support),
+    }
+
+
+def annotate_chunks(variant_gz_path: str, genes: Optional[Set[str]], memory_budget_mb: float) -> Iterator[pd.DataFrame]:
+    """
+    Chunked mode χωρίς τη βάση: πέρασμα 1 για τα aggregates, πέρασμα 2 που επιστρέφει κάθε chunk
+    μετά από HGVS, consequences και ACMG (έτοιμο για insert_to_database).
+    """
+    print(f"Chunked mode με memory budget {memory_budget_mb} MB - πέρασμα 1: ACMG aggregates...")
+    chunk_aggregates = build_chunk_aggregates(variant_gz_path, genes, memory_budget_mb)
+    if not chunk_aggregates:
+        print("Δεν βρέθηκαν εγγραφές για τα φίλτρα.")
+        return
+
+    print("Πέρασμα 2: επεξεργασία ανά chunk...")
+    for i, batch in enumerate(stream_variant_summary(variant_gz_path, genes=genes, assembly=ASSEMBLY_FILTER,
+                                                     memory_budget_mb=memory_budget_mb, compact=True), start=1):
+        df_final = prepare_variants(transform_batch(batch))
+        if df_final.empty:
+            continue
+        print(f"--- chunk {i}: {len(df_final)} μεταλλάξεις ---")
+        yield annotate_variants(df_final, chunk_aggregates)
+
+
+def process_clinvar_chunked(conn, variant_gz_path: str, genes: Optional[Set[str]], memory_budget_mb: float) -> Set[str]:
+    """
+    Chunked pipeline με memory budget (π.χ. για όλα τα γονίδια): δύο περάσματα πάνω στο αρχείο.
+    Το πρώτο χτίζει τα aggregates, το δεύτερο περνά κάθε chunk από HGVS, consequences, ACMG και φόρτωση στη βάση,
+    οπότε στη μνήμη υπάρχει κάθε φορά ένα chunk και τα aggregates.
+    Επιστρέφει τα gene_symbol που φορτώθηκαν.
+    """
+    loaded_genes = set()
+    for df_final in annotate_chunks(variant_gz_path, genes, memory_budget_mb):
+        insert_to_database(conn, df_final)
+        loaded_genes.update(df_final['gene_symbol'].dropna().unique())
+    return loaded_genes
+
+
+def annotate_panel(panel: Dict[str, pd.DataFrame]) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    ACMG για κάθε γονίδιο του panel (ήδη μέσα από το prepare_variants), χωρίς τη βάση.
+    Γραμμές με πολλαπλά γονίδια ('TP53;WRAP53') υπάρχουν στο partition κάθε ζητούμενου γονιδίου:
+    επιστρέφονται μόνο την πρώτη φορά, ώστε κάθε variation_id να γράφεται μία φορά.
+    """
+    seen_ids: Set[int] = set()
+    for gene, df_final in sorted(panel.items()):
+        print(f"--- {gene}: {len(df_final)} μεταλλάξεις ---")
+        if df_final.empty:
+            continue
 
-        # Μετατροπή του rcvaccession σε λίστα (jsonb)
-        if 'rcvaccession' in df_final.columns:
-            df_final['rcvaccession'] = df_final['rcvaccession'].apply(convert_pipe_string_to_list)
+        df_final = annotate_variants(df_final)
+        df_final = df_final[~df_final['variationid'].isin(seen_ids)]
+        seen_ids.update(int(v) for v in df_final['variationid'].dropna().unique())
+        yield gene, df_final
 
-        print("Εύρεση αξιόπιστων VariationIDs...")
-        reliable_ids = get_reliable_variation_ids_from_variant_summary(df_final)
-        f_final = df_final[df_final['variationid'].isin(reliable_ids)]
-  
-        print("Μετά το φιλτράρισμα: {} μεταλλάξεις".format(len(df_final)))
+
+def load_panel(conn, panel: Dict[str, pd.DataFrame]) -> Tuple[Set[str], Set[int]]:
+    """
+    ACMG και φόρτωση στη βάση για κάθε γονίδιο του panel (ήδη μέσα από το prepare_variants).
+    Επιστρέφει τα gene_symbol και τα variation_id που γράφτηκαν.
+    """
+    loaded_genes, loaded_ids = set(), set()
+    for gene, df_final in annotate_panel(panel):
+        if df_final.empty:
+            continue
 
         # Εισαγωγή στη βάση δεδομένων
         print("Inserting to database...")
         insert_to_database(conn, df_final)
+        loaded_genes.update(df_final['gene_symbol'].dropna().unique())
+        loaded_ids.update(int(v) for v in df_final['variationid'].dropna().unique())
+    return loaded_genes, loaded_ids
+
+
+def main(genes: Optional[Set[str]] = GENE_FILTER, workers: int = 1, memory_budget_mb: Optional[float] = None):
+    conn = psycopg2.connect(**DB_CONFIG)
+    create_tables(conn)
+    create_aggregate_tables(conn)
+
+    variant_gz = "variant_summary.txt.gz"
+    indexes_dropped = False
+    try:
+        print("Ξεκίνημα script...")
+
+        # Chunked mode: δεν κρατιέται όλο το panel στη μνήμη (ούτε στο columnar cache)
+        if memory_budget_mb is not None:
+            urllib.request.urlretrieve(CLINVAR_VARIANT_URL, variant_gz)
+            if genes is None:
+                drop_indexes(conn)
+                indexes_dropped = True
+            loaded_genes = process_clinvar_chunked(conn, variant_gz, genes, memory_budget_mb)
+
+            print("Δημιουργία indexes...")
+            create_indexes(conn)
+            indexes_dropped = False
+            print("Ανανέωση ACMG aggregates...")
+            refresh_acmg_aggregates(conn, loaded_genes)
+            print("Ολοκληρώθηκε η επεξεργασία!")
+            return
+
+        # Αν το release δεν έχει αλλάξει, ξεκινάμε από το columnar cache χωρίς download/parsing
+        release_date = resolve_release_date()
+        panel = load_cached_panel(release_date, genes) if release_date else None
+
+        if panel is not None:
+            print(f"Φόρτωση από cache για το release {release_date}")
+        else:
+            urllib.request.urlretrieve(CLINVAR_VARIANT_URL, variant_gz)
+
+            # Ένα πέρασμα στο αρχείο για όλο το panel, μετά επεξεργασία ανά γονίδιο
+            panel = process_clinvar_panel(variant_gz, genes, workers=workers)
+            panel = {gene: prepare_variants(df) for gene, df in panel.items() if not df.empty}
+            if release_date:
+                # Γονίδια χωρίς εγγραφές αποθηκεύονται κενά ώστε να μην ξαναδιαβάζεται το αρχείο γι' αυτά
+                missing = {gene: pd.DataFrame() for gene in (genes or set()) if gene not in panel}
+                save_cached_panel(release_date, {**panel, **missing}, complete=genes is None)
+
+        print(f"Βρέθηκαν εγγραφές για {len(panel)} γονίδια")
+        panel_mb = sum(memory_report(df)['mb'].sum() for df in panel.values())
+        print(f"Μνήμη πίνακα μεταλλάξεων: {panel_mb:.1f} MB")
+
+        # Σε πλήρη φόρτωση τα secondary indexes σβήνονται και χτίζονται ξανά μία φορά στο τέλος
+        if genes is None:
+            drop_indexes(conn)
+            indexes_dropped = True
+
+        loaded_genes, _ = load_panel(conn, panel)
+
+        print("Δημιουργία indexes...")
+        create_indexes(conn)
+        indexes_dropped = False
+
+        # Aggregates για την ταξινόμηση νέων μεταλλάξεων στο API (με τις τιμές gene_symbol όπως γράφτηκαν)
+        print("Ανανέωση ACMG aggregates...")
+        refresh_acmg_aggregates(conn, loaded_genes)
+
         print("Ολοκληρώθηκε η επεξεργασία!")
 
     except Exception as e:
@@ -793,10 +884,37 @@ def main():
         traceback.print_exc()
 
     finally:
-        conn.close()
-        if os.path.exists(variant_gz):
-            os.remove(variant_gz)
+        try:
+            # Φόρτωση που διακόπηκε μετά το drop_indexes: τα indexes χτίζονται ξανά για τις γραμμές που γράφτηκαν,
+            # ώστε το API να μη μείνει χωρίς secondary indexes
+            if indexes_dropped:
+                conn.rollback()
+                print("Επαναφορά indexes μετά από σφάλμα...")
+                create_indexes(conn)
+        finally:
+            conn.close()
+            if os.path.exists(variant_gz):
+                os.remove(variant_gz)
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Φόρτωση ClinVar στη βάση για ένα ή περισσότερα γονίδια")
+    gene_args = parser.add_mutually_exclusive_group()
+    gene_args.add_argument("--genes", nargs="+", help="Σύμβολα γονιδίων (π.χ. --genes TP53 BRCA1 BRCA2)")
+    gene_args.add_argument("--panel-file", help="Αρχείο panel με ένα γονίδιο ανά γραμμή")
+    gene_args.add_argument("--all-genes", action="store_true", help="Φόρτωση όλων των γονιδίων του ClinVar")
+    parser.add_argument("--workers", type=int, default=1, help=f"Διεργασίες για parallel parsing (π.χ. {WORKERS})")
+    parser.add_argument("--memory-budget-mb", type=float,
+                        help="Chunked mode: επεξεργασία και φόρτωση ανά chunk μέσα σε αυτό το memory budget")
+    args = parser.parse_args()
+
+    if args.all_genes:
+        selected_genes = None
+    elif args.panel_file:
+        selected_genes = load_gene_panel(args.panel_file)
+    elif args.genes:
+        selected_genes = set(args.genes)
+    else:
+        selected_genes = GENE_FILTER
+
+    main(genes=selected_genes, workers=args.workers, memory_budget_mb=args.memory_budget_mb)
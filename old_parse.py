@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import psycopg2
 import os
@@ -7,12 +8,15 @@ import subprocess
 import shutil
 import urllib.request
 import json
+import csv
+import io
 import requests
 import gzip    
 import subprocess
 import shutil
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
+from clinvar_stream import WORKERS, read_variant_summary_parallel
 
 # --- Ρυθμίσεις ---
 CLINVAR_VARIANT_URL = "https://ftp.ncbi.nlm.nih.gov/pub/clinvar/tab_delimited/variant_summary.txt.gz"
@@ -21,6 +25,7 @@ GENE_FILTER = "KLHL10"
 ASSEMBLY_FILTER = "GRCh38"  #Επιλέγει την έκδοση GRCh38 του γονιδιώματος
 CLINVAR_SUBMISSION_URL = "https://ftp.ncbi.nlm.nih.gov/pub/clinvar/tab_delimited/submission_summary.txt.gz"
 TRUSTED_SUBMITTERS = {'ClinVar', 'ENIGMA'}
+SUBMISSION_CHUNK_ROWS = 500_000  # γραμμές submission_summary ανά chunk
 
 #Ρυθμίσεις Βάσης Δεδομένων
 DB_CONFIG = {
@@ -77,25 +82,84 @@ def get_header_from_commented_tsv(gz_path: str) -> list:
     """
     Εντοπίζει τη γραμμή header που ξεκινάει με # και επιστρέφει τα ονόματα στηλών ως λίστα.
     """
+    return get_commented_header(gz_path)[0]
+
+
+def get_commented_header(gz_path: str) -> Tuple[list, int]:
+    """
+    Header του submission_summary (η γραμμή '#VariationID...') και πλήθος γραμμών σχολίων πριν από τα δεδομένα,
+    ώστε το read_csv να τις παρακάμπτει με skiprows αντί για comment='#' (που κόβει και πεδία με '#').
+    """
     with gzip.open(gz_path, 'rt') as f:
-        for line in f:
+        for i, line in enumerate(f):
             if line.startswith('#') and 'VariationID' in line:
-                return line.lstrip('#').strip().split('\t')
+                return line.lstrip('#').strip().split('\t'), i + 1
     raise ValueError("Δεν βρέθηκε γραμμή κεφαλίδας με 'VariationID'")
 
+
+def _empty_submitters() -> pd.DataFrame:
+    return pd.DataFrame({'VariationID': pd.Series(dtype=np.int64), 'Submitter': pd.Series(dtype=object)})
+
+
+def submitters_per_variant(
+    submission_path: str,
+    variation_ids: Iterable,
+    chunk_rows: int = SUBMISSION_CHUNK_ROWS,
+) -> pd.DataFrame:
+    """
+    Streaming join του submission_summary με ένα σύνολο VariationIDs.
+    Τα IDs κρατιούνται ως ταξινομημένο int64 array, κάθε chunk φιλτράρεται με isin και από κάθε chunk
+    μένουν μόνο τα διακριτά ζεύγη (VariationID, Submitter). Επιστρέφει VariationID -> ταξινομημένη λίστα Submitters.
+    """
+    ids = pd.to_numeric(pd.Series(list(variation_ids), dtype=object), errors='coerce').dropna()
+    ids = np.unique(ids.to_numpy(dtype=np.int64))
+    if len(ids) == 0:
+        return _empty_submitters()
+
+    header, skip = get_commented_header(submission_path)
+    pairs = []
+    for chunk in pd.read_csv(
+        submission_path,
+        sep='\t',
+        names=header,
+        skiprows=skip,
+        compression='gzip',
+        usecols=['VariationID', 'Submitter'],
+        dtype={'Submitter': str},
+        quoting=csv.QUOTE_NONE,  # τα πεδία του ClinVar δεν είναι σε εισαγωγικά
+        chunksize=chunk_rows,
+    ):
+        matched = chunk[chunk['VariationID'].isin(ids) & chunk['Submitter'].notna()]
+        if not matched.empty:
+            pairs.append(matched.drop_duplicates())
+
+    if not pairs:
+        return _empty_submitters()
+
+    pairs = pd.concat(pairs, ignore_index=True).drop_duplicates()
+    return (
+        pairs.sort_values(['VariationID', 'Submitter'])
+        .groupby('VariationID', sort=True)['Submitter']
+        .agg(list)
+        .reset_index()
+    )
+
+
 def merge_variant_submission(variant_path: str, submission_path: str) -> pd.DataFrame:
         """
         Συνδυάζει variant_summary και μόνο τους Submitter από submission_summary με βάση το VariationID.
         """
 
         print("Φόρτωση variant_summary...")
-        df_variant = pd.read_csv(variant_path, sep='\t', low_memory=False)
-
-        # Φιλτράρισμα variant_summary
-        df_variant = df_variant[
-            (df_variant['GeneSymbol'] == GENE_FILTER) &
-            (df_variant['Assembly'] == ASSEMBLY_FILTER)
-        ].copy()
+        # Parsing και φιλτράρισμα GeneSymbol/Assembly παράλληλα στους workers
+        batches = list(read_variant_summary_parallel(
+            variant_path,
+            genes={GENE_FILTER},
+            assembly=ASSEMBLY_FILTER,
+            workers=WORKERS,
+            normalize=False
+        ))
+        df_variant = pd.concat(batches, ignore_index=True) if batches else pd.DataFrame()
 
         print(f"Μετά το φιλτράρισμα: {len(df_variant)} εγγραφές")
 
@@ -103,38 +167,8 @@ def merge_variant_submission(variant_path: str, submission_path: str) -> pd.Data
         variation_ids = set(df_variant['VariationID'].dropna().unique())
 
         print("Φόρτωση και φιλτράρισμα submission_summary...")
-        submitters_dict = {}
-
-        print("Φόρτωση και φιλτράρισμα submission_summary...")
-
-        # ➤ Πάρε το σωστό header από το αρχείο gzip
-        header_line = get_header_from_commented_tsv(submission_path)
-        print("🔎 Header columns:", header_line)
-
-
-        # ➤ Ανάγνωση με το σωστό header
-        submitters_dict = {}
-        for chunk in pd.read_csv(
-            submission_path,
-            sep='\t',
-            comment='#',
-            names=header_line,
-            compression='gzip',
-            usecols=['VariationID', 'Submitter'],
-            chunksize=500_000
-        ):
-            filtered = chunk[chunk['VariationID'].isin(variation_ids)]
-            for _, row in filtered.iterrows():
-                vid = row['VariationID']
-                sub = row['Submitter']
-                if pd.notna(sub):
-                    submitters_dict.setdefault(vid, set()).add(sub)
-
-        # Μετατροπή σε DataFrame
-        df_submitters = pd.DataFrame([
-            {'VariationID': vid, 'Submitter': sorted(list(subs))}
-            for vid, subs in submitters_dict.items()
-        ])
+        # Streaming join: isin σε κάθε chunk και groupby ανά VariationID (χωρίς iterrows)
+        df_submitters = submitters_per_variant(submission_path, variation_ids)
 
         print(f"✓ Βρέθηκαν submitters για {len(df_submitters)} VariationIDs")
 
@@ -680,31 +714,36 @@ def main():
         '''
 
 
-def filter_submission_by_variation_ids(submission_gz_path: str, variation_ids: List[str]) -> pd.DataFrame:
+def filter_submission_by_variation_ids(submission_gz_path: str, variation_ids: Iterable) -> pd.DataFrame:
     """
     Φιλτράρει το submission_summary.gz ώστε να κρατήσει μόνο τις γραμμές με τα συγκεκριμένα VariationID.
+    Streaming ανάγνωση του gzip με ακριβές ταίριασμα της στήλης VariationID σε hash set
+    (χωρίς zcat | grep -E με ένα τεράστιο regex, που έπιανε και IDs ως substrings άλλων αριθμών).
     """
-    temp_filename = "filtered_submission.tsv"
-    
-    # Γράφουμε το header
-    with open(temp_filename, "w") as f_out:
-        header_cmd = f"zcat {submission_gz_path} | head -n 1"
-        subprocess.run(header_cmd, shell=True, stdout=f_out)
-
-    # Δημιουργούμε regex pattern από όλα τα IDs (π.χ. 12345|67890|...)
-    id_pattern = "|".join(map(str, variation_ids))
-    
-    # Προσθέτουμε γραμμές με αυτά τα IDs
-    grep_cmd = f"zcat {submission_gz_path} | grep -E '{id_pattern}' >> {temp_filename}"
-    subprocess.run(grep_cmd, shell=True, check=True)
-    
-    # Φορτώνουμε σε DataFrame
-    df_submissions = pd.read_csv(temp_filename, sep='\t', low_memory=False)
-    
-    # Διαγραφή προσωρινού αρχείου
-    os.remove(temp_filename)
-    
-    return df_submissions
+    wanted = set()
+    for vid in variation_ids:
+        vid = str(vid).strip()
+        wanted.add(vid[:-2] if vid.endswith(".0") else vid)
+
+    header, skip = get_commented_header(submission_gz_path)
+    id_idx = header.index('VariationID')
+
+    matched = []
+    with gzip.open(submission_gz_path, 'rt', encoding='utf-8', newline='') as f:
+        for i, line in enumerate(f):
+            if i < skip:
+                continue
+            fields = line.split('\t', id_idx + 1)
+            if len(fields) > id_idx and fields[id_idx] in wanted:
+                matched.append(line)
+
+    return pd.read_csv(
+        io.StringIO("".join(matched)),
+        sep='\t',
+        names=header,
+        quoting=csv.QUOTE_NONE,
+        low_memory=False,
+    )
 
    
 '''
@@ -747,25 +786,7 @@ def extract_submitters(submission_path: str, variation_ids: set) -> pd.DataFrame
     """
     Διαβάζει το submission_summary σε chunks και επιστρέφει μοναδικούς Submitters ανά VariationID.
     """
-    submitters = {}
-
-   
-    for chunk in pd.read_csv(submission_path, sep='\t', usecols=['VariationID', 'Submitter'], chunksize=500_000):
-        filtered = chunk[chunk['VariationID'].isin(variation_ids)]
-        for _, row in filtered.iterrows():
-            vid = row['VariationID']
-            sub = row['Submitter']
-            if pd.notna(sub):
-                submitters.setdefault(vid, set()).add(sub)
-
-    # Μετατροπή σε DataFrame
-    df = pd.DataFrame([
-        {'VariationID': vid, 'Submitter': sorted(list(subs))}
-        for vid, subs in submitters.items()
-    ])
-
-    return df
-
+    return submitters_per_variant(submission_path, variation_ids)
 
 
 
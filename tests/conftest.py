@@ -0,0 +1,77 @@
+import gzip
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Header του variant_summary.txt.gz όπως το δημοσιεύει το ClinVar
+VARIANT_SUMMARY_HEADER = [
+    "#AlleleID", "Type", "Name", "GeneID", "GeneSymbol", "HGNC_ID", "ClinicalSignificance", "ClinSigSimple",
+    "LastEvaluated", "RS# (dbSNP)", "nsv/esv (dbVar)", "RCVaccession", "PhenotypeIDS", "PhenotypeList", "Origin",
+    "OriginSimple", "Assembly", "ChromosomeAccession", "Chromosome", "Start", "Stop", "ReferenceAllele",
+    "AlternateAllele", "Cytogenetic", "ReviewStatus", "NumberSubmitters", "Guidelines", "TestedInGTR", "OtherIDs",
+    "SubmitterCategories", "VariationID", "PositionVCF", "ReferenceAlleleVCF", "AlternateAlleleVCF",
+]
+
+# Το 'TP53;WRAP53' είναι γραμμή με πολλαπλά γονίδια, το TP53BP1 ελέγχει ότι δεν γίνεται substring match
+GENES = ["TP53", "WRAP53", "TP53;WRAP53", "TP53BP1", "BRCA1"]
+SIGNIFICANCES = [
+    "Pathogenic", "Likely pathogenic", "Pathogenic/Likely pathogenic", "Benign", "Likely benign",
+    "Uncertain significance", "Conflicting interpretations of pathogenicity", "not provided",
+]
+AMINO_ACIDS = ["Arg", "Gly", "Trp", "Cys", "His", "Ser"]
+BASES = "ACGT"
+
+
+def _protein_change(rng: random.Random, pos: int) -> str:
+    kind = rng.random()
+    if kind < 0.1:
+        return f"p.{rng.choice(AMINO_ACIDS)}{pos}Ter"
+    if kind < 0.15:
+        return f"p.{rng.choice(AMINO_ACIDS)}{pos}fs"
+    if kind < 0.2:
+        return f"p.{rng.choice(AMINO_ACIDS)}{pos}="
+    return f"p.{rng.choice(AMINO_ACIDS)}{pos}{rng.choice(AMINO_ACIDS)}"
+
+
+def variant_summary_rows(n_variants: int, seed: int = 0):
+    """Συνθετικές γραμμές variant_summary: λίγες θέσεις πρωτεΐνης ώστε να υπάρχουν ομάδες PS1 / PM5 / PP5 / BP6"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_variants):
+        gene = rng.choice(GENES)
+        pos = rng.randint(1, 40)
+        ref, alt = rng.sample(BASES, 2)
+        hgvs_c = f"c.{pos * 3 - rng.randint(0, 2)}{ref}>{alt}"
+        protein = "" if rng.random() < 0.1 else f" ({_protein_change(rng, pos)})"
+        name = f"NM_000546.6({gene.split(';')[0]}):{hgvs_c}{protein}"
+        variation_id = 100_000 + i
+        start = 7_668_000 + pos * 3
+        for assembly in ("GRCh37", "GRCh38"):
+            rows.append([
+                str(i), "single nucleotide variant", name, "7157", gene, "HGNC:11998", rng.choice(SIGNIFICANCES),
+                "1", "Jun 01, 2020", "-1", "-", f"RCV{variation_id:09d}|RCV{variation_id + 1:09d}", "MedGen:C1",
+                "Li-Fraumeni syndrome", "germline", "germline", assembly, "NC_000017.11", "17", str(start), str(start),
+                "na", "na", "17p13.1", rng.choice(["reviewed by expert panel", "criteria provided, single submitter"]),
+                str(rng.randint(1, 5)), "-", "N", "-", str(rng.randint(1, 3)), str(variation_id), str(start), ref, alt,
+            ])
+    return rows
+
+
+def write_variant_summary(path: str, rows) -> str:
+    with gzip.open(path, "wt", encoding="utf-8", newline="") as f:
+        f.write("\t".join(VARIANT_SUMMARY_HEADER) + "\n")
+        for row in rows:
+            f.write("\t".join(row) + "\n")
+    return path
+
+
+@pytest.fixture(scope="session")
+def variant_summary_gz(tmp_path_factory):
+    """Μικρό συνθετικό variant_summary.txt.gz (2 x 1500 γραμμές, GRCh37 και GRCh38)"""
+    path = tmp_path_factory.mktemp("clinvar") / "variant_summary.txt.gz"
+    return write_variant_summary(str(path), variant_summary_rows(1500))
@@ -0,0 +1,143 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import new2
+import old_parse
+from acmg_engine import build_support_tables, group_based_acmg_batch, score_all, support_criteria
+from clinvar_transform import consequence_batch, consequence_dna_batch, determine_variant_type_batch
+from conftest import variant_summary_rows, write_variant_summary
+
+# Τα per-row originals στο dataparse.py δεν γίνονται import (conflict markers), το old_parse έχει ίδιο determine_variant_type
+COLUMNS = ["gene_symbol", "hgvs_c", "hgvs_p", "protein_pos", "clinicalsignificance", "clinsigsimple", "variant_type"]
+
+
+def _baseline_support_tables(df):
+    """build_acmg_support_tables πριν από το user-009 (iterrows)"""
+    df_pathogenic = df[df['clinicalsignificance'].str.contains('pathogenic', case=False, na=False)]
+    same_c_groups = defaultdict(list)
+    same_p_groups = defaultdict(list)
+    same_pos_groups = defaultdict(list)
+    for _, row in df_pathogenic.iterrows():
+        gene, hgvs_c, hgvs_p, prot_pos = row['gene_symbol'], row['hgvs_c'], row['hgvs_p'], row.get('protein_pos')
+        if gene and hgvs_c:
+            same_c_groups[gene + ':' + hgvs_c].append(row)
+        if gene and hgvs_p:
+            same_p_groups[gene + ':' + hgvs_p].append(row)
+        if gene and prot_pos:
+            same_pos_groups[gene + ':' + str(prot_pos)].append(row)
+    return {'same_c_groups': same_c_groups, 'same_p_groups': same_p_groups, 'same_pos_groups': same_pos_groups}
+
+
+def _baseline_mark_acmg_criteria(row, support_tables):
+    """mark_acmg_criteria πριν από το user-009 (ο έλεγχος PS1 μέσα στο 'if gene and hgvs_p', αλλιώς UnboundLocalError)"""
+    criteria = []
+    gene, hgvs_c, hgvs_p, prot_pos = row['gene_symbol'], row['hgvs_c'], row['hgvs_p'], row.get('protein_pos')
+    if gene and hgvs_c:
+        group = support_tables['same_c_groups'].get(f"{gene}:{hgvs_c}", [])
+        if any('pathogenic' in v.get('clinicalsignificance', '').lower() for v in group):
+            criteria.append("PP5")
+        if any('benign' in v.get('clinicalsignificance', '').lower() for v in group):
+            criteria.append("BP6")
+    if gene and hgvs_p:
+        group = support_tables['same_p_groups'].get(f"{gene}:{hgvs_p}", [])
+        if [v for v in group if 'pathogenic' in v.get('clinicalsignificance', '').lower() and v.get('hgvs_c') != hgvs_c]:
+            criteria.append("PS1")
+    if gene and prot_pos:
+        group = support_tables['same_pos_groups'].get(f"{gene}:{str(prot_pos)}", [])
+        path_missense_variants = [
+            v for v in group
+            if v.get('variant_type', '').lower() == 'missense' and v.get('clinicalsignificance', '').lower() in ['pathogenic']
+        ]
+        is_novel_missense = (
+            row.get('variant_type', None) == 'missense'
+            and all(v.get('hgvs_p') != hgvs_p for v in path_missense_variants)
+        )
+        if is_novel_missense and len(path_missense_variants) > 0:
+            criteria.append("PM5")
+    return criteria
+
+
+@pytest.fixture(scope="module")
+def variants(tmp_path_factory):
+    """TP53 (μαζί με τις γραμμές 'TP53;WRAP53') από το συνθετικό variant_summary, σε object στήλες όπως το per-row pipeline"""
+    path = tmp_path_factory.mktemp("clinvar") / "variant_summary.txt.gz"
+    write_variant_summary(str(path), variant_summary_rows(400, seed=3))
+    df = new2.prepare_variants(new2.process_clinvar_panel(str(path), {"TP53"})["TP53"])
+    df = df[COLUMNS].astype(object).reset_index(drop=True)
+    df["variant_type"] = determine_variant_type_batch(df["hgvs_p"], df["hgvs_c"])
+    return df
+
+
+def _with_missing(df: pd.DataFrame, missing, columns) -> pd.DataFrame:
+    """Αντίγραφο με κενές τιμές (missing: None ή NaN) σε κάθε 7η γραμμή των columns, με άλλη μετατόπιση ανά στήλη"""
+    df = df.copy()
+    for offset, column in enumerate(columns):
+        df.loc[df.index[offset::7], column] = missing
+    return df
+
+
+@pytest.mark.parametrize("missing", [None, np.nan])
+def test_group_based_acmg_batch_matches_per_row(variants, missing):
+    df = _with_missing(variants, missing, ["hgvs_c", "hgvs_p", "clinicalsignificance", "protein_pos"])
+    expected = df.apply(lambda row: new2.group_based_acmg(row, df), axis=1)
+    assert group_based_acmg_batch(df).tolist() == expected.tolist()
+
+    # Ανά γονίδιο: ίδιο αποτέλεσμα με το per-row πάνω σε κάθε γονίδιο χωριστά
+    expected = pd.concat([
+        gene_df.apply(lambda row: new2.group_based_acmg(row, gene_df), axis=1)
+        for _, gene_df in df.groupby("gene_symbol")
+    ]).sort_index()
+    assert group_based_acmg_batch(df, gene_column="gene_symbol").tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize("missing", [None, np.nan])
+def test_score_all_matches_per_row(variants, missing):
+    df = _with_missing(variants, missing, ["hgvs_c", "hgvs_p", "clinsigsimple", "protein_pos"])
+    expected = df.apply(lambda row: new2.apply_ps1_pm5_pp5_bp6(row, df), axis=1)
+    assert score_all(df).tolist() == expected.tolist()
+
+
+def test_support_criteria_matches_baseline(variants):
+    # Το baseline δέχεται κενά μόνο ως None στα hgvs_c / hgvs_p (το NaN είναι truthy και σπάει το gene + ':' + hgvs_c)
+    df = _with_missing(variants, None, ["hgvs_c", "hgvs_p", "protein_pos"])
+    df.loc[df.index[3::7], "clinicalsignificance"] = np.nan
+    baseline_tables = _baseline_support_tables(df)
+    tables = build_support_tables(df)
+    for _, row in df.iterrows():
+        expected = _baseline_mark_acmg_criteria(row, baseline_tables)
+        actual = support_criteria(tables, row["gene_symbol"], row["hgvs_c"], row["hgvs_p"],
+                                  row["protein_pos"], row["variant_type"])
+        assert actual == expected, row.to_dict()
+
+
+def test_support_criteria_treats_nan_as_missing(variants):
+    # NaN στη μετάλλαξη που ταξινομείται: ίδιο αποτέλεσμα με το None (το baseline έψαχνε το κλειδί 'TP53:nan')
+    df = variants.copy()
+    tables = build_support_tables(df)
+    row = df.iloc[0]
+    for column in ["hgvs_c", "hgvs_p", "protein_pos"]:
+        values = {c: row[c] for c in ["hgvs_c", "hgvs_p", "protein_pos"]}
+        with_none = support_criteria(tables, row["gene_symbol"], **{**values, column: None}, variant_type="missense")
+        with_nan = support_criteria(tables, row["gene_symbol"], **{**values, column: np.nan}, variant_type="missense")
+        assert with_none == with_nan
+
+
+@pytest.mark.parametrize("missing", [None, np.nan])
+def test_consequence_batches_match_per_row(variants, missing):
+    df = _with_missing(variants, missing, ["hgvs_c", "hgvs_p"])
+    df.loc[df.index[2], "hgvs_p"] = "p.?"
+    df.loc[df.index[4], "hgvs_c"] = "c.?"
+    df.loc[df.index[5], "hgvs_c"] = ""
+    df.loc[df.index[6], "hgvs_p"] = ""
+
+    def _per_row(function, values):
+        return [function(None if pd.isna(v) else v) for v in values]
+
+    assert consequence_batch(df["hgvs_p"]).tolist() == _per_row(new2.consequence, df["hgvs_p"])
+    assert consequence_dna_batch(df["hgvs_c"]).tolist() == _per_row(new2.consequence_dna, df["hgvs_c"])
+
+    expected = df.apply(lambda row: old_parse.determine_variant_type(row["hgvs_p"], row["hgvs_c"]), axis=1)
+    assert determine_variant_type_batch(df["hgvs_p"], df["hgvs_c"]).tolist() == expected.tolist()
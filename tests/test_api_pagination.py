@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+ROWS = [{"variation_id": i, "gene_symbol": "TP53", "protein_pos": 175} for i in range(1, 8)]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Χωρίς βάση: κάθε query επιστρέφει τις ROWS (το LIMIT είναι πάντα η τελευταία παράμετρος)
+    queries = []
+
+    async def fake_fetch_all(query, *params):
+        queries.append(query)
+        return ROWS[:params[-1]] if "LIMIT" in query else list(ROWS)
+
+    async def fake_stream_rows(query, *params):
+        queries.append(query)
+        for row in ROWS:
+            yield row
+
+    monkeypatch.setattr(api, "fetch_all", fake_fetch_all)
+    monkeypatch.setattr(api, "stream_rows", fake_stream_rows)
+    test_client = TestClient(api.app)
+    test_client.queries = queries
+    return test_client
+
+
+def test_protein_pos_returns_all_rows_by_default(client):
+    response = client.get("/variants_by_protein_pos", params={"gene": "TP53", "start_pos": 175})
+    assert response.json() == [list(row.values()) for row in ROWS]
+    assert "LIMIT" not in client.queries[-1]
+    assert api.NEXT_PAGE_HEADER not in response.headers
+
+
+def test_protein_pos_pages_and_stream_share_row_shape(client):
+    response = client.get("/variants_by_protein_pos", params={"gene": "TP53", "start_pos": 175, "limit": 3})
+    assert response.json() == [list(row.values()) for row in ROWS[:3]]
+    assert response.headers[api.NEXT_PAGE_HEADER] == "3"
+
+    response = client.get("/variants_by_protein_pos", params={"gene": "TP53", "start_pos": 175, "stream": True})
+    assert [json.loads(line) for line in response.text.splitlines()] == [list(row.values()) for row in ROWS]
+
+
+def test_genomic_range_returns_all_rows_by_default(client):
+    params = {"gene": "TP53", "start": 7668402, "end": 7687550}
+    response = client.get("/variants_by_genomic_range", params=params)
+    assert response.json() == {"results": ROWS}
+    assert "LIMIT" not in client.queries[-1]
+
+    response = client.get("/variants_by_genomic_range", params={**params, "limit": 2})
+    assert response.json() == {"results": ROWS[:2]}
+    assert response.headers[api.NEXT_PAGE_HEADER] == "2"
@@ -0,0 +1,145 @@
+import shutil
+
+import pytest
+
+import acmg_aggregates
+import autoupdate
+import new2
+from conftest import VARIANT_SUMMARY_HEADER, variant_summary_rows, write_variant_summary
+
+GENE = VARIANT_SUMMARY_HEADER.index("GeneSymbol")
+SIGNIFICANCE = VARIANT_SUMMARY_HEADER.index("ClinicalSignificance")
+ASSEMBLY = VARIANT_SUMMARY_HEADER.index("Assembly")
+VARIATION_ID = VARIANT_SUMMARY_HEADER.index("VariationID")
+REF_VCF = VARIANT_SUMMARY_HEADER.index("ReferenceAlleleVCF")
+
+
+def _first_id(rows, gene):
+    return next(int(row[VARIATION_ID]) for row in rows if row[GENE] == gene)
+
+
+def _set(rows, variation_id, column, value, assembly="GRCh38"):
+    for row in rows:
+        if int(row[VARIATION_ID]) == variation_id and row[ASSEMBLY] == assembly:
+            row[column] = value
+
+
+@pytest.fixture(scope="module")
+def releases(tmp_path_factory):
+    """Δύο releases: το δεύτερο με αλλαγμένες, αποσυρμένες και νέες μεταλλάξεις"""
+    path = tmp_path_factory.mktemp("releases")
+    old = variant_summary_rows(300, seed=1)
+    new = [list(row) for row in old]
+
+    ids = {
+        "significance": _first_id(old, "WRAP53"),
+        "vcf_allele": _first_id(old, "TP53BP1"),
+        "grch37_only": _first_id(old, "TP53"),
+        "withdrawn": _first_id(old, "BRCA1"),
+    }
+    _set(new, ids["significance"], SIGNIFICANCE, "Pathogenic; risk factor")
+    _set(new, ids["vcf_allele"], REF_VCF, "ACGT")
+    # Αλλαγή μόνο στη γραμμή GRCh37: δεν φορτώνεται, άρα δεν είναι διαφορά
+    _set(new, ids["grch37_only"], SIGNIFICANCE, "Benign", assembly="GRCh37")
+    new = [row for row in new if int(row[VARIATION_ID]) != ids["withdrawn"]]
+
+    added = variant_summary_rows(301, seed=1)[-2:]
+    for row in added:
+        row[GENE] = "BRCA1"
+    new += added
+    ids["added"] = int(added[0][VARIATION_ID])
+
+    old_path = write_variant_summary(str(path / "old.txt.gz"), old)
+    new_path = write_variant_summary(str(path / "new.txt.gz"), new)
+    return old_path, new_path, ids
+
+
+def test_diff_releases(releases):
+    old_path, new_path, ids = releases
+    diff = autoupdate.diff_releases(autoupdate.source_hashes(new_path), autoupdate.source_hashes(old_path))
+
+    assert diff["changed_ids"] == {ids["significance"], ids["vcf_allele"], ids["added"]}
+    assert diff["withdrawn_ids"] == {ids["withdrawn"]}
+    assert diff["withdrawn_fields"] == {"BRCA1"}
+    # WRAP53 άλλαξε, οπότε μπαίνει και το TP53 μέσω των γραμμών 'TP53;WRAP53'
+    assert diff["affected_genes"] == {"WRAP53", "TP53", "TP53BP1", "BRCA1"}
+
+
+def test_diff_of_same_release_is_empty(releases):
+    old_path, _, _ = releases
+    hashes = autoupdate.source_hashes(old_path)
+    diff = autoupdate.diff_releases(hashes, hashes.copy())
+    assert diff["changed_ids"] == set() and diff["withdrawn_ids"] == set() and diff["affected_genes"] == set()
+
+
+def test_panel_diff_keeps_multi_gene_rows(releases):
+    old_path, new_path, ids = releases
+    genes = {"TP53"}
+    new = autoupdate.source_hashes(new_path, genes)
+    assert set(new["gene_field"]) == {"TP53", "TP53;WRAP53"}
+    diff = autoupdate.diff_releases(new, autoupdate.source_hashes(old_path, genes))
+    assert diff["changed_ids"] == set() and diff["withdrawn_ids"] == set()
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if sql.lstrip().startswith("DELETE FROM gene_variants"):
+            self.conn.deleted = set(params[0])
+
+    def fetchall(self):
+        return [("BRCA1",)]
+
+
+class _Connection:
+    deleted = None
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_update_database_reloads_affected_genes(releases, monkeypatch, tmp_path):
+    old_path, new_path, ids = releases
+    data_file = shutil.copy(new_path, tmp_path / "variant_summary.txt.gz")
+    conn = _Connection()
+    calls = {}
+
+    def fake_load_panel(conn, panel):
+        calls["panel"] = set(panel)
+        loaded_ids = {int(v) for df in panel.values() for v in df["variationid"]}
+        return set().union(*(set(df["gene_symbol"]) for df in panel.values())), loaded_ids
+
+    monkeypatch.setattr(autoupdate.psycopg2, "connect", lambda **config: conn)
+    monkeypatch.setattr(new2, "create_tables", lambda conn: None)
+    monkeypatch.setattr(new2, "load_panel", fake_load_panel)
+    monkeypatch.setattr(acmg_aggregates, "create_aggregate_tables", lambda conn: None)
+    monkeypatch.setattr(acmg_aggregates, "refresh_acmg_aggregates", lambda conn, genes: calls.update(refreshed=genes))
+    monkeypatch.setattr(autoupdate, "load_stored_hashes", lambda conn, genes: autoupdate.source_hashes(old_path, genes))
+    monkeypatch.setattr(autoupdate, "save_source_hashes",
+                        lambda conn, new, changed, withdrawn: calls.update(saved=(changed, withdrawn)))
+
+    autoupdate.update_database(str(data_file), workers=1)
+
+    assert calls["panel"] == {"WRAP53", "TP53", "TP53BP1", "BRCA1"}
+    assert ids["withdrawn"] in conn.deleted
+    assert {ids["significance"], ids["vcf_allele"], ids["added"]}.isdisjoint(conn.deleted)
+    assert calls["saved"] == ({ids["significance"], ids["vcf_allele"], ids["added"]}, {ids["withdrawn"]})
+    assert {"WRAP53", "TP53", "TP53;WRAP53", "TP53BP1", "BRCA1"} <= calls["refreshed"]
+    assert not data_file.exists()
@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+import clinvar_stream
+import new2
+from db_load import frame_to_gene_variants
+
+GENES = {"TP53", "WRAP53"}
+
+
+def _panel_rows(path: str) -> pd.DataFrame:
+    panel = new2.process_clinvar_panel(path, GENES)
+    panel = {gene: new2.prepare_variants(df) for gene, df in panel.items() if not df.empty}
+    frames = [frame_to_gene_variants(df) for _, df in new2.annotate_panel(panel)]
+    return pd.concat(frames, ignore_index=True)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Πολλά μικρά chunks και συχνή συμπίεση των aggregates, ώστε να ελέγχεται και το merge
+    monkeypatch.setattr(clinvar_stream, "PROBE_BATCH_SIZE", 200)
+    monkeypatch.setattr(clinvar_stream, "MIN_BATCH_SIZE", 200)
+    monkeypatch.setattr(new2, "CHUNK_MERGE_EVERY", 2)
+
+
+def test_chunked_matches_panel(variant_summary_gz, small_chunks):
+    panel = _panel_rows(variant_summary_gz)
+    chunks = list(new2.annotate_chunks(variant_summary_gz, GENES, memory_budget_mb=0.01))
+    assert len(chunks) > 2
+    chunked = pd.concat([frame_to_gene_variants(df) for df in chunks], ignore_index=True)
+
+    panel = panel.set_index("variation_id").sort_index()
+    chunked = chunked.set_index("variation_id").sort_index()
+
+    assert panel.index.is_unique and chunked.index.is_unique
+    assert panel.index.equals(chunked.index)
+    for column in ["acmg_from_grouping", "acmg_criteria", "acmg_combined_criteria", "content_hash"]:
+        assert panel[column].astype(str).equals(chunked[column].astype(str)), column
+
+
+def test_parallel_matches_panel(variant_summary_gz):
+    panel = new2.process_clinvar_panel(variant_summary_gz, GENES)
+    parallel = new2.process_clinvar_panel(variant_summary_gz, GENES, workers=2)
+    assert sorted(panel) == sorted(parallel)
+    for gene in panel:
+        expected = frame_to_gene_variants(new2.annotate_variants(new2.prepare_variants(panel[gene])))
+        actual = frame_to_gene_variants(new2.annotate_variants(new2.prepare_variants(parallel[gene])))
+        assert expected["content_hash"].tolist() == actual["content_hash"].tolist()
+
+
+def test_multi_gene_rows_written_once(variant_summary_gz):
+    panel = new2.process_clinvar_panel(variant_summary_gz, GENES)
+    panel = {gene: new2.prepare_variants(df) for gene, df in panel.items() if not df.empty}
+    multi = set(panel["TP53"].loc[panel["TP53"]["gene_symbol"] == "TP53;WRAP53", "variationid"])
+    assert multi and multi <= set(panel["WRAP53"]["variationid"])
+
+    # Κάθε variation_id γράφεται μία φορά, με το ίδιο αποτέλεσμα όποιο partition κι αν το έγραψε
+    rewritten = new2.annotate_variants(panel["WRAP53"].copy())
+    rewritten = rewritten[rewritten["variationid"].isin(multi)].set_index("variationid").sort_index()
+
+    annotated = dict(new2.annotate_panel(panel))
+    ids = pd.concat([df["variationid"] for df in annotated.values()])
+    assert ids.is_unique
+    assert multi <= set(ids)
+    written = annotated["TP53"]
+    written = written[written["variationid"].isin(multi)].set_index("variationid").sort_index()
+    assert written["acmg_combined_criteria"].equals(rewritten["acmg_combined_criteria"])
@@ -0,0 +1,21 @@
+import os
+
+import pandas as pd
+
+import clinvar_cache
+
+
+def test_cache_is_keyed_by_schema_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(clinvar_cache, "CACHE_DIR", str(tmp_path))
+    panel = {"TP53": pd.DataFrame({"variationid": pd.array([1, 2], dtype="Int64"), "gene_symbol": ["TP53", "TP53"]})}
+
+    monkeypatch.setattr(clinvar_cache, "CACHE_SCHEMA_VERSION", 1)
+    clinvar_cache.save_cached_panel("2025-06-01", panel, complete=True)
+    assert clinvar_cache.load_cached_panel("2025-06-01", {"TP53"})["TP53"].equals(panel["TP53"])
+
+    # Cache παλαιότερου σχήματος για το ίδιο release δεν ξαναχρησιμοποιείται και σβήνεται στο επόμενο save
+    monkeypatch.setattr(clinvar_cache, "CACHE_SCHEMA_VERSION", 2)
+    assert clinvar_cache.load_cached_panel("2025-06-01", {"TP53"}) is None
+    assert clinvar_cache.load_cached_panel("2025-06-01", None) is None
+    clinvar_cache.save_cached_panel("2025-06-01", panel, complete=True)
+    assert os.listdir(tmp_path) == [os.path.basename(clinvar_cache.release_cache_dir("2025-06-01"))]
@@ -0,0 +1,38 @@
+import pandas as pd
+import pytest
+
+import new2
+from clinvar_stream import concat_frames, memory_report, partition_by_gene, read_variant_summary_parallel, stream_variant_summary
+from db_load import frame_to_gene_variants
+
+GENES = {"TP53", "WRAP53", "BRCA1"}
+
+READERS = {
+    "stream": lambda path, compact: list(stream_variant_summary(path, genes=GENES, batch_size=300, compact=compact)),
+    "per-gene": lambda path, compact: list(partition_by_gene(path, genes=GENES, compact=compact).values()),
+    "parallel": lambda path, compact: list(read_variant_summary_parallel(
+        path, genes=GENES, workers=2, block_size=64 * 1024, compact=compact
+    )),
+}
+
+
+def _encoded(frames) -> pd.DataFrame:
+    df = new2.prepare_variants(new2.transform_batch(concat_frames(frames)))
+    encoded = frame_to_gene_variants(new2.annotate_variants(df))
+    return encoded.drop_duplicates("variation_id").set_index("variation_id").sort_index()
+
+
+@pytest.mark.parametrize("reader", sorted(READERS))
+def test_compact_schema_gives_identical_db_rows(variant_summary_gz, reader):
+    expected = _encoded(READERS[reader](variant_summary_gz, False))
+    actual = _encoded(READERS[reader](variant_summary_gz, True))
+    assert expected.index.equals(actual.index)
+    assert expected["content_hash"].equals(actual["content_hash"])
+
+
+def test_compact_schema_is_smaller(variant_summary_gz):
+    sizes = {
+        compact: memory_report(next(stream_variant_summary(variant_summary_gz, batch_size=10_000, compact=compact)))["mb"].sum()
+        for compact in (False, True)
+    }
+    assert sizes[True] * 2 < sizes[False]
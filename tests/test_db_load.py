@@ -0,0 +1,62 @@
+import pandas as pd
+
+from db_load import bulk_upsert_gene_variants, frame_to_gene_variants
+
+
+def _variants() -> pd.DataFrame:
+    return pd.DataFrame({
+        "variationid": [1, 2, 3],
+        "gene_symbol": ["TP53", "TP53", "TP53;WRAP53"],
+        "hgvs_c": ["c.524G>A", None, "c.743G>A"],
+        "start": [7675088, 7674220, None],
+        "acmg_criteria": [["PS1"], [], ["PM5", "PP5"]],
+    })
+
+
+def test_content_hash_depends_only_on_row_values():
+    encoded = frame_to_gene_variants(_variants()).set_index("variation_id")
+    reordered = frame_to_gene_variants(_variants().iloc[::-1]).set_index("variation_id")
+    assert encoded["content_hash"].equals(reordered["content_hash"].loc[encoded.index])
+
+    changed = _variants()
+    changed.loc[1, "hgvs_c"] = "c.215C>G"
+    changed = frame_to_gene_variants(changed).set_index("variation_id")
+    assert (encoded["content_hash"] != changed["content_hash"]).tolist() == [False, True, False]
+
+
+class _Cursor:
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+        self.statements = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+    def copy_expert(self, sql, buffer):
+        self.statements.append(sql)
+
+
+class _Connection:
+    def __init__(self, rowcount):
+        self.cur = _Cursor(rowcount)
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        pass
+
+
+def test_bulk_upsert_returns_rows_written_and_skips_unchanged_hashes():
+    conn = _Connection(rowcount=1)
+    assert bulk_upsert_gene_variants(conn, _variants()) == 1
+
+    upsert = conn.cur.statements[-1]
+    assert "g.content_hash = s.content_hash" in upsert
+    assert "gene_variants.content_hash IS DISTINCT FROM EXCLUDED.content_hash" in upsert
@@ -0,0 +1,52 @@
+import pytest
+
+import new2
+
+
+class _Connection:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+    def close(self):
+        self.calls.append("close")
+
+
+@pytest.fixture
+def calls(monkeypatch, tmp_path):
+    calls = []
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(new2.psycopg2, "connect", lambda **config: _Connection(calls))
+    monkeypatch.setattr(new2, "create_tables", lambda conn: None)
+    monkeypatch.setattr(new2, "create_aggregate_tables", lambda conn: None)
+    monkeypatch.setattr(new2.urllib.request, "urlretrieve", lambda url, path: None)
+    monkeypatch.setattr(new2, "drop_indexes", lambda conn: calls.append("drop_indexes"))
+    monkeypatch.setattr(new2, "create_indexes", lambda conn: calls.append("create_indexes"))
+    monkeypatch.setattr(new2, "refresh_acmg_aggregates", lambda conn, genes: calls.append("refresh"))
+    return calls
+
+
+def test_failed_full_load_rebuilds_dropped_indexes(calls, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("διακοπή φόρτωσης")
+
+    monkeypatch.setattr(new2, "process_clinvar_chunked", fail)
+    new2.main(genes=None, memory_budget_mb=64)
+    assert calls == ["drop_indexes", "rollback", "create_indexes", "close"]
+
+
+def test_successful_full_load_builds_indexes_once(calls, monkeypatch):
+    monkeypatch.setattr(new2, "process_clinvar_chunked", lambda *args: {"TP53"})
+    new2.main(genes=None, memory_budget_mb=64)
+    assert calls == ["drop_indexes", "create_indexes", "refresh", "close"]
+
+
+def test_gene_load_keeps_indexes(calls, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("διακοπή φόρτωσης")
+
+    monkeypatch.setattr(new2, "process_clinvar_chunked", fail)
+    new2.main(genes={"TP53"}, memory_budget_mb=64)
+    assert calls == ["close"]
@@ -0,0 +1,36 @@
+import pandas as pd
+
+from clinvar_stream import stream_variant_summary
+from clinvar_transform import check_hgvs_parity
+
+# Μορφές του πεδίου Name του variant_summary (και μερικές οριακές περιπτώσεις)
+NAMES = [
+    "NM_000546.6(TP53):c.743G>A (p.Arg248Gln)",
+    "NM_000546.6(TP53):c.916C>T (p.Arg306Ter)",
+    "NM_007294.4(BRCA1):c.5266dup (p.Gln1756fs)",
+    "NM_007294.4(BRCA1):c.68_69del (p.Glu23fs)",
+    "NM_000059.4(BRCA2):c.9097_9098insA (p.Thr3033fs)",
+    "NM_000546.6(TP53):c.375G>A (p.Thr125=)",
+    "NM_000546.6(TP53):c.1A>G (p.Met1?)",
+    "NM_000546.6(TP53):c.*1175A>C",
+    "NM_000546.6(TP53):c.-29+1G>T",
+    "NM_000546.6(TP53):c.672+1G>A",
+    "NM_000546.6(TP53):c.993+12T>C (p.?)",
+    "NM_001126112.3(TP53):c.1024del (p.Arg342fs)",
+    "NC_000017.11:g.7675088C>T",
+    "GRCh38/hg38 17p13.1(chr17:7661779-7687538)x1",
+    "NM_000546.6(TP53):c.[215C>G;743G>A]",
+    "",
+    None,
+]
+
+
+def test_hgvs_parity_on_name_forms():
+    differences = check_hgvs_parity(pd.Series(NAMES, dtype=object))
+    assert differences.empty, differences.to_string()
+
+
+def test_hgvs_parity_on_variant_summary(variant_summary_gz):
+    sample = pd.concat(list(stream_variant_summary(variant_summary_gz, assembly=None)), ignore_index=True)
+    differences = check_hgvs_parity(sample["name"])
+    assert differences.empty, differences.to_string()
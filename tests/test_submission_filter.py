@@ -0,0 +1,49 @@
+import gzip
+
+from old_parse import filter_submission_by_variation_ids
+
+HEADER = [
+    "VariationID", "ClinicalSignificance", "DateLastEvaluated", "Description", "SubmittedPhenotypeInfo",
+    "ReportedPhenotypeInfo", "ReviewStatus", "CollectionMethod", "OriginCounts", "Submitter", "SCV",
+    "SubmittedGeneSymbol", "ExplanationOfInterpretation",
+]
+
+
+def _row(variation_id: str, submitter: str, description: str = "-") -> str:
+    return "\t".join([
+        variation_id, "Pathogenic", "-", description, "x", "y", "criteria provided", "clinical testing",
+        "germline:1", submitter, "SCV0", "TP53", "-",
+    ]) + "\n"
+
+
+def _write_submission_summary(path) -> str:
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write("##Overview of submissions\n##Explanation\n")
+        f.write("#" + "\t".join(HEADER) + "\n")
+        f.write(_row("123", "LabA", "desc # with hash"))
+        # Το 123 ως substring άλλου ID ή μέσα σε άλλη στήλη δεν πρέπει να ταιριάζει
+        f.write(_row("1234", "LabB"))
+        f.write(_row("51230", "LabC"))
+        f.write(_row("77", "LabD", "see variation 123"))
+        f.write(_row("123", "LabE"))
+        f.write(_row("9", "LabF"))
+    return str(path)
+
+
+def test_filter_matches_variation_ids_exactly(tmp_path):
+    path = _write_submission_summary(tmp_path / "submission_summary.txt.gz")
+
+    # IDs από float στήλες ('9.0') κανονικοποιούνται
+    df = filter_submission_by_variation_ids(path, [123, "9.0"])
+    assert df["VariationID"].tolist() == [123, 123, 9]
+    assert df["Submitter"].tolist() == ["LabA", "LabE", "LabF"]
+    # Το '#' μέσα σε πεδίο δεν κόβει τη γραμμή
+    assert df["Description"].iloc[0] == "desc # with hash"
+    assert list(df.columns) == HEADER
+
+
+def test_filter_without_matches_returns_empty_frame(tmp_path):
+    path = _write_submission_summary(tmp_path / "submission_summary.txt.gz")
+    df = filter_submission_by_variation_ids(path, [12])
+    assert df.empty
+    assert list(df.columns) == HEADER
@@ -0,0 +1,177 @@
+import gzip
+import io
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import new2
+import vcf_classify
+from conftest import variant_summary_rows, write_variant_summary
+from db_load import frame_to_gene_variants
+
+
+class _GeneVariantsCursor:
+    """Cursor που απαντά το bulk join του match_loci από γραμμές gene_variants σε DataFrame"""
+
+    def __init__(self, gene_variants: pd.DataFrame):
+        self.gene_variants = gene_variants
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        assert "JOIN gene_variants" in sql
+        loci = set(zip(*params))
+        rows = self.gene_variants.sort_values("variation_id").to_dict("records")
+        self.rows = [
+            row for row in rows
+            if (row["chromosome"], row["position_vcf"], row["reference_allele_vcf"], row["alternate_allele_vcf"]) in loci
+        ]
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.fixture(scope="module")
+def gene_variants(tmp_path_factory):
+    path = tmp_path_factory.mktemp("clinvar") / "variant_summary.txt.gz"
+    write_variant_summary(str(path), variant_summary_rows(200))
+    panel = new2.process_clinvar_panel(str(path), {"TP53", "WRAP53", "BRCA1"})
+    panel = {gene: new2.prepare_variants(df) for gene, df in panel.items() if not df.empty}
+    frames = [frame_to_gene_variants(df) for _, df in new2.annotate_panel(panel)]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _vcf(records) -> str:
+    lines = ["##fileformat=VCFv4.2", "#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO"]
+    lines += ["\t".join(map(str, record)) for record in records]
+    return "\n".join(lines) + "\n"
+
+
+def _info(line: str) -> dict:
+    return vcf_classify.parse_info(line.split("\t")[7])
+
+
+def test_known_loci_match_on_vcf_columns(gene_variants):
+    # Τα ReferenceAllele / AlternateAllele του variant_summary είναι 'na', το locus είναι στις στήλες VCF
+    assert (gene_variants["reference_allele"] == "na").all()
+    known = gene_variants.sort_values("variation_id").drop_duplicates(
+        subset=["chromosome", "position_vcf", "reference_allele_vcf", "alternate_allele_vcf"]
+    ).head(5)
+
+    records = [(f"chr{r.chromosome}", r.position_vcf, ".", r.reference_allele_vcf, r.alternate_allele_vcf, ".", "PASS", ".")
+               for r in known.itertuples()]
+    records.append(("chr17", 1, ".", "A", "G", ".", "PASS", "."))
+    out = io.StringIO()
+    counts = vcf_classify.annotate_vcf(io.StringIO(_vcf(records)), out, _GeneVariantsCursor(gene_variants))
+
+    assert counts == {"known": 5, "novel": 0, "none": 1}
+    lines = [line for line in out.getvalue().splitlines() if not line.startswith("#")]
+    for line, expected in zip(lines, known.itertuples()):
+        info = _info(line)
+        assert info["CLINVAR_MATCH"] == "known"
+        assert info["CLINVAR_ID"] == str(expected.variation_id)
+    assert _info(lines[-1])["CLINVAR_MATCH"] == "none"
+
+
+def test_parse_info():
+    assert vcf_classify.parse_info(".") == {}
+    assert vcf_classify.parse_info("") == {}
+    assert vcf_classify.parse_info("DP=10;DB;GENE=TP53") == {"DP": "10", "DB": "", "GENE": "TP53"}
+
+
+def test_allele_annotation_sources():
+    plain = {"GENE": "TP53", "HGVSc": "NM_000546.6:c.524G>A", "HGVSp": "NP_000537.3:p.Arg175His"}
+    assert vcf_classify.allele_annotation(plain, "T", None) == ("TP53", "c.524G>A", "p.Arg175His")
+
+    ann = ("T|missense_variant|MODERATE|TP53|ENSG1|transcript|ENST1|protein_coding|5/11|"
+           "c.524G>A|p.Arg175His,G|synonymous_variant|LOW|TP53|ENSG1|transcript|ENST1|protein_coding|5/11|"
+           "c.525C>G|p.Arg175%3D")
+    assert vcf_classify.allele_annotation({"ANN": ann}, "G", None) == ("TP53", "c.525C>G", "p.Arg175=")
+
+    csq_format = ["Allele", "Consequence", "SYMBOL", "HGVSc", "HGVSp"]
+    csq = "A|missense_variant|BRCA1|ENST2:c.68A>G|ENSP2:p.Glu23Gly,T|missense_variant|TP53|ENST1:c.524G>A|"
+    assert vcf_classify.allele_annotation({"CSQ": csq}, "T", csq_format) == ("TP53", "c.524G>A", None)
+
+    assert vcf_classify.allele_annotation({"DP": "10"}, "T", None) == (None, None, None)
+
+
+def test_multi_alt_records_are_split_per_allele():
+    meta = ['##INFO=<ID=CSQ,Number=.,Type=String,Description="Consequence. Format: Allele|SYMBOL|HGVSc|HGVSp">']
+    handle = io.StringIO(
+        "chr17\t7675088\t.\tC\tT,G\t.\tPASS\tCSQ=G|TP53|c.524G>C|p.Arg175Pro,T|TP53|c.524G>A|p.Arg175His\n"
+        "chrM\t73\t.\tA\tG\t.\tPASS\t.\n"
+    )
+    records = list(vcf_classify.iter_vcf_records(handle, meta))
+    assert len(records) == 2
+    first = records[0][1]
+    assert [a["locus"] for a in first] == [("17", 7675088, "C", "T"), ("17", 7675088, "C", "G")]
+    assert [a["hgvs_c"] for a in first] == ["c.524G>A", "c.524G>C"]
+    assert records[1][1][0]["locus"] == ("MT", 73, "A", "G")
+
+
+def _classified(match, **values):
+    allele = {"locus": ("17", 7675088, "C", "T"), "match": match, "variation_id": None, "gene_symbol": None,
+              "hgvs_c": None, "hgvs_p": None, "clinicalsignificance": None, "acmg_criteria": []}
+    allele.update(values)
+    return allele
+
+
+def test_vcf_and_tsv_writers():
+    known = _classified("known", variation_id=12375, gene_symbol="TP53", hgvs_c="c.524G>A", hgvs_p="p.Arg175His",
+                        clinicalsignificance="Pathogenic; drug response", acmg_criteria=["PS1", "PM5"])
+    none = _classified("none", locus=("17", 7675088, "C", "G"))
+    fields = ["17", "7675088", ".", "C", "T,G", ".", "PASS", "DP=10"]
+
+    line = vcf_classify._annotated_vcf_line(fields, [known, none])
+    info = vcf_classify.parse_info(line.rstrip("\n").split("\t")[7])
+    assert info["DP"] == "10"
+    assert info["CLINVAR_MATCH"] == "known,none"
+    assert info["CLINVAR_ID"] == "12375,."
+    assert info["CLINVAR_SIG"] == "Pathogenic%3B_drug_response,."
+    assert info["ACMG"] == "PS1|PM5,."
+
+    # Εγγραφή χωρίς INFO: τα πεδία συμπληρώνονται μέχρι τη στήλη INFO
+    assert vcf_classify._annotated_vcf_line(["17", "1", ".", "A", "G"], [none]).split("\t")[5:7] == [".", "."]
+
+    rows = [line.rstrip("\n").split("\t") for line in vcf_classify._tsv_lines([known, none])]
+    assert all(len(row) == len(vcf_classify.TSV_COLUMNS) for row in rows)
+    assert rows[0] == ["17", "7675088", "C", "T", "known", "12375", "TP53", "c.524G>A", "p.Arg175His",
+                       "Pathogenic; drug response", "PS1; PM5"]
+    assert rows[1][4:7] == ["none", "", ""]
+
+
+def test_annotate_vcf_bytes_yields_per_batch(gene_variants):
+    known = gene_variants.sort_values("variation_id").head(5)
+    records = [(r.chromosome, r.position_vcf, ".", r.reference_allele_vcf, r.alternate_allele_vcf, ".", "PASS", ".")
+               for r in known.itertuples()]
+    data = io.BytesIO(gzip.compress(_vcf(records).encode("utf-8")))
+
+    chunks = list(vcf_classify.annotate_vcf_bytes(data, _GeneVariantsCursor(gene_variants), "tsv", batch_size=2))
+    assert chunks[0] == "\t".join(vcf_classify.TSV_COLUMNS) + "\n"
+    assert [chunk.count("\n") for chunk in chunks[1:]] == [2, 2, 1]
+    assert all("\tknown\t" in line for line in "".join(chunks[1:]).splitlines())
+
+
+def test_classify_vcf_endpoint_streams(gene_variants, monkeypatch):
+    released = []
+
+    class _Connection:
+        def cursor(self, cursor_factory=None):
+            return _GeneVariantsCursor(gene_variants)
+
+    monkeypatch.setattr(api, "get_connection", _Connection)
+    monkeypatch.setattr(api, "release_connection", released.append)
+    client = TestClient(api.app)
+
+    row = gene_variants.iloc[0]
+    vcf = _vcf([(row.chromosome, row.position_vcf, ".", row.reference_allele_vcf, row.alternate_allele_vcf,
+                 ".", "PASS", ".")])
+    response = client.post("/classify_vcf", params={"output_format": "vcf"}, files={"file": ("s.vcf", vcf)})
+    lines = [line for line in response.text.splitlines() if not line.startswith("#")]
+    assert _info(lines[0])["CLINVAR_MATCH"] == "known"
+    assert len(released) == 1
+
+    response = client.post("/classify_vcf", files={"file": ("s.vcf", "chr17\t1\t.\tA\tG\n")})
+    assert "error" in response.json()
+    assert len(released) == 2
@@ -0,0 +1,296 @@
+import argparse
+import gzip
+import io
+import re
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from acmg_aggregates import lookup_criteria_batch
+from clinvar_transform import PROTEIN_POS_PATTERN
+
+
+# --- Ρυθμίσεις ---
+VCF_BATCH_SIZE = 10_000  # εγγραφές VCF ανά bulk join στη βάση
+TSV_COLUMNS = [
+    "chrom", "pos", "ref", "alt", "match", "variation_id", "gene_symbol",
+    "hgvs_c", "hgvs_p", "clinicalsignificance", "acmg_criteria",
+]
+INFO_HEADERS = [
+    '##INFO=<ID=CLINVAR_MATCH,Number=A,Type=String,Description="known: ίδιο locus στο gene_variants, novel: ταξινόμηση PS1/PM5/PP5/BP6, none: χωρίς αντιστοίχιση">',
+    '##INFO=<ID=CLINVAR_ID,Number=A,Type=String,Description="ClinVar VariationID">',
+    '##INFO=<ID=CLINVAR_SIG,Number=A,Type=String,Description="ClinVar clinical significance">',
+    '##INFO=<ID=ACMG,Number=A,Type=String,Description="Κριτήρια ACMG (χωρισμένα με |)">',
+]
+
+# Κλειδί locus: (chromosome, position_vcf, reference_allele_vcf, alternate_allele_vcf) όπως στο gene_variants
+Locus = Tuple[str, int, str, str]
+
+
+def normalize_chrom(chrom: str) -> str:
+    """Χρωμόσωμα στη μορφή του ClinVar ('chr17' -> '17', 'chrM' -> 'MT')"""
+    if chrom.lower().startswith("chr"):
+        chrom = chrom[3:]
+    return "MT" if chrom.upper() == "M" else chrom
+
+
+def open_text(path: str):
+    """Άνοιγμα VCF (απλό ή .gz) ως stream κειμένου"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def read_vcf_header(handle) -> Tuple[List[str], List[str]]:
+    """Διαβάζει τις γραμμές '##' και τη γραμμή '#CHROM' και επιστρέφει (meta γραμμές, στήλες)"""
+    meta = []
+    for line in handle:
+        line = line.rstrip("\r\n")
+        if line.startswith("##"):
+            meta.append(line)
+        elif line.startswith("#"):
+            return meta, line[1:].split("\t")
+    raise ValueError("Το VCF δεν έχει γραμμή #CHROM")
+
+
+def _csq_format(meta: List[str]) -> Optional[List[str]]:
+    """Πεδία του VEP CSQ από το header ('Format: Allele|Consequence|...')"""
+    for line in meta:
+        if line.startswith("##INFO=<ID=CSQ") and "Format: " in line:
+            return line.split("Format: ", 1)[1].rstrip('">').split("|")
+    return None
+
+
+def parse_info(info: str) -> Dict[str, str]:
+    if info in ("", "."):
+        return {}
+    fields = {}
+    for item in info.split(";"):
+        key, _, value = item.partition("=")
+        fields[key] = value
+    return fields
+
+
+def _strip_transcript(hgvs: Optional[str]) -> Optional[str]:
+    """'NM_000546.6:c.524G>A' -> 'c.524G>A' (VEP / snpEff γράφουν και το transcript)"""
+    if not hgvs:
+        return None
+    hgvs = hgvs.split(":", 1)[-1].replace("%3D", "=")
+    return hgvs or None
+
+
+def allele_annotation(info: Dict[str, str], alt: str, csq_format: Optional[List[str]]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """
+    (gene, c.HGVS, p.HGVS) για ένα ALT allele από το INFO, για την ταξινόμηση μεταλλάξεων που δεν είναι στο ClinVar.
+    Υποστηρίζονται απλά πεδία GENE / HGVSc / HGVSp, το ANN του snpEff και το CSQ του VEP (πρώτη εγγραφή του allele).
+    """
+    if "GENE" in info or "HGVSc" in info:
+        return info.get("GENE"), _strip_transcript(info.get("HGVSc")), _strip_transcript(info.get("HGVSp"))
+
+    if "ANN" in info:
+        for entry in info["ANN"].split(","):
+            parts = entry.split("|")
+            if len(parts) > 10 and parts[0] == alt:
+                return parts[3] or None, _strip_transcript(parts[9]), _strip_transcript(parts[10])
+
+    if "CSQ" in info and csq_format:
+        index = {name: i for i, name in enumerate(csq_format)}
+        for entry in info["CSQ"].split(","):
+            parts = entry.split("|")
+            if len(parts) != len(csq_format):
+                continue
+            if "Allele" in index and parts[index["Allele"]] not in (alt, "-"):
+                continue
+            gene = parts[index["SYMBOL"]] if "SYMBOL" in index else None
+            hgvs_c = parts[index["HGVSc"]] if "HGVSc" in index else None
+            hgvs_p = parts[index["HGVSp"]] if "HGVSp" in index else None
+            return gene or None, _strip_transcript(hgvs_c), _strip_transcript(hgvs_p)
+
+    return None, None, None
+
+
+def iter_vcf_records(handle, meta: List[str]) -> Iterator[Tuple[List[str], List[Dict]]]:
+    """
+    Streaming ανάγνωση εγγραφών: (πεδία γραμμής, alleles) όπου κάθε ALT allele έχει locus
+    και annotation (gene, hgvs_c, hgvs_p). Τα πολλαπλά ALT αντιστοιχίζονται χωριστά.
+    """
+    csq_format = _csq_format(meta)
+    for line in handle:
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("#"):
+            continue
+        fields = line.split("\t")
+        chrom, pos, ref, alts = normalize_chrom(fields[0]), int(fields[1]), fields[3], fields[4].split(",")
+        info = parse_info(fields[7]) if len(fields) > 7 else {}
+        alleles = []
+        for alt in alts:
+            gene, hgvs_c, hgvs_p = allele_annotation(info, alt, csq_format)
+            alleles.append({"locus": (chrom, pos, ref, alt), "gene": gene, "hgvs_c": hgvs_c, "hgvs_p": hgvs_p})
+        yield fields, alleles
+
+
+def match_loci(cur, loci: List[Locus]) -> Dict[Locus, Dict]:
+    """
+    Bulk join των loci με το gene_variants στο indexed κλειδί (chromosome, position_vcf, reference_allele_vcf,
+    alternate_allele_vcf). Οι στήλες VCF του ClinVar έχουν τη θέση και τα alleles με τη σύμβαση του VCF
+    (τα ReferenceAllele / AlternateAllele είναι συνήθως 'na').
+    """
+    unique = sorted(set(loci))
+    if not unique:
+        return {}
+    cur.execute("""
+        SELECT g.chromosome, g.position_vcf, g.reference_allele_vcf, g.alternate_allele_vcf,
+               g.variation_id, g.gene_symbol, g.hgvs_c, g.hgvs_p, g.clinicalsignificance, g.acmg_combined_criteria
+        FROM unnest(%s::text[], %s::int[], %s::text[], %s::text[])
+            AS q(chromosome, position_vcf, reference_allele_vcf, alternate_allele_vcf)
+        JOIN gene_variants g
+          ON g.chromosome = q.chromosome AND g.position_vcf = q.position_vcf
+         AND g.reference_allele_vcf = q.reference_allele_vcf AND g.alternate_allele_vcf = q.alternate_allele_vcf
+        ORDER BY g.variation_id
+    """, tuple(list(column) for column in zip(*unique)))
+    matches = {}
+    for row in cur.fetchall():
+        key = (row["chromosome"], row["position_vcf"], row["reference_allele_vcf"], row["alternate_allele_vcf"])
+        matches.setdefault(key, row)
+    return matches
+
+
+def _protein_pos(hgvs_p: Optional[str]) -> Optional[int]:
+    """Θέση πρωτεΐνης από το p.HGVS (ίδιο pattern με το clinvar_transform)"""
+    match = re.search(PROTEIN_POS_PATTERN, hgvs_p) if hgvs_p else None
+    return int(match.group(1)) if match else None
+
+
+def classify_batch(cur, records: List[Tuple[List[str], List[Dict]]]) -> None:
+    """
+    Συμπληρώνει σε κάθε allele το αποτέλεσμα: γνωστό locus από το ClinVar, αλλιώς
+    PS1/PM5/PP5/BP6 από τα aggregates (όταν το VCF δίνει gene και HGVS)
+    """
+    alleles = [allele for _, record_alleles in records for allele in record_alleles]
+    matches = match_loci(cur, [allele["locus"] for allele in alleles])
+
+    novel = []
+    for allele in alleles:
+        known = matches.get(allele["locus"])
+        if known:
+            allele.update(
+                match="known",
+                variation_id=known["variation_id"],
+                gene_symbol=known["gene_symbol"],
+                hgvs_c=known["hgvs_c"],
+                hgvs_p=known["hgvs_p"],
+                clinicalsignificance=known["clinicalsignificance"],
+                acmg_criteria=[c.strip() for c in (known["acmg_combined_criteria"] or "").split(";") if c.strip()],
+            )
+        else:
+            allele.update(match="none", variation_id=None, gene_symbol=allele["gene"],
+                          clinicalsignificance=None, acmg_criteria=[])
+            if allele["gene"] and allele["hgvs_c"]:
+                novel.append(allele)
+
+    criteria = lookup_criteria_batch(cur, [
+        (a["gene"], a["hgvs_c"], a["hgvs_p"], _protein_pos(a["hgvs_p"])) for a in novel
+    ])
+    for allele, allele_criteria in zip(novel, criteria):
+        allele.update(match="novel", acmg_criteria=allele_criteria)
+
+
+def _info_value(value) -> str:
+    """Τιμή INFO χωρίς τους δεσμευμένους χαρακτήρες του VCF"""
+    if value is None or value == "" or value == []:
+        return "."
+    if isinstance(value, list):
+        value = "|".join(value)
+    return (str(value).replace("%", "%25").replace(";", "%3B").replace(",", "%2C")
+            .replace("=", "%3D").replace(" ", "_"))
+
+
+def _annotated_vcf_line(fields: List[str], alleles: List[Dict]) -> str:
+    annotations = {
+        "CLINVAR_MATCH": [a["match"] for a in alleles],
+        "CLINVAR_ID": [a["variation_id"] for a in alleles],
+        "CLINVAR_SIG": [a["clinicalsignificance"] for a in alleles],
+        "ACMG": [a["acmg_criteria"] for a in alleles],
+    }
+    added = ";".join(f"{key}={','.join(_info_value(v) for v in values)}" for key, values in annotations.items())
+    fields = list(fields) + ["."] * max(0, 8 - len(fields))
+    fields[7] = added if fields[7] in ("", ".") else f"{fields[7]};{added}"
+    return "\t".join(fields) + "\n"
+
+
+def _tsv_lines(alleles: List[Dict]) -> Iterator[str]:
+    for a in alleles:
+        chrom, pos, ref, alt = a["locus"]
+        values = [chrom, pos, ref, alt, a["match"], a["variation_id"], a["gene_symbol"], a["hgvs_c"],
+                  a["hgvs_p"], a["clinicalsignificance"], "; ".join(a["acmg_criteria"])]
+        yield "\t".join("" if v is None else str(v) for v in values) + "\n"
+
+
+def iter_annotated_vcf(handle, cur, output_format: str = "vcf", batch_size: int = VCF_BATCH_SIZE,
+                       counts: Optional[Dict[str, int]] = None) -> Iterator[str]:
+    """
+    Streaming ταξινόμηση ενός VCF: batches των batch_size εγγραφών, ένα bulk join ανά batch
+    για τα γνωστά loci και ένα query στα aggregates για τα υπόλοιπα. Δίνει πρώτα το header
+    και μετά ένα κομμάτι annotated VCF ή TSV ανά batch. Στο counts μετράει alleles ανά τύπο αντιστοίχισης.
+    """
+    meta, columns = read_vcf_header(handle)
+    if output_format == "vcf":
+        yield "\n".join(meta + INFO_HEADERS) + "\n" + "#" + "\t".join(columns) + "\n"
+    else:
+        yield "\t".join(TSV_COLUMNS) + "\n"
+
+    records = iter_vcf_records(handle, meta)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            break
+        classify_batch(cur, batch)
+        lines = []
+        for fields, alleles in batch:
+            if counts is not None:
+                for allele in alleles:
+                    counts[allele["match"]] += 1
+            if output_format == "vcf":
+                lines.append(_annotated_vcf_line(fields, alleles))
+            else:
+                lines.extend(_tsv_lines(alleles))
+        yield "".join(lines)
+
+
+def annotate_vcf(handle, out, cur, output_format: str = "vcf", batch_size: int = VCF_BATCH_SIZE) -> Dict[str, int]:
+    """Ταξινόμηση VCF με εγγραφή στο out ανά batch. Επιστρέφει πλήθος alleles ανά τύπο αντιστοίχισης."""
+    counts = {"known": 0, "novel": 0, "none": 0}
+    for text in iter_annotated_vcf(handle, cur, output_format, batch_size, counts):
+        out.write(text)
+    return counts
+
+
+def annotate_vcf_bytes(data, cur, output_format: str = "tsv", batch_size: int = VCF_BATCH_SIZE) -> Iterator[str]:
+    """Ταξινόμηση VCF από binary stream (π.χ. upload στο API, απλό ή gzip), ένα κομμάτι εξόδου ανά batch"""
+    head = data.read(2)
+    data.seek(0)
+    raw = gzip.GzipFile(fileobj=data, mode="rb") if head == b"\x1f\x8b" else data
+    yield from iter_annotated_vcf(io.TextIOWrapper(raw, encoding="utf-8"), cur, output_format, batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ταξινόμηση VCF δείγματος με βάση το gene_variants (ClinVar + ACMG)")
+    parser.add_argument("vcf", help="VCF εισόδου (.vcf ή .vcf.gz)")
+    parser.add_argument("-o", "--output", required=True, help="Αρχείο εξόδου (.vcf για annotated VCF, αλλιώς TSV)")
+    parser.add_argument("--batch-size", type=int, default=VCF_BATCH_SIZE, help="Εγγραφές ανά bulk join")
+    args = parser.parse_args()
+
+    from new2 import DB_CONFIG
+
+    output_format = "vcf" if args.output.endswith((".vcf", ".vcf.gz")) else "tsv"
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with open_text(args.vcf) as handle, \
+                (gzip.open(args.output, "wt", encoding="utf-8") if args.output.endswith(".gz")
+                 else open(args.output, "w", encoding="utf-8")) as out:
+            counts = annotate_vcf(handle, out, conn.cursor(cursor_factory=RealDictCursor), output_format, args.batch_size)
+        print(f"Ολοκληρώθηκε: {counts['known']} γνωστά, {counts['novel']} νέα με ACMG, {counts['none']} χωρίς αντιστοίχιση")
+    finally:
+        conn.close()